@@ -1,6 +1,10 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Repartidor, Producto, Categoria, Carrito, ItemCarrito, MetodoPago, Pedido, DetallePedido, Reclamo, Slide
+from django.db import transaction
+from .models import Usuario, Repartidor, Producto, Categoria, Carrito, CarritoAbandonado, ItemCarrito, MetodoPago, Pedido, PedidoArchivado, DetallePedidoArchivado, DetallePedido, Reclamo, Slide, MovimientoStock, Promocion, PronosticoStock, AlertaStock
+from .historial import escribir_resumenes
+from .inventario import guardar_producto
 
 @admin.register(Usuario)
 class UsuarioAdmin(UserAdmin):
@@ -19,13 +23,81 @@ class CategoriaAdmin(admin.ModelAdmin):
       list_filter = ['activo']
       search_fields = ['nombre']
       
+class ProductoAdminForm(forms.ModelForm):
+      # Stock que vio el administrador al abrir la página: el de la fila al guardar ya puede incluir ventas
+      stock_original = forms.IntegerField(required=False, widget=forms.HiddenInput())
+
+      class Meta:
+            model = Producto
+            fields = '__all__'
+
+      def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if self.instance.pk:
+                  self.fields['stock_original'].initial = self.instance.stock
+
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
+      form = ProductoAdminForm
       list_display = ['nombre', 'descripcion', 'precio','stock', 'activo', 'en_promocion', 'disponible']
       list_filter = ['categoria', 'activo', 'en_promocion']
       search_fields = ['nombre', 'descripcion']
-      list_editable = ['precio', 'stock', 'activo', 'en_promocion']
+      # El stock no se edita desde el listado: su formset se arma con el saldo del momento del POST
+      list_editable = ['precio', 'activo', 'en_promocion']
+
+      def save_model(self, request, obj, form, change):
+            # El stock editado entra al libro como ajuste por la diferencia con el valor
+            # mostrado en la página (campo oculto), sin sobrescribir la columna
+            stock_mostrado = form.cleaned_data.get('stock_original')
+            if 'stock' not in form.cleaned_data:
+                  stock_mostrado = None  # Edición desde el listado: el stock no cambia
+            elif stock_mostrado is None and change:
+                  stock_mostrado = form.initial.get('stock')
+            guardar_producto(
+                  obj, form.cleaned_data.get('stock', obj.stock), stock_mostrado,
+                  usuario=request.user, nota='Edición desde el admin',
+            )
+
+@admin.register(Promocion)
+class PromocionAdmin(admin.ModelAdmin):
+      list_display = ['nombre', 'tipo', 'valor', 'inicio', 'fin', 'activo']
+      list_filter = ['activo', 'tipo', 'inicio']
+      search_fields = ['nombre']
+      filter_horizontal = ['productos', 'categorias']
+      date_hierarchy = 'inicio'
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+      list_display = ['fecha', 'producto', 'tipo', 'cantidad', 'pedido', 'usuario', 'nota']
+      list_filter = ['tipo', 'fecha']
+      search_fields = ['producto__nombre', 'pedido__numero_pedido', 'nota']
+      list_select_related = ['producto', 'pedido', 'usuario']
+      raw_id_fields = ['producto', 'pedido', 'usuario']
+
+      # Solo lectura: los movimientos se registran desde core/inventario.py
+      def has_add_permission(self, request):
+            return False
+
+      def has_change_permission(self, request, obj=None):
+            return False
+
+      def has_delete_permission(self, request, obj=None):
+            return False
       
+@admin.register(PronosticoStock)
+class PronosticoStockAdmin(admin.ModelAdmin):
+      list_display = ['producto', 'stock', 'venta_diaria', 'agotamiento', 'proxima_reposicion', 'en_riesgo', 'fecha_calculo']
+      list_filter = ['en_riesgo']
+      search_fields = ['producto__nombre']
+      list_select_related = ['producto']
+
+@admin.register(AlertaStock)
+class AlertaStockAdmin(admin.ModelAdmin):
+      list_display = ['producto', 'estado', 'stock', 'agotamiento', 'proxima_reposicion', 'fecha_creacion', 'fecha_envio']
+      list_filter = ['estado', 'fecha_creacion']
+      search_fields = ['producto__nombre']
+      list_select_related = ['producto']
+
 @admin.register(Repartidor)
 class RepatidorAdmin(admin.ModelAdmin):
       list_display = ['usuario', 'vehiculo', 'disponible', 'calificacion_promedio']
@@ -41,6 +113,20 @@ class CarritoAdmin(admin.ModelAdmin):
 class ItemCarritoAdmin(admin.ModelAdmin):
       list_display = ['carrito', 'producto', 'cantidad', 'subtotal']
       list_filter = ['fecha_agregado']
+
+@admin.register(CarritoAbandonado)
+class CarritoAbandonadoAdmin(admin.ModelAdmin):
+      list_display = ['usuario', 'cantidad_items', 'total', 'ultima_actividad', 'fecha_archivo']
+      list_filter = ['ultima_actividad']
+      search_fields = ['usuario__username']
+      list_select_related = ['usuario']
+
+      # Solo lectura: lo escribe el comando limpiar_carritos
+      def has_add_permission(self, request):
+            return False
+
+      def has_change_permission(self, request, obj=None):
+            return False
       
 @admin.register(MetodoPago)
 class MetodoPagoAdmin(admin.ModelAdmin):
@@ -55,14 +141,52 @@ class PedidoAdmin(admin.ModelAdmin):
       list_filter = ['estado', 'tipo_orden', 'fecha_creacion']
       search_fields = ['numero_pedido', 'cliente__username']
       readonly_fields= ['numero_pedido']
+      ordering = ['-fecha_creacion']
+
+class DetallePedidoArchivadoInline(admin.TabularInline):
+      model = DetallePedidoArchivado
+      fields = ['producto', 'cantidad', 'precio_unitario', 'subtotal']
+      readonly_fields = fields
+      extra = 0
+      can_delete = False
+
+@admin.register(PedidoArchivado)
+class PedidoArchivadoAdmin(admin.ModelAdmin):
+      list_display = ['numero_pedido', 'cliente', 'tipo_orden', 'estado', 'total', 'fecha_creacion', 'fecha_archivo']
+      list_filter = ['estado', 'tipo_orden']
+      search_fields = ['numero_pedido', 'cliente__username']
+      list_select_related = ['cliente']
+      ordering = ['-fecha_creacion']
+      inlines = [DetallePedidoArchivadoInline]
+
+      # Solo lectura: lo escribe el comando archivar_pedidos
+      def has_add_permission(self, request):
+            return False
+
+      def has_change_permission(self, request, obj=None):
+            return False
       
 @admin.register(DetallePedido)
 class DetallePedidoAdmin(admin.ModelAdmin):
     list_display = ['pedido', 'producto', 'cantidad', 'precio_unitario', 'subtotal']
+
+    # Los detalles solo cambian desde aquí después de creado el pedido: se rehace su resumen
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        transaction.on_commit(lambda: escribir_resumenes([obj.pedido_id]))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        transaction.on_commit(lambda: escribir_resumenes([obj.pedido_id]))
+
+    def delete_queryset(self, request, queryset):
+        pedido_ids = set(queryset.values_list('pedido_id', flat=True))
+        super().delete_queryset(request, queryset)
+        transaction.on_commit(lambda: escribir_resumenes(pedido_ids))
       
 @admin.register(Reclamo)
 class ReclamoAdmin(admin.ModelAdmin):
-      list_display = ['id', 'cliente', 'pedido', 'motivo', 'estado', 'fecha_creacion']
+      list_display = ['id', 'cliente', 'pedido', 'motivo', 'estado', 'fecha_creacion', 'limite_atencion']
       list_filter = ['estado', 'motivo', 'fecha_creacion']
       search_fields = ['cliente__username', 'pedido__numero_pedido']
 
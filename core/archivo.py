@@ -0,0 +1,155 @@
+"""
+Archivo de pedidos antiguos (datos fríos).
+
+Los pedidos entregados o cancelados con más de ``MESES`` meses se mueven, con
+sus detalles y reclamos, a ``PedidoArchivado``, ``DetallePedidoArchivado`` y
+``ReclamoArchivado``. Conservan sus ids y su número de pedido, y las tablas
+activas quedan con los pedidos del día a día. Un pedido con un reclamo
+abierto no se archiva hasta que el reclamo se cierre.
+
+Se usan tablas de archivo y no particiones de MySQL porque InnoDB no admite
+claves foráneas en tablas particionadas.
+
+``archivar_lote`` mueve un lote en una transacción corta, que bloquea solo
+los pedidos del lote y salta los que otra petición tenga tomados. El comando
+``archivar_pedidos`` ajusta el tamaño del lote para que cada transacción dure
+menos de ``MAX_BLOQUEO_MS``.
+
+Lectura transparente: ``obtener_pedido`` busca en las dos tablas y el
+historial del cliente (core/historial.py) y las exportaciones de ventas
+(core/reportes.py) recorren también el archivo. La búsqueda del panel
+(core/busqueda.py) solo indexa pedidos activos.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .historial import construir_resumen
+from .reclamos import ESTADOS_CERRADOS
+from .models import (
+    DetallePedido, DetallePedidoArchivado, MovimientoStock, Pedido, PedidoArchivado,
+    Reclamo, ReclamoArchivado, ResumenPedido, TerminoPedido,
+)
+
+CONFIGURACION = {
+    'MESES': 6,              # Antigüedad mínima para archivar un pedido
+    'LOTE': 200,             # Pedidos por transacción al comenzar
+    'LOTE_MINIMO': 10,
+    'LOTE_MAXIMO': 2000,
+    'MAX_BLOQUEO_MS': 250,   # Duración máxima deseada de cada transacción
+}
+
+ESTADOS_ARCHIVABLES = ['entregado', 'cancelado']
+
+# Columnas del resumen que se guardan con el pedido archivado
+_CAMPOS_RESUMEN = ['cantidad_items', 'productos', 'productos_restantes', 'miniatura']
+
+
+def configuracion(clave):
+    return getattr(settings, 'ARCHIVO_PEDIDOS', {}).get(clave, CONFIGURACION[clave])
+
+
+def _campos(modelo, excluir=()):
+    return [campo.attname for campo in modelo._meta.concrete_fields if campo.attname not in excluir]
+
+
+def fecha_limite(meses=None):
+    """Los pedidos creados antes de esta fecha se pueden archivar."""
+    return timezone.now() - timedelta(days=30 * (meses or configuracion('MESES')))
+
+
+def archivables(limite):
+    """Pedidos entregados o cancelados creados antes de ``limite`` y sin reclamos abiertos."""
+    reclamo_abierto = Reclamo.objects.filter(pedido=OuterRef('pk')).exclude(estado__in=ESTADOS_CERRADOS)
+    return Pedido.objects.filter(
+        estado__in=ESTADOS_ARCHIVABLES, fecha_creacion__lt=limite,
+    ).exclude(Exists(reclamo_abierto))
+
+
+def archivar_lote(limite, desde_id=0, lote=None):
+    """
+    Mueve al archivo hasta ``lote`` pedidos archivables con id mayor a
+    ``desde_id``, en una sola transacción. Devuelve los ids archivados.
+    """
+    lote = lote or configuracion('LOTE')
+    campos_pedido = _campos(PedidoArchivado, excluir=_CAMPOS_RESUMEN + ['fecha_archivo'])
+    with transaction.atomic():
+        bloqueo = {'skip_locked': True} if connection.features.has_select_for_update_skip_locked else {}
+        ids = list(
+            archivables(limite).select_for_update(**bloqueo)
+            .filter(pk__gt=desde_id).order_by('pk')
+            .values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return []
+
+        lineas = {}
+        detalles = []
+        for fila in (
+            DetallePedido.objects.filter(pedido_id__in=ids).order_by('pedido_id', 'pk')
+            .values(*_campos(DetallePedidoArchivado), 'producto__nombre', 'producto__imagen')
+        ):
+            lineas.setdefault(fila['pedido_id'], []).append(
+                (fila.pop('producto__nombre'), fila.pop('producto__imagen'), fila['cantidad'])
+            )
+            detalles.append(DetallePedidoArchivado(**fila))
+        resumenes = {
+            fila.pop('pedido_id'): fila
+            for fila in ResumenPedido.objects.filter(pedido_id__in=ids).values('pedido_id', *_CAMPOS_RESUMEN)
+        }
+        pedidos = []
+        for fila in Pedido.objects.filter(pk__in=ids).order_by('pk').values(*campos_pedido):
+            pedido = PedidoArchivado(**fila)
+            if pedido.pk in resumenes:
+                resumen = resumenes[pedido.pk]
+            else:
+                nuevo = construir_resumen(pedido, lineas.get(pedido.pk, []))
+                resumen = {campo: getattr(nuevo, campo) for campo in _CAMPOS_RESUMEN}
+            for campo in _CAMPOS_RESUMEN:
+                setattr(pedido, campo, resumen[campo])
+            pedidos.append(pedido)
+        reclamos = [
+            ReclamoArchivado(**fila)
+            for fila in Reclamo.objects.filter(pedido_id__in=ids).order_by('pk').values(*_campos(ReclamoArchivado))
+        ]
+
+        PedidoArchivado.objects.bulk_create(pedidos)
+        DetallePedidoArchivado.objects.bulk_create(detalles)
+        ReclamoArchivado.objects.bulk_create(reclamos)
+
+        # El libro de stock conserva sus movimientos: se anota el número del pedido antes de soltar la FK
+        movimientos = MovimientoStock.objects.filter(pedido_id__in=ids)
+        movimientos.filter(nota__isnull=True).update(nota=Concat(
+            Value('Pedido '),
+            Subquery(Pedido.objects.filter(pk=OuterRef('pedido_id')).values('numero_pedido')[:1]),
+        ))
+        movimientos.update(pedido=None)
+        # Los reclamos descuentan su contador por estado (señal post_delete); el resto
+        # no tiene señales de borrado y cada DELETE va por lote, sin cargar filas
+        Reclamo.objects.filter(pedido_id__in=ids).delete()
+        DetallePedido.objects.filter(pedido_id__in=ids).delete()
+        ResumenPedido.objects.filter(pedido_id__in=ids).delete()
+        TerminoPedido.objects.filter(pedido_id__in=ids).delete()
+        Pedido.objects.filter(pk__in=ids).delete()
+    return ids
+
+
+def ajustar_lote(lote, milisegundos, max_bloqueo_ms=None):
+    """Nuevo tamaño de lote según cuánto duró la última transacción."""
+    max_bloqueo_ms = max_bloqueo_ms or configuracion('MAX_BLOQUEO_MS')
+    if milisegundos > max_bloqueo_ms:
+        return max(lote // 2, configuracion('LOTE_MINIMO'))
+    if milisegundos < max_bloqueo_ms / 2:
+        return min(lote * 2, configuracion('LOTE_MAXIMO'))
+    return lote
+
+
+# ---------- Lectura ----------
+
+def obtener_pedido(**filtros):
+    """El pedido activo o archivado que cumple ``filtros`` (por ejemplo pk y cliente), o None."""
+    return Pedido.objects.filter(**filtros).first() or PedidoArchivado.objects.filter(**filtros).first()
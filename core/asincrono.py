@@ -0,0 +1,36 @@
+"""
+Lecturas compartidas entre vistas síncronas y asíncronas (modo ASGI).
+
+Una función de lectura que sirve a los dos tipos de vista se escribe una sola
+vez como *plan*: un generador que entrega (``yield``) cada queryset que
+necesita, recibe sus filas y al final retorna el resultado. ``ejecutar`` lo
+resuelve con el ORM síncrono y ``aejecutar`` con la interfaz asíncrona
+(``async for``), así la lógica (filtros, cursores, puntajes) no se duplica::
+
+    def _plan_contadores():
+        filas = yield ContadorReclamos.objects.values_list('estado', 'cantidad')
+        return dict(filas)
+
+    contadores = ejecutar(_plan_contadores())
+    contadores = await aejecutar(_plan_contadores())
+"""
+
+
+def ejecutar(plan):
+    """Resuelve un plan con el ORM síncrono."""
+    try:
+        consulta = next(plan)
+        while True:
+            consulta = plan.send(list(consulta))
+    except StopIteration as fin:
+        return fin.value
+
+
+async def aejecutar(plan):
+    """Resuelve un plan con la interfaz asíncrona del ORM."""
+    try:
+        consulta = next(plan)
+        while True:
+            consulta = plan.send([fila async for fila in consulta])
+    except StopIteration as fin:
+        return fin.value
@@ -0,0 +1,180 @@
+"""
+Utilidades para medir el rendimiento de los recorridos críticos de CosmoFood.
+
+Las usa el comando ``python manage.py benchmark``. Cada escenario registra la
+latencia y las consultas SQL de cada petición en un ``Registro`` y al final se
+genera un resumen (throughput, p50/p95/p99, consultas por petición) que se
+guarda en JSON para compararlo con la ejecución anterior.
+"""
+import json
+import math
+import platform
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Categoria, MetodoPago, Pedido, Producto, Repartidor, Usuario
+
+PREFIJO = 'bench_'
+DIRECTORIO_RESULTADOS = Path(settings.BASE_DIR) / 'benchmarks'
+
+
+def percentil(valores, p):
+    """Percentil por interpolación lineal (valores no necesitan venir ordenados)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * (p / 100)
+    inferior, superior = math.floor(k), math.ceil(k)
+    if inferior == superior:
+        return ordenados[int(k)]
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (k - inferior)
+
+
+class Registro:
+    """Acumula las mediciones de cada paso de un escenario."""
+
+    def __init__(self):
+        self.pasos = {}
+        self.inicio = time.perf_counter()
+
+    @contextmanager
+    def medir(self, paso):
+        datos = self.pasos.setdefault(paso, {'tiempos': [], 'consultas': [], 'errores': 0})
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            yield
+            datos['tiempos'].append(time.perf_counter() - inicio)
+        datos['consultas'].append(len(consultas))
+
+    def registrar(self, paso, segundos, error=False):
+        """Agrega una medición tomada fuera de ``medir`` (peticiones concurrentes, sin contar consultas)."""
+        datos = self.pasos.setdefault(paso, {'tiempos': [], 'consultas': [], 'errores': 0})
+        datos['tiempos'].append(segundos)
+        datos['errores'] += bool(error)
+
+    def peticion(self, paso, cliente, metodo, url, esperado=(200, 302), **kwargs):
+        """Ejecuta una petición con el cliente de pruebas y la mide."""
+        with self.medir(paso):
+            respuesta = getattr(cliente, metodo)(url, **kwargs)
+        if respuesta.status_code not in esperado:
+            self.pasos[paso]['errores'] += 1
+        return respuesta
+
+    def resumen(self):
+        duracion = time.perf_counter() - self.inicio
+        pasos = {}
+        for paso, datos in self.pasos.items():
+            tiempos = datos['tiempos']
+            total = sum(tiempos)
+            pasos[paso] = {
+                'peticiones': len(tiempos),
+                'errores': datos['errores'],
+                'throughput_rps': round(len(tiempos) / total, 2) if total else 0,
+                'media_ms': round(total / len(tiempos) * 1000, 3) if tiempos else 0,
+                'p50_ms': round(percentil(tiempos, 50) * 1000, 3),
+                'p95_ms': round(percentil(tiempos, 95) * 1000, 3),
+                'p99_ms': round(percentil(tiempos, 99) * 1000, 3),
+                'consultas_por_peticion': (
+                    round(sum(datos['consultas']) / len(datos['consultas']), 2) if datos['consultas'] else 0
+                ),
+            }
+        return {
+            'fecha': timezone.now().isoformat(),
+            'duracion_s': round(duracion, 3),
+            'entorno': entorno(),
+            'pasos': pasos,
+        }
+
+
+def entorno():
+    """Datos del entorno que afectan la comparación entre ejecuciones."""
+    return {
+        'motor_bd': connection.vendor,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'debug': settings.DEBUG,
+    }
+
+
+# ---------- Persistencia y comparación de resultados ----------
+
+def ruta_ultimo(escenario, directorio=None):
+    return Path(directorio or DIRECTORIO_RESULTADOS) / f'{escenario}-ultimo.json'
+
+
+def guardar_resultado(escenario, resultado, directorio=None):
+    """Guarda el resultado con marca de tiempo y como ``<escenario>-ultimo.json``."""
+    directorio = Path(directorio or DIRECTORIO_RESULTADOS)
+    directorio.mkdir(parents=True, exist_ok=True)
+    contenido = json.dumps(resultado, indent=2, ensure_ascii=False)
+    marca = timezone.now().strftime('%Y%m%d-%H%M%S')
+    (directorio / f'{escenario}-{marca}.json').write_text(contenido, encoding='utf-8')
+    ruta_ultimo(escenario, directorio).write_text(contenido, encoding='utf-8')
+
+
+def cargar_resultado(ruta):
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding='utf-8'))
+
+
+def comparar(actual, base, metricas=('p50_ms', 'p95_ms', 'consultas_por_peticion')):
+    """Devuelve filas (paso, métrica, base, actual, variación %) para los pasos en común."""
+    filas = []
+    for paso, datos in actual['pasos'].items():
+        anterior = base.get('pasos', {}).get(paso)
+        if not anterior:
+            continue
+        for metrica in metricas:
+            valor_base, valor_actual = anterior.get(metrica, 0), datos.get(metrica, 0)
+            variacion = ((valor_actual - valor_base) / valor_base * 100) if valor_base else 0.0
+            filas.append((paso, metrica, valor_base, valor_actual, round(variacion, 1)))
+    return filas
+
+
+# ---------- Datos de prueba ----------
+
+def preparar_datos(cantidad_productos=20):
+    """
+    Crea (o reutiliza) los usuarios y productos propios del benchmark.
+    Todos llevan el prefijo ``bench_`` para poder limpiarlos después.
+    """
+    usuarios = {}
+    for rol in ('cliente', 'cajero', 'administrador', 'repartidor'):
+        usuario, creado = Usuario.objects.get_or_create(
+            username=f'{PREFIJO}{rol}',
+            defaults={'rol': rol, 'email': f'{PREFIJO}{rol}@example.com', 'first_name': rol.title()},
+        )
+        if creado:
+            usuario.set_password('Bench1234')
+            usuario.save()
+        usuarios[rol] = usuario
+    repartidor, _ = Repartidor.objects.get_or_create(usuario=usuarios['repartidor'], defaults={'disponible': True})
+
+    categoria, _ = Categoria.objects.get_or_create(nombre=f'{PREFIJO}categoria')
+    productos = []
+    for i in range(cantidad_productos):
+        producto, _ = Producto.objects.update_or_create(
+            nombre=f'{PREFIJO}producto_{i:03d}',
+            defaults={'precio': Decimal(1000 + i * 100), 'stock': 10 ** 6, 'activo': True, 'categoria': categoria},
+        )
+        productos.append(producto)
+    metodo_pago, _ = MetodoPago.objects.get_or_create(nombre='Efectivo', defaults={'tipo': 'efectivo'})
+    return {'usuarios': usuarios, 'repartidor': repartidor, 'productos': productos, 'metodo_pago': metodo_pago}
+
+
+def limpiar_datos():
+    """Elimina todo lo creado por el benchmark (pedidos primero por el PROTECT de DetallePedido)."""
+    Pedido.objects.filter(cliente__username__startswith=PREFIJO).delete()
+    Pedido.objects.filter(repartidor__usuario__username__startswith=PREFIJO).delete()
+    Producto.objects.filter(nombre__startswith=PREFIJO).delete()
+    Categoria.objects.filter(nombre__startswith=PREFIJO).delete()
+    Usuario.objects.filter(username__startswith=PREFIJO).delete()
@@ -0,0 +1,251 @@
+"""
+Búsqueda de pedidos del panel (número de pedido, nombre o teléfono del cliente).
+
+Dos tablas de términos normalizados (minúsculas, sin tildes ni signos) se
+mantienen al escribir:
+
+- ``TerminoPedido``: cada sufijo del número de pedido de al menos
+  ``MIN_CARACTERES``. Un prefijo de algún sufijo encuentra el comienzo del
+  número ("1234" → 12345678) y también una parte (5678 → 12345678).
+- ``TerminoCliente``: las palabras del nombre, el apellido y el usuario, y
+  los sufijos del teléfono (sus últimos dígitos también lo encuentran).
+
+Cada término de la consulta es un rango sobre el índice de su tabla
+(``termino >= 'abc' AND termino < 'abd'``, ver ``_prefijo``), con un tope de
+``MAX_FILAS``. Con eso ``buscar`` arma las
+sugerencias ordenadas en pocas consultas indexadas y sin recorrer los pedidos:
+número exacto, id exacto, comienzo del número, parte del número y, al final,
+los pedidos más recientes de los clientes que coinciden con todas las palabras.
+
+Los pedidos archivados (core/archivo.py) salen del índice junto con el pedido.
+``bulk_create`` no dispara señales: tras cargas masivas se usa
+``python manage.py reconstruir_busqueda``.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .asincrono import aejecutar, ejecutar
+from .models import Pedido, TerminoCliente, TerminoPedido
+
+CONFIGURACION = {
+    'RESULTADOS': 8,        # Sugerencias por búsqueda
+    'MIN_CARACTERES': 3,    # Largo mínimo de una parte del número o del teléfono
+    'MAX_FILAS': 500,       # Filas del índice leídas por término
+    'MAX_CLIENTES': 20,     # Clientes cuyos pedidos recientes se sugieren
+}
+
+# Puntaje de cada tipo de coincidencia (a igual puntaje, el pedido más reciente primero)
+NUMERO_EXACTO = 100
+ID_EXACTO = 90
+COMIENZO_NUMERO = 80
+PARTE_NUMERO = 60
+CLIENTE = 40
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+_TELEFONO = re.compile(r'[\d\s+#().-]+')
+
+# Columnas de Usuario que alimentan TerminoCliente (en el orden de indexar_clientes)
+CAMPOS_CLIENTE = ('pk', 'first_name', 'last_name', 'username', 'telefono')
+
+
+def configuracion(clave):
+    return getattr(settings, 'BUSQUEDA_PEDIDOS', {}).get(clave, CONFIGURACION[clave])
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y solo letras y dígitos."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return _NO_ALFANUMERICO.sub('', texto.encode('ascii', 'ignore').decode('ascii'))
+
+
+def _sufijos(valor, largo_maximo):
+    minimo = configuracion('MIN_CARACTERES')
+    valor = valor[-largo_maximo:]
+    if len(valor) <= minimo:
+        return [(valor, 0)] if valor else []
+    return [(valor[posicion:], posicion) for posicion in range(len(valor) - minimo + 1)]
+
+
+def _siguiente(termino):
+    """Menor término (en el alfabeto 0-9a-z) mayor que todos los que empiezan con ``termino``, o None."""
+    termino = termino.rstrip('z')
+    if not termino:
+        return None
+    ultimo = termino[-1]
+    return termino[:-1] + ('a' if ultimo == '9' else chr(ord(ultimo) + 1))
+
+
+def _prefijo(termino):
+    """
+    Filtro "empieza con ``termino``" como rango. A diferencia de LIKE, usa el
+    índice en cualquier motor y collation (startswith en MySQL es LIKE BINARY)
+    porque los términos solo tienen 0-9a-z, que ordenan igual en todas.
+    """
+    siguiente = _siguiente(termino)
+    rango = Q(termino__gte=termino)
+    return rango & Q(termino__lt=siguiente) if siguiente else rango
+
+
+def terminos_consulta(texto):
+    """Términos normalizados de lo que escribió el usuario. Un teléfono con espacios o signos es un solo término."""
+    texto = (texto or '').strip()
+    if _TELEFONO.fullmatch(texto):
+        termino = normalizar(texto)
+        return [termino] if termino else []
+    return [termino for termino in (normalizar(palabra) for palabra in texto.split()) if termino]
+
+
+def terminos_cliente(first_name, last_name, username, telefono):
+    terminos = {
+        normalizar(palabra)[:40]
+        for palabra in f'{first_name or ""} {last_name or ""} {username or ""}'.split()
+    }
+    terminos.update(termino for termino, _ in _sufijos(normalizar(telefono), 40))
+    terminos.discard('')
+    return terminos
+
+
+# ---------- Escritura ----------
+
+def indexar_pedidos(pedidos):
+    """(Re)escribe los términos de ``pedidos``: pares (id, número de pedido)."""
+    pedidos = list(pedidos)
+    if not pedidos:
+        return
+    TerminoPedido.objects.filter(pedido_id__in=[pk for pk, _ in pedidos]).delete()
+    TerminoPedido.objects.bulk_create([
+        TerminoPedido(pedido_id=pk, termino=termino, posicion=posicion)
+        for pk, numero in pedidos
+        for termino, posicion in _sufijos(normalizar(numero), 20)
+    ])
+
+
+def indexar_clientes(usuarios):
+    """(Re)escribe los términos de ``usuarios``: tuplas (id, nombre, apellido, usuario, teléfono)."""
+    usuarios = list(usuarios)
+    if not usuarios:
+        return
+    TerminoCliente.objects.filter(cliente_id__in=[fila[0] for fila in usuarios]).delete()
+    TerminoCliente.objects.bulk_create([
+        TerminoCliente(cliente_id=pk, termino=termino)
+        for pk, *campos in usuarios
+        for termino in terminos_cliente(*campos)
+    ])
+
+
+# ---------- Lectura ----------
+
+def _plan_clientes(terminos):
+    """{cliente_id: puntaje} de los clientes que coinciden con todos los términos (2 exacto, 1 prefijo)."""
+    clientes = None
+    for termino in terminos:
+        coincidencias = {}
+        for cliente_id, encontrado in (yield (
+            TerminoCliente.objects.filter(_prefijo(termino))
+            .values_list('cliente_id', 'termino')[:configuracion('MAX_FILAS')]
+        )):
+            coincidencias[cliente_id] = max(coincidencias.get(cliente_id, 0), 2 if encontrado == termino else 1)
+        if clientes is None:
+            clientes = coincidencias
+        else:
+            clientes = {pk: clientes[pk] + puntaje for pk, puntaje in coincidencias.items() if pk in clientes}
+        if not clientes:
+            return {}
+    return clientes or {}
+
+
+def _plan_buscar(texto, limite=None):
+    """Plan de ``buscar`` (core/asincrono.py)."""
+    limite = limite or configuracion('RESULTADOS')
+    terminos = terminos_consulta(texto)
+    if not terminos:
+        return []
+    puntajes = {}
+
+    def sumar(pedido_id, puntaje):
+        puntajes[pedido_id] = max(puntajes.get(pedido_id, 0), puntaje)
+
+    termino = terminos[0]
+    if len(terminos) == 1 and len(termino) >= configuracion('MIN_CARACTERES'):
+        # El comienzo del número y las partes van en consultas separadas para que el tope
+        # de filas no deje fuera las mejores coincidencias
+        terminos_numero = TerminoPedido.objects.filter(_prefijo(termino))
+        for pedido_id, encontrado in (yield (
+            terminos_numero.filter(posicion=0).values_list('pedido_id', 'termino')[:configuracion('MAX_FILAS')]
+        )):
+            sumar(pedido_id, NUMERO_EXACTO if encontrado == termino else COMIENZO_NUMERO)
+        for pedido_id in (yield (
+            terminos_numero.filter(posicion__gt=0).values_list('pedido_id', flat=True)[:configuracion('MAX_FILAS')]
+        )):
+            sumar(pedido_id, PARTE_NUMERO)
+    if len(terminos) == 1 and termino.isdigit() and len(termino) < 19:
+        sumar(int(termino), ID_EXACTO)  # Se descarta abajo si no existe
+
+    clientes = yield from _plan_clientes([palabra for palabra in terminos if len(palabra) >= 2])
+    if clientes:
+        mejores = sorted(clientes, key=clientes.get, reverse=True)[:configuracion('MAX_CLIENTES')]
+        for pedido_id, cliente_id in (yield (
+            Pedido.objects.filter(cliente_id__in=mejores).order_by('-pk').values_list('pk', 'cliente_id')[:limite]
+        )):
+            sumar(pedido_id, CLIENTE + clientes[cliente_id])
+
+    # Uno de más por si el id exacto no existe
+    candidatos = sorted(puntajes, key=lambda pk: (puntajes[pk], pk), reverse=True)[:limite + 1]
+    filas = {
+        fila['pk']: fila
+        for fila in (yield Pedido.objects.filter(pk__in=candidatos).values(
+            'pk', 'numero_pedido', 'estado', 'total', 'fecha_creacion', 'nombre_referencia_cliente',
+            'cliente__first_name', 'cliente__last_name', 'cliente__username', 'cliente__telefono',
+        ))
+    }
+    estados = dict(Pedido.ESTADO_CHOICES)
+    resultados = []
+    for pk in candidatos:
+        fila = filas.get(pk)
+        if fila is None:
+            continue
+        nombre = f"{fila['cliente__first_name'] or ''} {fila['cliente__last_name'] or ''}".strip()
+        resultados.append({
+            'pedido_id': pk,
+            'numero_pedido': fila['numero_pedido'],
+            'cliente': fila['nombre_referencia_cliente'] or nombre or fila['cliente__username'] or '',
+            'telefono': fila['cliente__telefono'] or '',
+            'estado': estados.get(fila['estado'], fila['estado']),
+            'total': str(fila['total']),
+            'fecha': timezone.localtime(fila['fecha_creacion']).strftime('%d/%m/%Y %H:%M'),
+            'url': reverse('admin_pedido_detalle', args=[pk]),
+            'exacto': puntajes[pk] in (NUMERO_EXACTO, ID_EXACTO),
+        })
+    return resultados[:limite]
+
+
+def buscar(texto, limite=None):
+    """
+    Sugerencias para ``texto``: lista de dicts con ``pedido_id``,
+    ``numero_pedido``, ``cliente``, ``telefono``, ``estado``, ``total``,
+    ``fecha``, ``url`` y ``exacto`` (número o id exacto), de mejor a peor.
+    """
+    return ejecutar(_plan_buscar(texto, limite))
+
+
+async def abuscar(texto, limite=None):
+    """``buscar`` para vistas asíncronas."""
+    return await aejecutar(_plan_buscar(texto, limite))
+
+
+def filtro(texto):
+    """Q para listados completos (panel de pedidos): mismo criterio que ``buscar``, sin tope de filas."""
+    terminos = terminos_consulta(texto)
+    if not terminos:
+        return Q()
+    por_cliente = Q()
+    for termino in terminos:
+        por_cliente &= Q(cliente_id__in=TerminoCliente.objects.filter(_prefijo(termino)).values('cliente_id'))
+    if len(terminos) > 1:
+        return por_cliente
+    return por_cliente | Q(pk__in=TerminoPedido.objects.filter(_prefijo(terminos[0])).values('pedido_id'))
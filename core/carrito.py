@@ -0,0 +1,440 @@
+"""
+Operaciones del carrito.
+
+- Cambios de una línea (``agregar_producto``, ``cambiar_cantidad``,
+  ``quitar_item``): cada uno es un ``UPDATE`` atómico condicionado al stock,
+  por ejemplo ``cantidad = cantidad + 1 WHERE ... AND cantidad + 1 <= stock``,
+  sin leer antes la línea, el carrito ni el producto.
+- ``agregar_items`` suma cantidades a un carrito con una lectura de productos,
+  una lectura de las líneas existentes y un único ``INSERT ... ON CONFLICT``
+  (``ON DUPLICATE KEY UPDATE`` en MySQL) sobre ``ItemCarrito``, respetando el
+  ``unique_together`` (carrito, producto).
+- ``CarritoCookie`` es el carrito de los visitantes: {producto_id: cantidad}
+  en una cookie firmada, sin filas en la base de datos. Al iniciar sesión o
+  registrarse se fusiona con el ``Carrito`` del usuario (``fusionar_carrito``)
+  usando ``agregar_items``.
+- ``archivar_abandonados`` copia a ``CarritoAbandonado`` y borra, por lotes,
+  los carritos sin actividad (comando ``limpiar_carritos``).
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Carrito, CarritoAbandonado, ItemCarrito, Producto
+from .promociones import precio_efectivo, precios_efectivos
+
+COOKIE_CARRITO = 'carrito'
+SAL_COOKIE = 'core.carrito'
+
+CONFIGURACION = {
+    'COOKIE_MAX_AGE': 60 * 60 * 24 * 14,  # Segundos que dura el carrito de un visitante
+    'COOKIE_MAX_LINEAS': 40,              # Tope de productos distintos (la cookie no puede pasar de 4 KB)
+    'DIAS_ABANDONO': 30,                  # Días sin actividad para dar un carrito por abandonado
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'CARRITO', {}).get(clave, CONFIGURACION[clave])
+
+
+def _stock_del_producto():
+    """Stock del producto de la línea (NULL si está inactivo, y la comparación falla)."""
+    return Subquery(Producto.objects.filter(pk=OuterRef('producto_id'), activo=True).values('stock')[:1])
+
+
+def _items_de(usuario):
+    """Líneas del carrito del usuario, filtradas por subconsulta (sin JOIN en el UPDATE)."""
+    return ItemCarrito.objects.filter(carrito_id=Subquery(Carrito.objects.filter(usuario=usuario).values('pk')[:1]))
+
+
+def _tocar(carritos):
+    """Marca actividad en el carrito: ``fecha_actualizacion`` decide cuándo se da por abandonado."""
+    carritos.update(fecha_actualizacion=timezone.now())
+
+
+def agregar_producto(usuario, producto_id, cantidad=1, reintentar=True):
+    """Suma ``cantidad`` del producto al carrito si alcanza el stock. Devuelve el id de la línea o None."""
+    items = _items_de(usuario).filter(producto_id=producto_id)
+    if items.filter(cantidad__lte=_stock_del_producto() - cantidad).update(cantidad=F('cantidad') + cantidad):
+        _tocar(Carrito.objects.filter(usuario=usuario))
+        return items.values_list('pk', flat=True).first()
+    if items.exists():
+        return None  # La línea existe pero no alcanza el stock
+    if not Producto.objects.filter(pk=producto_id, activo=True, stock__gte=cantidad).exists():
+        return None
+    # El carrito se crea con el primer producto, no al registrarse
+    carrito, creado = Carrito.objects.get_or_create(usuario=usuario)
+    try:
+        with transaction.atomic():
+            item_id = ItemCarrito.objects.create(carrito=carrito, producto_id=producto_id, cantidad=cantidad).pk
+            if not creado:
+                _tocar(Carrito.objects.filter(pk=carrito.pk))
+            return item_id
+    except IntegrityError:
+        # Solo se reintenta (una vez) si otra petición creó la línea entre medio;
+        # cualquier otra violación (por ejemplo una cantidad inválida) se propaga
+        if not reintentar or not ItemCarrito.objects.filter(carrito=carrito, producto_id=producto_id).exists():
+            raise
+        return agregar_producto(usuario, producto_id, cantidad, reintentar=False)
+
+
+def cambiar_cantidad(usuario, item_id, delta):
+    """
+    Suma o resta una unidad a una línea del usuario. Devuelve 'ok', 'sin_stock',
+    'eliminado' (bajó de 1) o 'no_existe'.
+    """
+    item = _items_de(usuario).filter(pk=item_id)
+    if delta > 0:
+        if item.filter(cantidad__lte=_stock_del_producto() - delta).update(cantidad=F('cantidad') + delta):
+            resultado = 'ok'
+        else:
+            return 'sin_stock' if item.exists() else 'no_existe'
+    elif item.filter(cantidad__gt=-delta).update(cantidad=F('cantidad') + delta):
+        resultado = 'ok'
+    elif item.delete()[0]:
+        resultado = 'eliminado'
+    else:
+        return 'no_existe'
+    _tocar(Carrito.objects.filter(usuario=usuario))
+    return resultado
+
+
+def quitar_item(usuario, item_id):
+    if not _items_de(usuario).filter(pk=item_id).delete()[0]:
+        return False
+    _tocar(Carrito.objects.filter(usuario=usuario))
+    return True
+
+
+def datos_linea(usuario, item_id):
+    """La línea como dict (para respuestas JSON), o None si ya no existe."""
+    fila = _items_de(usuario).filter(pk=item_id).values(
+        'pk', 'cantidad', 'producto_id', 'producto__nombre', 'producto__precio', 'producto__stock',
+        'producto__categoria_id',
+    ).first()
+    if fila is None:
+        return None
+    precio, _ = precio_efectivo(fila['producto_id'], fila['producto__categoria_id'], fila['producto__precio'])
+    return {
+        'id': fila['pk'],
+        'producto_id': fila['producto_id'],
+        'nombre': fila['producto__nombre'],
+        'cantidad': fila['cantidad'],
+        'precio': float(precio),
+        'subtotal': float(precio * fila['cantidad']),
+        'stock': fila['producto__stock'],
+    }
+
+
+def _sumar(lineas):
+    """``lineas``: (producto_id, categoria_id, precio, cantidad). Totales con precios de promoción."""
+    lineas = list(lineas)
+    precios = precios_efectivos((producto_id, categoria_id, precio) for producto_id, categoria_id, precio, _ in lineas)
+    return {
+        'total_items': sum(cantidad for *_, cantidad in lineas),
+        'total_precio': float(sum(precios[producto_id][0] * cantidad for producto_id, _, _, cantidad in lineas)),
+    }
+
+
+def totales(usuario):
+    """Unidades y total del carrito en una consulta."""
+    return _sumar(
+        ItemCarrito.objects.filter(carrito__usuario=usuario)
+        .values_list('producto_id', 'producto__categoria_id', 'producto__precio', 'cantidad')
+    )
+
+
+class LineaReporte:
+    """Resultado de una línea al agregar varias: qué se pidió y qué se pudo agregar."""
+
+    def __init__(self, producto_id, nombre, solicitado, agregado, estado):
+        self.producto_id = producto_id
+        self.nombre = nombre
+        self.solicitado = solicitado
+        self.agregado = agregado
+        self.estado = estado  # 'ok', 'parcial', 'sin_stock', 'no_disponible'
+
+    def como_dict(self):
+        return {
+            'producto_id': self.producto_id,
+            'nombre': self.nombre,
+            'solicitado': self.solicitado,
+            'agregado': self.agregado,
+            'estado': self.estado,
+        }
+
+
+def upsert_items(carrito, cantidades):
+    """Fija la cantidad de cada producto del carrito con un solo INSERT/UPDATE masivo."""
+    if not cantidades:
+        return
+    opciones = {'update_conflicts': True, 'update_fields': ['cantidad']}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = ['carrito', 'producto']
+    ItemCarrito.objects.bulk_create(
+        [ItemCarrito(carrito=carrito, producto_id=producto_id, cantidad=cantidad)
+         for producto_id, cantidad in cantidades.items()],
+        **opciones,
+    )
+    _tocar(Carrito.objects.filter(pk=carrito.pk))
+
+
+def agregar_items(carrito, solicitados, nombres=None):
+    """
+    Suma ``solicitados`` ({producto_id: cantidad}) al carrito sin superar el
+    stock actual. Devuelve una lista de LineaReporte en el mismo orden.
+    ``nombres`` permite informar productos que ya no existen.
+    """
+    nombres = nombres or {}
+    productos = Producto.objects.only('pk', 'nombre', 'activo', 'stock').in_bulk(solicitados.keys())
+    en_carrito = dict(
+        ItemCarrito.objects.filter(carrito=carrito, producto_id__in=solicitados.keys())
+        .values_list('producto_id', 'cantidad')
+    )
+
+    reporte, nuevas = [], {}
+    for producto_id, solicitado in solicitados.items():
+        producto = productos.get(producto_id)
+        if producto is None or not producto.activo:
+            nombre = producto.nombre if producto else nombres.get(producto_id, '')
+            reporte.append(LineaReporte(producto_id, nombre, solicitado, 0, 'no_disponible'))
+            continue
+        actual = en_carrito.get(producto_id, 0)
+        agregado = max(min(solicitado, producto.stock - actual), 0)
+        if agregado:
+            nuevas[producto_id] = actual + agregado
+        if agregado == solicitado:
+            estado = 'ok'
+        elif agregado:
+            estado = 'parcial'
+        else:
+            estado = 'sin_stock'
+        reporte.append(LineaReporte(producto_id, producto.nombre, solicitado, agregado, estado))
+
+    upsert_items(carrito, nuevas)
+    return reporte
+
+
+def repetir_pedido(usuario, pedido):
+    """Copia las líneas de un pedido anterior al carrito del usuario. Devuelve el reporte por línea."""
+    # ``pedido`` puede ser un Pedido o un PedidoArchivado: ambos exponen ``detalles``
+    lineas = (
+        pedido.detalles
+        .values('producto_id', 'producto__nombre')
+        .annotate(cantidad=Sum('cantidad'))
+        .order_by('producto__nombre')
+    )
+    solicitados, nombres = {}, {}
+    for linea in lineas:
+        solicitados[linea['producto_id']] = linea['cantidad']
+        nombres[linea['producto_id']] = linea['producto__nombre']
+    with transaction.atomic():
+        carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+        return agregar_items(carrito, solicitados, nombres)
+
+
+# ---------- Carrito de visitantes (cookie firmada) ----------
+
+class LineaCookie:
+    """Línea del carrito de un visitante, con la misma forma que ItemCarrito para las plantillas."""
+
+    def __init__(self, producto, cantidad):
+        self.id = producto.pk
+        self.producto = producto
+        self.cantidad = cantidad
+
+    @property
+    def subtotal(self):
+        return getattr(self.producto, 'precio_efectivo', self.producto.precio) * self.cantidad
+
+
+class CarritoCookie:
+    """
+    Carrito de un visitante guardado en una cookie firmada. Las líneas se
+    identifican por el id del producto. Solo se lee la base de datos para
+    validar stock o mostrar productos; nunca se escriben filas.
+    """
+
+    def __init__(self, cantidades=None):
+        self.cantidades = cantidades or {}
+        self.modificado = False
+
+    @classmethod
+    def desde(cls, request):
+        try:
+            datos = json.loads(request.get_signed_cookie(
+                COOKIE_CARRITO, salt=SAL_COOKIE, max_age=configuracion('COOKIE_MAX_AGE'),
+            ))
+            cantidades = {int(producto_id): int(cantidad) for producto_id, cantidad in datos.items()}
+        except (KeyError, signing.BadSignature, ValueError, TypeError, AttributeError):
+            return cls()
+        return cls({producto_id: cantidad for producto_id, cantidad in cantidades.items() if cantidad > 0})
+
+    def guardar(self, response):
+        """Escribe la cookie en la respuesta si el carrito cambió (o la borra si quedó vacío)."""
+        if not self.modificado:
+            return response
+        if self.cantidades:
+            response.set_signed_cookie(
+                COOKIE_CARRITO, json.dumps(self.cantidades, separators=(',', ':')), salt=SAL_COOKIE,
+                max_age=configuracion('COOKIE_MAX_AGE'), httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(COOKIE_CARRITO, samesite='Lax')
+        return response
+
+    def vaciar(self):
+        self.cantidades = {}
+        self.modificado = True
+
+    def _fijar(self, producto_id, cantidad):
+        if cantidad > 0:
+            self.cantidades[producto_id] = cantidad
+        else:
+            self.cantidades.pop(producto_id, None)
+        self.modificado = True
+
+    def agregar_producto(self, producto_id, cantidad=1):
+        """Igual que ``agregar_producto``: devuelve el id de la línea o None si no alcanza el stock."""
+        producto_id = int(producto_id)
+        nueva = self.cantidades.get(producto_id, 0) + cantidad
+        if producto_id not in self.cantidades and len(self.cantidades) >= configuracion('COOKIE_MAX_LINEAS'):
+            return None
+        if not Producto.objects.filter(pk=producto_id, activo=True, stock__gte=nueva).exists():
+            return None
+        self._fijar(producto_id, nueva)
+        return producto_id
+
+    def cambiar_cantidad(self, item_id, delta):
+        """Igual que ``cambiar_cantidad``: 'ok', 'sin_stock', 'eliminado' o 'no_existe'."""
+        try:
+            producto_id = int(item_id)
+        except (TypeError, ValueError):
+            return 'no_existe'
+        if producto_id not in self.cantidades:
+            return 'no_existe'
+        nueva = self.cantidades[producto_id] + delta
+        if nueva < 1:
+            self._fijar(producto_id, 0)
+            return 'eliminado'
+        if delta > 0 and not Producto.objects.filter(pk=producto_id, activo=True, stock__gte=nueva).exists():
+            return 'sin_stock'
+        self._fijar(producto_id, nueva)
+        return 'ok'
+
+    def quitar_item(self, item_id):
+        try:
+            producto_id = int(item_id)
+        except (TypeError, ValueError):
+            return False
+        if producto_id not in self.cantidades:
+            return False
+        self._fijar(producto_id, 0)
+        return True
+
+    def lineas(self):
+        """Líneas con su producto (una consulta). Los productos que ya no están activos se omiten."""
+        productos = Producto.objects.filter(activo=True).in_bulk(self.cantidades.keys())
+        return [
+            LineaCookie(productos[producto_id], cantidad)
+            for producto_id, cantidad in self.cantidades.items() if producto_id in productos
+        ]
+
+    def datos_linea(self, item_id):
+        producto_id = int(item_id)
+        if producto_id not in self.cantidades:
+            return None
+        producto = Producto.objects.filter(pk=producto_id).only('nombre', 'precio', 'stock', 'categoria_id').first()
+        if producto is None:
+            return None
+        cantidad = self.cantidades[producto_id]
+        precio, _ = precio_efectivo(producto_id, producto.categoria_id, producto.precio)
+        return {
+            'id': producto_id,
+            'producto_id': producto_id,
+            'nombre': producto.nombre,
+            'cantidad': cantidad,
+            'precio': float(precio),
+            'subtotal': float(precio * cantidad),
+            'stock': producto.stock,
+        }
+
+    @property
+    def total_items(self):
+        return sum(self.cantidades.values())
+
+    def totales(self):
+        productos = Producto.objects.filter(pk__in=self.cantidades.keys(), activo=True).values_list(
+            'pk', 'categoria_id', 'precio',
+        )
+        totales = _sumar(
+            (producto_id, categoria_id, precio, self.cantidades[producto_id])
+            for producto_id, categoria_id, precio in productos
+        )
+        # Las unidades cuentan también productos que dejaron de estar activos, como el contador
+        totales['total_items'] = self.total_items
+        return totales
+
+
+def fusionar_carrito(carrito_cookie, usuario):
+    """
+    Pasa el carrito de la cookie al ``Carrito`` del usuario con un único upsert
+    masivo (ver ``agregar_items``) y vacía la cookie. Devuelve el reporte por línea.
+    """
+    if not carrito_cookie.cantidades:
+        return []
+    with transaction.atomic():
+        carrito, _ = Carrito.objects.get_or_create(usuario=usuario)
+        reporte = agregar_items(carrito, carrito_cookie.cantidades)
+    carrito_cookie.vaciar()
+    return reporte
+
+
+# ---------- Carritos abandonados ----------
+
+def archivar_abandonados(limite, desde_id=0, lote=500):
+    """
+    Archiva y elimina hasta ``lote`` carritos sin actividad desde ``limite``
+    con id mayor a ``desde_id``, en una transacción corta. Los carritos vacíos
+    se borran sin archivar. Devuelve (ids revisados, carritos archivados).
+    """
+    with transaction.atomic():
+        bloqueo = {'skip_locked': True} if connection.features.has_select_for_update_skip_locked else {}
+        carritos = list(
+            Carrito.objects.select_for_update(**bloqueo)
+            .filter(pk__gt=desde_id, fecha_actualizacion__lt=limite)
+            .order_by('pk')
+            .values('pk', 'usuario_id', 'fecha_creacion', 'fecha_actualizacion')[:lote]
+        )
+        if not carritos:
+            return [], 0
+        ids = [carrito['pk'] for carrito in carritos]
+        lineas = {}
+        for carrito_id, producto_id, cantidad, precio in (
+            ItemCarrito.objects.filter(carrito_id__in=ids).order_by('carrito_id', 'pk')
+            .values_list('carrito_id', 'producto_id', 'cantidad', 'producto__precio')
+        ):
+            lineas.setdefault(carrito_id, []).append([producto_id, cantidad, str(precio)])
+
+        archivo = [
+            CarritoAbandonado(
+                usuario_id=carrito['usuario_id'],
+                cantidad_items=sum(cantidad for _, cantidad, _ in lineas[carrito['pk']]),
+                total=sum(cantidad * Decimal(precio) for _, cantidad, precio in lineas[carrito['pk']]),
+                lineas=lineas[carrito['pk']],
+                fecha_creacion=carrito['fecha_creacion'],
+                ultima_actividad=carrito['fecha_actualizacion'],
+            )
+            for carrito in carritos if carrito['pk'] in lineas
+        ]
+        CarritoAbandonado.objects.bulk_create(archivo)
+        # ItemCarrito no tiene señales ni dependientes: ambos DELETE van por lote, sin cargar filas
+        ItemCarrito.objects.filter(carrito_id__in=ids).delete()
+        Carrito.objects.filter(pk__in=ids).delete()
+    return ids, len(archivo)
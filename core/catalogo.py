@@ -0,0 +1,108 @@
+"""
+Caché de los listados de productos (catálogo y POS) y eventos de stock.
+
+Los listados se guardan completos en la caché bajo una clave versionada;
+invalidar es cambiar la versión, así no hay que conocer qué claves existen.
+La versión cambia cuando un producto se edita y cuando un movimiento de stock
+cruza el cero (señal ``umbral_stock`` de ``core/inventario.py``), por lo que
+un producto agotado desaparece del catálogo al instante sin que el listado
+consulte el stock en cada petición. Las cantidades mostradas pueden tener
+hasta ``TIMEOUT`` segundos de atraso; la disponibilidad no.
+
+Los eventos (agotado/repuesto) se publican en la caché con un número
+correlativo para que el POS y la cocina los lean con ``eventos_desde``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Producto
+
+CLAVE_SECUENCIA = 'stock:eventos:secuencia'
+MAX_EVENTOS = 100
+
+CONFIGURACION = {
+    'TIMEOUT': 30,              # Segundos que vive un listado en la caché
+    'EVENTOS_TIMEOUT': 3600,
+}
+
+LISTADOS = {
+    'catalogo': lambda: Producto.objects.filter(activo=True, stock__gt=0).select_related('categoria').order_by('nombre'),
+    'pos': lambda: Producto.objects.filter(activo=True).select_related('categoria').order_by('categoria__nombre', 'nombre'),
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'CATALOGO', {}).get(clave, CONFIGURACION[clave])
+
+
+# ---------- Listados ----------
+
+def version_listado(listado):
+    return cache.get_or_set(f'productos:{listado}:version', time.time_ns, None)
+
+
+def invalidar_productos(*listados):
+    """Descarta los listados indicados (todos si no se indica ninguno)."""
+    for listado in listados or LISTADOS:
+        cache.set(f'productos:{listado}:version', time.time_ns(), None)
+
+
+def productos_listado(listado):
+    """Lista de productos del listado ('catalogo' o 'pos'), desde la caché si está vigente."""
+    clave = f'productos:{listado}:{version_listado(listado)}'
+    productos = cache.get(clave)
+    if productos is None:
+        productos = list(LISTADOS[listado]())
+        cache.set(clave, productos, configuracion('TIMEOUT'))
+    return productos
+
+
+# ---------- Eventos de stock ----------
+
+def publicar_evento(tipo, producto_id, stock):
+    """Agrega un evento al feed. Cada evento va en su propia clave para no pisarse entre procesos."""
+    cache.add(CLAVE_SECUENCIA, 0, None)
+    numero = cache.incr(CLAVE_SECUENCIA)
+    nombre = Producto.objects.filter(pk=producto_id).values_list('nombre', flat=True).first()
+    evento = {
+        'id': numero,
+        'tipo': tipo,
+        'producto_id': producto_id,
+        'nombre': nombre,
+        'stock': stock,
+        'fecha': timezone.now().isoformat(),
+    }
+    cache.set(f'stock:eventos:{numero}', evento, configuracion('EVENTOS_TIMEOUT'))
+    return evento
+
+
+def cursor_eventos():
+    return cache.get(CLAVE_SECUENCIA) or 0
+
+
+def _claves_eventos(ultimo, actual):
+    return [f'stock:eventos:{n}' for n in range(max(ultimo + 1, actual - MAX_EVENTOS + 1), actual + 1)]
+
+
+def eventos_desde(ultimo):
+    """Eventos posteriores a ``ultimo`` (como máximo los MAX_EVENTOS más recientes) y el nuevo cursor."""
+    actual = cursor_eventos()
+    if ultimo >= actual:
+        # Sin novedades (o la caché se reinició y el cursor del cliente quedó adelante)
+        return [], actual
+    claves = _claves_eventos(ultimo, actual)
+    encontrados = cache.get_many(claves)
+    return [encontrados[clave] for clave in claves if clave in encontrados], actual
+
+
+async def aeventos_desde(ultimo):
+    """``eventos_desde`` con la API asíncrona de la caché."""
+    actual = await cache.aget(CLAVE_SECUENCIA) or 0
+    if ultimo >= actual:
+        return [], actual
+    claves = _claves_eventos(ultimo, actual)
+    encontrados = await cache.aget_many(claves)
+    return [encontrados[clave] for clave in claves if clave in encontrados], actual
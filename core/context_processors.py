@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from .carrito import CarritoCookie, totales
+
+
+def carrito(request):
+    """Unidades del carrito para el contador de la barra de navegación (una consulta, solo si se usa)."""
+    if not request.user.is_authenticated:
+        # El de los visitantes se cuenta desde la cookie, sin tocar la base de datos
+        return {'total_carrito': CarritoCookie.desde(request).total_items}
+    return {'total_carrito': SimpleLazyObject(lambda: totales(request.user)['total_items'])}
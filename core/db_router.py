@@ -0,0 +1,118 @@
+"""
+Enrutamiento de lecturas hacia la réplica de la base de datos.
+
+Las lecturas solo van a la réplica dentro de ``using_replica()``; todo lo
+demás sigue usando ``default``. Para respetar "leer lo que uno escribió",
+cualquier escritura fija al primario el resto de la petición y, mediante
+``FijarPrimarioMiddleware``, las peticiones de ese navegador durante
+``REPLICA_PIN_SEGUNDOS``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+ALIAS_REPLICA = 'replica'
+COOKIE_PRIMARIO = 'cf_primario'
+
+_replica_activa = ContextVar('replica_activa', default=False)
+_fijado_primario = ContextVar('fijado_primario', default=False)
+_hubo_escritura = ContextVar('hubo_escritura', default=False)
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+@contextmanager
+def using_replica():
+    """
+    Envía a la réplica las lecturas del bloque. Se puede usar como
+    ``with using_replica():`` o como decorador ``@using_replica()`` en vistas
+    de solo lectura.
+    """
+    token = _replica_activa.set(True)
+    try:
+        yield
+    finally:
+        _replica_activa.reset(token)
+
+
+def fijar_primario():
+    """Obliga a que las lecturas siguientes del contexto actual usen el primario."""
+    _fijado_primario.set(True)
+
+
+def fijado_primario():
+    return _fijado_primario.get()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_activa.get() and not _fijado_primario.get() and replica_configurada():
+            return ALIAS_REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        fijar_primario()
+        _hubo_escritura.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y primario contienen los mismos datos
+        return True
+
+
+class FijarPrimarioMiddleware:
+    """
+    Lee la cookie de "escritura reciente" al comienzo de la petición y la
+    emite si durante la petición se escribió en la base de datos.
+
+    Es síncrono y asíncrono, como el resto de MIDDLEWARE, para que bajo ASGI
+    las vistas ``async def`` corran en el event loop sin pasar por un hilo.
+    Las consultas del ORM asíncrono corren en un hilo con una copia del
+    contexto que asgiref devuelve al terminar, así que las variables de
+    contexto de este módulo se ven igual en los dos modos.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        token_fijado = _fijado_primario.set(COOKIE_PRIMARIO in request.COOKIES)
+        token_escritura = _hubo_escritura.set(False)
+        try:
+            response = self.get_response(request)
+            escribio = _hubo_escritura.get()
+        finally:
+            _fijado_primario.reset(token_fijado)
+            _hubo_escritura.reset(token_escritura)
+        return self._marcar(response, escribio)
+
+    async def __acall__(self, request):
+        token_fijado = _fijado_primario.set(COOKIE_PRIMARIO in request.COOKIES)
+        token_escritura = _hubo_escritura.set(False)
+        try:
+            response = await self.get_response(request)
+            escribio = _hubo_escritura.get()
+        finally:
+            _fijado_primario.reset(token_fijado)
+            _hubo_escritura.reset(token_escritura)
+        return self._marcar(response, escribio)
+
+    def _marcar(self, response, escribio):
+        if escribio and replica_configurada():
+            response.set_cookie(
+                COOKIE_PRIMARIO, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SEGUNDOS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,290 @@
+"""
+Motor de despacho: asigna automáticamente repartidores a los pedidos delivery.
+
+Mantiene en memoria una cola de prioridad (heap) con los repartidores
+disponibles. El puntaje de cada repartidor combina su carga actual (pedidos
+``listo``/``en_camino`` asignados), su ``calificacion_promedio`` y el tiempo
+que lleva sin entregar; menor puntaje = mejor candidato. La cola se actualiza
+con las señales de ``core.signals`` cuando cambia un pedido o un repartidor, y
+se reconstruye desde la base de datos cada ``RECARGA_SEGUNDOS`` para
+corregir cambios hechos por otros procesos.
+
+La base de datos sigue siendo la fuente de verdad: la asignación es un
+``UPDATE`` condicionado a que el pedido siga listo y sin repartidor, dentro de
+una transacción que bloquea las filas de los repartidores elegidos y relee su
+carga real. Así varios procesos (workers web y ``despachar_pedidos``) con
+colas desactualizadas no superan ``MAX_PEDIDOS_POR_REPARTIDOR``.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Pedido, Repartidor
+
+# Estados en los que un pedido cuenta como carga del repartidor
+ESTADOS_CARGA = ['listo', 'en_camino']
+
+CONFIGURACION = {
+    'AUTOMATICO': True,             # Asignar al pasar a "listo"
+    'MAX_PEDIDOS_POR_REPARTIDOR': 3,
+    'PESO_CARGA': 10.0,
+    'PESO_CALIFICACION': 2.0,
+    'PESO_ESPERA': 0.2,             # Por minuto sin entregar
+    'ESPERA_MAXIMA_MINUTOS': 60,
+    'RECARGA_SEGUNDOS': 60,
+    'AGRUPAR_RUTAS': True,          # En lote, un repartidor recibe rutas de varias paradas (core/rutas.py)
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'DESPACHO', {}).get(clave, CONFIGURACION[clave])
+
+
+class MotorDespacho:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._heap = []
+        self._repartidores = {}
+        self._contador = itertools.count()
+        self._cargado_en = None
+
+    # ---------- Estado de la cola ----------
+
+    @staticmethod
+    def _filas(repartidores):
+        """
+        (pk, calificación, carga, última entrega) de cada repartidor disponible.
+        Las subconsultas solo leen los pedidos en curso y las entregas dentro de
+        ``ESPERA_MAXIMA_MINUTOS`` (una más antigua da el mismo puntaje), no el historial.
+        """
+        desde = timezone.now() - timedelta(minutes=configuracion('ESPERA_MAXIMA_MINUTOS'))
+        pedidos = Pedido.objects.filter(repartidor=OuterRef('pk')).order_by().values('repartidor')
+        return repartidores.filter(disponible=True).annotate(
+            carga=Coalesce(Subquery(
+                pedidos.filter(estado__in=ESTADOS_CARGA).annotate(n=Count('pk')).values('n')
+            ), 0),
+            libre_desde=Subquery(
+                pedidos.filter(fecha_entrega__gte=desde).annotate(ultima=Max('fecha_entrega')).values('ultima')
+            ),
+        ).values_list('pk', 'calificacion_promedio', 'carga', 'libre_desde')
+
+    def recargar(self):
+        """Reconstruye la cola con una sola consulta."""
+        filas = self._filas(Repartidor.objects.all())
+        with self._lock:
+            self._heap = []
+            self._repartidores = {}
+            for pk, calificacion, carga, libre_desde in filas:
+                self._registrar(pk, calificacion, carga, libre_desde)
+            self._cargado_en = time.monotonic()
+
+    def _vigente(self):
+        if self._cargado_en is None or time.monotonic() - self._cargado_en > configuracion('RECARGA_SEGUNDOS'):
+            self.recargar()
+
+    def _registrar(self, pk, calificacion, carga, libre_desde):
+        datos = {
+            'calificacion': float(calificacion),
+            'carga': carga,
+            'libre_desde': libre_desde,
+            'version': next(self._contador),
+        }
+        self._repartidores[pk] = datos
+        heapq.heappush(self._heap, (self._puntaje(datos), datos['version'], pk))
+
+    def _puntaje(self, datos):
+        if datos['libre_desde']:
+            espera = (timezone.now() - datos['libre_desde']).total_seconds() / 60
+        else:
+            espera = configuracion('ESPERA_MAXIMA_MINUTOS')
+        espera = min(max(espera, 0), configuracion('ESPERA_MAXIMA_MINUTOS'))
+        return (
+            datos['carga'] * configuracion('PESO_CARGA')
+            - datos['calificacion'] * configuracion('PESO_CALIFICACION')
+            - espera * configuracion('PESO_ESPERA')
+        )
+
+    def actualizar_repartidor(self, repartidor_id):
+        """Relee un repartidor (tras un cambio de estado) y actualiza su entrada en la cola."""
+        if self._cargado_en is None:
+            return  # La cola aún no se usa: se cargará completa cuando haga falta
+        fila = self._filas(Repartidor.objects.filter(pk=repartidor_id)).first()
+        with self._lock:
+            # La entrada anterior queda invalidada por versión
+            self._repartidores.pop(repartidor_id, None)
+            if fila:
+                self._registrar(*fila)
+
+    def descartar_repartidor(self, repartidor_id):
+        with self._lock:
+            self._repartidores.pop(repartidor_id, None)
+
+    def _tomar_mejor(self, necesarios=1):
+        """
+        Saca de la cola el mejor repartidor con al menos ``necesarios`` cupos
+        libres. Devuelve su id o None. Los que tienen cupos pero no alcanzan
+        vuelven a la cola.
+        """
+        maximo = configuracion('MAX_PEDIDOS_POR_REPARTIDOR')
+        apartados = []
+        try:
+            while self._heap:
+                entrada = heapq.heappop(self._heap)
+                _, version, pk = entrada
+                datos = self._repartidores.get(pk)
+                if datos is None or datos['version'] != version:
+                    continue  # Entrada obsoleta
+                libres = maximo - datos['carga']
+                if libres <= 0:
+                    # Sin capacidad: sale de la cola hasta que actualizar_repartidor lo vuelva a agregar
+                    self._repartidores.pop(pk)
+                    continue
+                if libres < necesarios:
+                    apartados.append(entrada)
+                    continue
+                return pk
+            return None
+        finally:
+            for entrada in apartados:
+                heapq.heappush(self._heap, entrada)
+
+    def _cupos(self, pk):
+        return configuracion('MAX_PEDIDOS_POR_REPARTIDOR') - self._repartidores[pk]['carga']
+
+    def _sumar_carga(self, pk, cantidad=1):
+        self._fijar_carga(pk, self._repartidores[pk]['carga'] + cantidad)
+
+    def _fijar_carga(self, pk, carga):
+        datos = self._repartidores[pk]
+        datos['carga'] = carga
+        datos['version'] = next(self._contador)
+        heapq.heappush(self._heap, (self._puntaje(datos), datos['version'], pk))
+
+    @staticmethod
+    def _cargas_bloqueadas(repartidor_ids):
+        """
+        Bloquea las filas de los repartidores hasta el fin de la transacción y
+        devuelve {id: carga real}. Otro proceso que asigne a los mismos
+        repartidores espera aquí y luego ve la carga ya actualizada.
+        """
+        repartidor_ids = sorted(repartidor_ids)
+        list(Repartidor.objects.select_for_update().filter(pk__in=repartidor_ids).order_by('pk').values_list('pk', flat=True))
+        cargas = dict.fromkeys(repartidor_ids, 0)
+        cargas.update(
+            Pedido.objects.filter(repartidor_id__in=repartidor_ids, estado__in=ESTADOS_CARGA)
+            .order_by().values_list('repartidor_id').annotate(n=Count('pk'))
+        )
+        return cargas
+
+    # ---------- Asignación ----------
+
+    def asignar_pedido(self, pedido_id):
+        """Asigna un pedido delivery listo. Devuelve el id del repartidor o None."""
+        maximo = configuracion('MAX_PEDIDOS_POR_REPARTIDOR')
+        with self._lock:
+            self._vigente()
+            while True:
+                repartidor_id = self._tomar_mejor()
+                if repartidor_id is None:
+                    return None
+                with transaction.atomic():
+                    carga = self._cargas_bloqueadas([repartidor_id])[repartidor_id]
+                    actualizados = carga < maximo and Pedido.objects.filter(
+                        pk=pedido_id, tipo_orden='delivery', estado='listo', repartidor__isnull=True,
+                    ).update(repartidor_id=repartidor_id)
+                if carga >= maximo:
+                    # Otro proceso lo llenó: se corrige su carga (sale de la cola) y se prueba el siguiente
+                    self._fijar_carga(repartidor_id, carga)
+                    continue
+                if actualizados:
+                    self._fijar_carga(repartidor_id, carga + 1)
+                    return repartidor_id
+                # El pedido ya no estaba pendiente: el repartidor vuelve a la cola con su carga real
+                self._fijar_carga(repartidor_id, carga)
+                return None
+
+    def asignar_pendientes(self, limite=None, agrupar_rutas=None):
+        """
+        Modo por lotes: asigna todos los pedidos delivery listos sin repartidor,
+        del que más espera al más reciente, con un único UPDATE. Si
+        ``agrupar_rutas`` está activo, los pedidos cercanos y listos a la vez
+        forman una ruta que va completa a un mismo repartidor.
+        Devuelve un dict {pedido_id: repartidor_id}.
+        """
+        from .rutas import agrupar_pedidos
+
+        if agrupar_rutas is None:
+            agrupar_rutas = configuracion('AGRUPAR_RUTAS')
+        pendientes = Pedido.objects.filter(
+            tipo_orden='delivery', estado='listo', repartidor__isnull=True,
+        ).order_by(Coalesce('fecha_listo', 'fecha_creacion'), 'pk').only(
+            'pk', 'direccion_entrega', 'fecha_listo', 'fecha_creacion',
+        )
+        if limite:
+            pendientes = pendientes[:limite]
+        if agrupar_rutas:
+            grupos = [[p.pk for p in ruta] for ruta in agrupar_pedidos(list(pendientes))]
+        else:
+            grupos = [[p.pk] for p in pendientes]
+
+        asignaciones = {}
+        with self._lock:
+            self._vigente()
+            for grupo in grupos:
+                # La ruta completa a un repartidor con cupo para todas sus paradas; si no hay
+                # ninguno, se divide entre los mejores según sus cupos libres
+                while grupo:
+                    repartidor_id = self._tomar_mejor(len(grupo)) or self._tomar_mejor()
+                    if repartidor_id is None:
+                        break
+                    cupos = self._cupos(repartidor_id)
+                    parte, grupo = grupo[:cupos], grupo[cupos:]
+                    for pedido_id in parte:
+                        asignaciones[pedido_id] = repartidor_id
+                        self._sumar_carga(repartidor_id)
+                if grupo:
+                    break  # Sin repartidores con cupo
+
+            if asignaciones:
+                maximo = configuracion('MAX_PEDIDOS_POR_REPARTIDOR')
+                with transaction.atomic():
+                    # Lo que otro proceso asignó desde la última recarga también cuenta: se descartan
+                    # las asignaciones que superarían el máximo (esos pedidos quedan pendientes)
+                    cargas = self._cargas_bloqueadas(set(asignaciones.values()))
+                    nuevas = Counter()
+                    for pedido_id, rid in list(asignaciones.items()):
+                        if cargas[rid] + nuevas[rid] >= maximo:
+                            del asignaciones[pedido_id]
+                            self._cargado_en = None
+                        else:
+                            nuevas[rid] += 1
+                    if asignaciones:
+                        Pedido.objects.filter(
+                            pk__in=asignaciones.keys(), tipo_orden='delivery', estado='listo', repartidor__isnull=True,
+                        ).update(repartidor_id=Case(
+                            *[When(pk=pedido_id, then=Value(rid)) for pedido_id, rid in asignaciones.items()],
+                            default=F('repartidor_id'),
+                            output_field=BigIntegerField(),
+                        ))
+                # Algún pedido pudo cambiar entre la lectura y el UPDATE: se recarga la verdad
+                asignados = dict(
+                    Pedido.objects.filter(pk__in=asignaciones.keys()).values_list('pk', 'repartidor_id')
+                )
+                perdidos = [pk for pk, rid in asignaciones.items() if asignados.get(pk) != rid]
+                if perdidos:
+                    self._cargado_en = None
+                    for pk in perdidos:
+                        del asignaciones[pk]
+        return asignaciones
+
+
+motor = MotorDespacho()
@@ -0,0 +1,165 @@
+"""
+Archivos estáticos para producción (``collectstatic``).
+
+``EstaticosOptimizados`` extiende ``ManifestStaticFilesStorage``:
+
+1. Optimiza las imágenes con Pillow antes de calcular su hash. Los JPEG y PNG
+   se enderezan según su orientación EXIF (la etiqueta no se conserva al
+   recodificar), se reducen a ``LADO_MAXIMO`` px y se recodifican. En los SVG se tratan igual
+   las imágenes embebidas (``data:image/png;base64,...``); un PNG sin
+   transparencia pasa a JPEG. Si el resultado no es más chico queda el original.
+2. Guarda cada archivo con el hash de su contenido en el nombre
+   (``core/js/carrito.3f2a9c1be0d4.js``) y escribe ``staticfiles.json``.
+   ``{% static %}`` usa esos nombres, así que se pueden servir con caché de un
+   año (``immutable``): un cambio en el archivo cambia su URL.
+3. Escribe junto a cada archivo de texto su versión ``.gz`` y, si está
+   instalado ``brotli``, ``.br``, para que nginx o WhiteNoise no compriman en
+   cada petición.
+
+Los originales de ``core/static`` no se modifican.
+"""
+import base64
+import gzip
+import io
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+try:
+    import brotli
+except ImportError:  # Opcional: pip install brotli
+    brotli = None
+
+CONFIGURACION = {
+    'LADO_MAXIMO': 1200,          # Px del lado mayor de una imagen
+    'CALIDAD_JPEG': 80,
+    'MIN_BYTES_COMPRIMIR': 256,   # Archivos más chicos no se comprimen
+}
+
+IMAGENES = ('.jpg', '.jpeg', '.png')
+COMPRIMIBLES = ('.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.xml', '.html', '.ico')
+
+_EMBEBIDA = re.compile(rb'data:image/(png|jpeg|jpg);base64,([A-Za-z0-9+/=\s]+)')
+
+
+def configuracion(clave):
+    return getattr(settings, 'ESTATICOS', {}).get(clave, CONFIGURACION[clave])
+
+
+def _codificar(imagen, formato):
+    salida = io.BytesIO()
+    if formato == 'JPEG':
+        imagen.convert('RGB').save(
+            salida, 'JPEG', quality=configuracion('CALIDAD_JPEG'), optimize=True, progressive=True,
+        )
+    else:
+        imagen.save(salida, 'PNG', optimize=True)
+    return salida.getvalue()
+
+
+def _opaca(imagen):
+    if imagen.mode in ('RGB', 'L'):
+        return True
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        return imagen.convert('RGBA').getchannel('A').getextrema() == (255, 255)
+    return False
+
+
+def optimizar_imagen(datos, extension, permitir_jpeg=False):
+    """
+    (bytes, extensión) de la imagen reducida y recodificada, o None si no se
+    pudo leer o no quedó más chica. Con ``permitir_jpeg`` un PNG sin
+    transparencia se devuelve como JPEG.
+    """
+    try:
+        imagen = Image.open(io.BytesIO(datos))
+        imagen.load()
+    except (UnidentifiedImageError, OSError):
+        return None
+    # Las fotos de cámara guardan la rotación en EXIF: se aplica antes de reducir
+    imagen = ImageOps.exif_transpose(imagen)
+    lado = configuracion('LADO_MAXIMO')
+    imagen.thumbnail((lado, lado), Image.LANCZOS)
+    if extension in ('.jpg', '.jpeg'):
+        nuevo = _codificar(imagen, 'JPEG'), extension
+    elif permitir_jpeg and _opaca(imagen):
+        nuevo = _codificar(imagen, 'JPEG'), '.jpg'
+    else:
+        nuevo = _codificar(imagen, 'PNG'), '.png'
+    return nuevo if len(nuevo[0]) < len(datos) else None
+
+
+def optimizar_svg(datos):
+    """El SVG con sus imágenes embebidas optimizadas, o None si no tenía o no cambió."""
+    def reemplazar(coincidencia):
+        extension = '.png' if coincidencia.group(1) == b'png' else '.jpg'
+        optimizada = optimizar_imagen(base64.b64decode(coincidencia.group(2)), extension, permitir_jpeg=True)
+        if optimizada is None:
+            return coincidencia.group(0)
+        contenido, extension = optimizada
+        tipo = b'png' if extension == '.png' else b'jpeg'
+        return b'data:image/' + tipo + b';base64,' + base64.b64encode(contenido)
+
+    nuevo = _EMBEBIDA.sub(reemplazar, datos)
+    return nuevo if len(nuevo) < len(datos) else None
+
+
+def comprimir(datos):
+    """{'.gz': bytes, '.br': bytes} con las versiones que ahorran al menos un 5 %."""
+    versiones = {'.gz': gzip.compress(datos, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versiones['.br'] = brotli.compress(datos, quality=11)
+    return {sufijo: contenido for sufijo, contenido in versiones.items() if len(contenido) < len(datos) * 0.95}
+
+
+class EstaticosOptimizados(ManifestStaticFilesStorage):
+    """``ManifestStaticFilesStorage`` con imágenes optimizadas y versiones .gz/.br (ver arriba)."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        # collectstatic ya copió los originales: las imágenes se reemplazan aquí y el hash
+        # se calcula sobre la copia optimizada (por eso después se lee desde este almacenamiento)
+        paths = dict(paths)
+        for ruta, (origen, ruta_origen) in list(paths.items()):
+            if self._optimizar(ruta, origen, ruta_origen):
+                paths[ruta] = (self, ruta)
+
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        for nombre in sorted(set(self.hashed_files.values())):
+            if not nombre.lower().endswith(COMPRIMIBLES):
+                continue
+            with self.open(nombre) as archivo:
+                datos = archivo.read()
+            if len(datos) < configuracion('MIN_BYTES_COMPRIMIR'):
+                continue
+            for sufijo, contenido in comprimir(datos).items():
+                self._reemplazar(nombre + sufijo, contenido)
+                yield nombre, nombre + sufijo, True
+
+    def _optimizar(self, ruta, origen, ruta_origen):
+        """Reemplaza la copia de una imagen por su versión optimizada. Devuelve True si la reemplazó."""
+        extension = ruta[ruta.rfind('.'):].lower() if '.' in ruta else ''
+        if extension not in IMAGENES + ('.svg',):
+            return False
+        # Siempre desde el original: otro collectstatic no vuelve a recodificar la copia
+        with origen.open(ruta_origen) as archivo:
+            datos = archivo.read()
+        if extension == '.svg':
+            nuevo = optimizar_svg(datos)
+        else:
+            optimizada = optimizar_imagen(datos, extension)
+            nuevo = optimizada[0] if optimizada else None
+        if nuevo is None:
+            return False
+        self._reemplazar(ruta, nuevo)
+        return True
+
+    def _reemplazar(self, nombre, contenido):
+        if self.exists(nombre):
+            self.delete(nombre)
+        self._save(nombre, ContentFile(contenido))
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from .models import Usuario, Producto,Repartidor
+from .models import Usuario, Producto,Repartidor, Reclamo
+from .inventario import guardar_producto
 from django.core.exceptions import ValidationError
 import re
 
@@ -189,6 +190,29 @@ class ResetPasswordForm(forms.Form):
     )
 
 class ProductoForm(forms.ModelForm):
+    # Stock que vio el usuario al abrir el formulario: se guarda la diferencia, no el valor
+    stock_original = forms.IntegerField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, usuario=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.usuario = usuario
+        if self.instance.pk:
+            self.fields['stock_original'].initial = self.instance.stock
+
+    def save(self, commit=True):
+        producto = super().save(commit=False)
+        if not commit:
+            return producto
+        stock_mostrado = self.cleaned_data.get('stock_original')
+        if stock_mostrado is None and producto.pk:
+            stock_mostrado = self.initial.get('stock')
+        guardar_producto(
+            producto, self.cleaned_data['stock'], stock_mostrado,
+            usuario=self.usuario, nota='Edición desde el panel',
+        )
+        self.save_m2m()
+        return producto
+
     class Meta:
         model = Producto
         fields = [ 'nombre', 'descripcion', 'precio', 'imagen', 'stock', 'categoria', 'activo', 'en_promocion' ]
@@ -204,6 +228,29 @@ class ProductoForm(forms.ModelForm):
                 'en_promocion': forms.CheckboxInput(attrs={'class': TAILWIND_CHECKBOX_CLASSES}),
             }
 
+class ReclamoClienteForm(forms.ModelForm):
+    """Reclamo que presenta un cliente desde "Mis Pedidos" (el pedido viene en la URL)."""
+
+    class Meta:
+        model = Reclamo
+        fields = ['motivo', 'descripcion']
+        labels = {
+            'motivo': 'Motivo',
+            'descripcion': 'Cuéntanos qué pasó',
+        }
+        widgets = {
+            'motivo': forms.Select(attrs={'class': TAILWIND_SELECT_CLASSES}),
+            'descripcion': forms.Textarea(attrs={'class': TAILWIND_TEXTAREA_CLASSES, 'rows': 3, 'maxlength': 1000}),
+        }
+
+    def clean_descripcion(self):
+        descripcion = self.cleaned_data['descripcion'].strip()
+        if len(descripcion) < 10:
+            raise ValidationError('Describe el problema con al menos 10 caracteres.')
+        if len(descripcion) > 1000:
+            raise ValidationError('La descripción no puede superar los 1000 caracteres.')
+        return descripcion
+
 class RepartidorForm(forms.Form):
     username = forms.CharField(
         label='Nombre de Usuario', required=True,
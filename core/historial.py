@@ -0,0 +1,130 @@
+"""
+Historial de pedidos del cliente ("Mis Pedidos").
+
+Cada pedido tiene un ``ResumenPedido`` con lo que muestra el historial
+(cantidad de ítems, primeros productos, miniatura y totales). La página se
+arma con una consulta por página sobre el índice (cliente, -fecha, -pedido)
+usando paginación por cursor (keyset): la página siguiente empieza donde
+terminó la anterior, sin ``OFFSET``, así la página 30 cuesta lo mismo que la 1.
+
+Los pedidos archivados (core/archivo.py) guardan las mismas columnas en
+``PedidoArchivado``: cada página consulta las dos tablas con el mismo cursor
+y mezcla los resultados, así el historial llega a los pedidos antiguos.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from .models import DetallePedido, Pedido, PedidoArchivado, ResumenPedido
+
+PRODUCTOS_EN_RESUMEN = 3
+POR_PAGINA = 10
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def construir_resumen(pedido, lineas):
+    """
+    Arma (sin guardar) el resumen de ``pedido``. ``lineas`` son tuplas
+    (nombre del producto, nombre del archivo de imagen, cantidad) en orden.
+    """
+    nombres, miniatura = [], ''
+    for nombre, imagen, _ in lineas:
+        if nombre not in nombres:
+            nombres.append(nombre)
+        if imagen and not miniatura:
+            miniatura = default_storage.url(imagen)
+    return ResumenPedido(
+        pedido_id=pedido.pk,
+        cliente_id=pedido.cliente_id,
+        numero_pedido=pedido.numero_pedido,
+        tipo_orden=pedido.tipo_orden,
+        estado=pedido.estado,
+        subtotal=pedido.subtotal,
+        costo_envio=pedido.costo_envio,
+        total=pedido.total,
+        cantidad_items=sum(cantidad for _, _, cantidad in lineas),
+        productos=', '.join(nombres[:PRODUCTOS_EN_RESUMEN])[:255],
+        productos_restantes=max(len(nombres) - PRODUCTOS_EN_RESUMEN, 0),
+        miniatura=miniatura,
+        fecha_creacion=pedido.fecha_creacion,
+    )
+
+
+def escribir_resumenes(pedido_ids):
+    """(Re)escribe los resúmenes de los pedidos indicados con dos lecturas y un bulk_create."""
+    pedido_ids = list(pedido_ids)
+    lineas = {}
+    detalles = (
+        DetallePedido.objects.filter(pedido_id__in=pedido_ids)
+        .order_by('pedido_id', 'pk')
+        .values_list('pedido_id', 'producto__nombre', 'producto__imagen', 'cantidad')
+    )
+    for pedido_id, nombre, imagen, cantidad in detalles:
+        lineas.setdefault(pedido_id, []).append((nombre, imagen, cantidad))
+
+    pedidos = Pedido.objects.filter(pk__in=pedido_ids).order_by().only(
+        'pk', 'cliente_id', 'numero_pedido', 'tipo_orden', 'estado',
+        'subtotal', 'costo_envio', 'total', 'fecha_creacion',
+    )
+    resumenes = [construir_resumen(pedido, lineas.get(pedido.pk, [])) for pedido in pedidos]
+    ResumenPedido.objects.filter(pedido_id__in=pedido_ids).delete()
+    ResumenPedido.objects.bulk_create(resumenes)
+    return resumenes
+
+
+def escribir_resumen(pedido_id):
+    escribir_resumenes([pedido_id])
+
+
+def actualizar_estado(pedido):
+    """Un cambio de estado o de totales solo toca las columnas copiadas del pedido."""
+    ResumenPedido.objects.filter(pedido_id=pedido.pk).update(
+        estado=pedido.estado, subtotal=pedido.subtotal,
+        costo_envio=pedido.costo_envio, total=pedido.total,
+    )
+
+
+# ---------- Paginación por cursor ----------
+
+def codificar_cursor(resumen):
+    microsegundos = (resumen.fecha_creacion - _EPOCA) // timedelta(microseconds=1)
+    return f'{microsegundos}.{resumen.pedido_id}'
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, pedido_id) o None si el cursor no es válido."""
+    try:
+        microsegundos, pedido_id = (int(parte) for parte in cursor.split('.'))
+        return _EPOCA + timedelta(microseconds=microsegundos), pedido_id
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _pagina(consulta, campo_id, posicion, cantidad):
+    if posicion:
+        fecha, pedido_id = posicion
+        consulta = consulta.filter(
+            Q(fecha_creacion__lt=fecha) | Q(fecha_creacion=fecha, **{f'{campo_id}__lt': pedido_id})
+        )
+    return list(consulta.order_by('-fecha_creacion', f'-{campo_id}')[:cantidad])
+
+
+def pagina_historial(usuario, cursor=None, por_pagina=POR_PAGINA):
+    """
+    Una página del historial de ``usuario`` (pedidos activos y archivados).
+    Devuelve (resúmenes, cursor de la siguiente o None).
+    """
+    posicion = decodificar_cursor(cursor) if cursor else None
+    # Se pide una fila de más para saber si hay otra página
+    pagina = _pagina(ResumenPedido.objects.filter(cliente=usuario), 'pedido_id', posicion, por_pagina + 1)
+    archivados = PedidoArchivado.objects.filter(cliente=usuario).only(
+        'numero_pedido', 'tipo_orden', 'estado', 'subtotal', 'costo_envio', 'total', 'fecha_creacion',
+        'cantidad_items', 'productos', 'productos_restantes', 'miniatura',
+    )
+    pagina += _pagina(archivados, 'id', posicion, por_pagina + 1)
+    pagina.sort(key=lambda resumen: (resumen.fecha_creacion, resumen.pedido_id), reverse=True)
+    pagina = pagina[:por_pagina + 1]
+    siguiente = codificar_cursor(pagina[por_pagina - 1]) if len(pagina) > por_pagina else None
+    return pagina[:por_pagina], siguiente
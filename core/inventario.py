@@ -0,0 +1,132 @@
+"""
+Libro de stock.
+
+``Producto.stock`` es el saldo materializado del libro ``MovimientoStock``.
+Nunca se sobrescribe: cada cambio es un movimiento (venta, reposición,
+ajuste o devolución) y el saldo se actualiza con un incremento ``F()`` en
+la misma transacción, así dos cambios concurrentes no se pisan. Las salidas
+de stock se condicionan a que alcance el saldo (``stock >= cantidad``).
+
+Cuando un movimiento deja el saldo en cero (o lo saca de cero) se emite la
+señal ``umbral_stock`` tras el commit; ``core/signals.py`` la usa para
+invalidar los listados en caché y avisar al POS.
+
+``python manage.py conciliar_stock`` recorre el libro y verifica que los
+saldos coincidan.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.dispatch import Signal
+
+from .models import MovimientoStock, Pedido, Producto
+
+
+# Argumentos: producto_id, stock (saldo nuevo), agotado (True al llegar a cero, False al reponerse)
+umbral_stock = Signal()
+
+
+class StockInsuficiente(ValueError):
+    pass
+
+
+def _verificar_umbral(producto_id, cantidad):
+    """Tras aplicar ``cantidad``, emite umbral_stock (al confirmar) si el saldo cruzó el cero."""
+    saldo = Producto.objects.values_list('stock', flat=True).get(pk=producto_id)
+    anterior = saldo - cantidad
+    if (anterior > 0) != (saldo > 0):
+        transaction.on_commit(lambda: umbral_stock.send(
+            sender=Producto, producto_id=producto_id, stock=saldo, agotado=saldo <= 0,
+        ))
+
+
+def registrar_movimiento(producto, cantidad, tipo, pedido=None, usuario=None, nota=None, permitir_negativo=False):
+    """
+    Aplica ``cantidad`` (positiva entra, negativa sale) al saldo del producto y
+    la registra en el libro. ``producto`` puede ser una instancia o un id.
+    Lanza StockInsuficiente si una salida deja el saldo bajo cero.
+    """
+    producto_id = getattr(producto, 'pk', producto)
+    with transaction.atomic():
+        saldo = Producto.objects.filter(pk=producto_id)
+        if cantidad < 0 and not permitir_negativo:
+            saldo = saldo.filter(stock__gte=-cantidad)
+        if not saldo.update(stock=F('stock') + cantidad):
+            if not Producto.objects.filter(pk=producto_id).exists():
+                raise Producto.DoesNotExist(f'El producto {producto_id} no existe.')
+            nombre = getattr(producto, 'nombre', None) or Producto.objects.values_list('nombre', flat=True).get(pk=producto_id)
+            raise StockInsuficiente(f'Stock insuficiente para {nombre}')
+        _verificar_umbral(producto_id, cantidad)
+        return MovimientoStock.objects.create(
+            producto_id=producto_id, tipo=tipo, cantidad=cantidad,
+            pedido=pedido, usuario=usuario, nota=nota,
+        )
+
+
+def ajustar_stock(producto, stock_mostrado, stock_deseado, usuario=None, nota=None):
+    """
+    Ajuste manual desde un formulario: se registra la diferencia entre el
+    valor que vio el usuario y el que escribió, no el valor absoluto, para no
+    perder las ventas ocurridas mientras editaba. Si la rebaja es mayor que el
+    saldo actual, el saldo queda en cero.
+    """
+    delta = stock_deseado - stock_mostrado
+    if not delta:
+        return None
+    try:
+        return registrar_movimiento(producto, delta, 'ajuste', usuario=usuario, nota=nota)
+    except StockInsuficiente:
+        with transaction.atomic():
+            actual = Producto.objects.select_for_update().values_list('stock', flat=True).get(pk=producto.pk)
+            if not actual:
+                return None
+            return registrar_movimiento(producto, -actual, 'ajuste', usuario=usuario, nota=nota)
+
+
+def guardar_producto(producto, stock_deseado, stock_mostrado=None, usuario=None, nota='Edición manual'):
+    """
+    Guarda un producto editado en un formulario sin escribir la columna
+    ``stock``; el cambio de stock pasa por el libro como ajuste.
+    """
+    with transaction.atomic():
+        if producto._state.adding:
+            producto.stock = 0
+            producto.save()
+            ajustar_stock(producto, 0, stock_deseado, usuario=usuario, nota='Stock inicial')
+        else:
+            campos = [f.attname for f in producto._meta.concrete_fields if not f.primary_key and f.name != 'stock']
+            producto.save(update_fields=campos)
+            if stock_mostrado is not None:
+                ajustar_stock(producto, stock_mostrado, stock_deseado, usuario=usuario, nota=nota)
+        producto.refresh_from_db(fields=['stock'])
+    return producto
+
+
+def devolver_stock_pedido(pedido, usuario=None):
+    """
+    Devuelve al stock lo que descontó un pedido cancelado. Se basa en las
+    ventas registradas en el libro para ese pedido (menos lo ya devuelto), así
+    que cancelar dos veces no devuelve dos veces y los pedidos que nunca
+    descontaron stock no lo aumentan.
+    """
+    with transaction.atomic():
+        # Bloquear el pedido serializa dos cancelaciones simultáneas
+        list(Pedido.objects.select_for_update().filter(pk=pedido.pk).values_list('pk', flat=True))
+        pendientes = (
+            MovimientoStock.objects
+            .filter(pedido=pedido, tipo__in=['venta', 'devolucion'])
+            .order_by()
+            .values('producto_id')
+            .annotate(neto=Sum('cantidad'))
+            .filter(neto__lt=0)
+        )
+        movimientos = []
+        for fila in pendientes:
+            devolucion = -fila['neto']
+            Producto.objects.filter(pk=fila['producto_id']).update(stock=F('stock') + devolucion)
+            _verificar_umbral(fila['producto_id'], devolucion)
+            movimientos.append(MovimientoStock(
+                producto_id=fila['producto_id'], tipo='devolucion', cantidad=devolucion,
+                pedido=pedido, usuario=usuario, nota=f'Cancelación del pedido {pedido.numero_pedido}',
+            ))
+        MovimientoStock.objects.bulk_create(movimientos)
+    return movimientos
@@ -0,0 +1,49 @@
+"""
+Base de los comandos de mantenimiento que se ejecutan una vez (cron) o como
+proceso continuo::
+
+    python manage.py <comando>                          # una pasada
+    python manage.py <comando> --continuo --intervalo N # una pasada cada N segundos
+
+Cada comando implementa ``pasada`` y, si admite ``--simular``, ``simular``
+(que nunca se repite: es excluyente con ``--continuo``).
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+
+class ComandoContinuo(BaseCommand):
+    intervalo = 3600      # Segundos entre pasadas por defecto (con --continuo)
+    ayuda_simular = None  # Texto de ayuda de --simular; None si el comando no lo admite
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        modo = parser.add_mutually_exclusive_group()
+        modo.add_argument('--continuo', action='store_true', help='Repite la pasada indefinidamente.')
+        if self.ayuda_simular:
+            modo.add_argument('--simular', action='store_true', help=self.ayuda_simular)
+        parser.add_argument('--intervalo', type=int, default=self.intervalo,
+                            help=f'Segundos entre pasadas con --continuo (por defecto {self.intervalo}).')
+        return parser
+
+    def handle(self, *args, **opciones):
+        # call_command no pasa por el grupo excluyente de argparse
+        if opciones.get('simular') and opciones['continuo']:
+            raise CommandError('--simular y --continuo no se pueden usar juntos.')
+        if opciones.get('simular'):
+            self.simular(**opciones)
+            return
+        while True:
+            self.pasada(**opciones)
+            if not opciones['continuo']:
+                break
+            close_old_connections()
+            time.sleep(opciones['intervalo'])
+
+    def pasada(self, **opciones):
+        raise NotImplementedError('Los comandos continuos deben implementar pasada().')
+
+    def simular(self, **opciones):
+        raise NotImplementedError('Los comandos con --simular deben implementar simular().')
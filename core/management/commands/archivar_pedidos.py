@@ -0,0 +1,58 @@
+"""
+Mueve a las tablas de archivo los pedidos entregados o cancelados antiguos
+(ver ``core/archivo.py``).
+
+Cada lote es una transacción corta. El tamaño del lote se ajusta para que
+cada transacción dure menos de ``--max-bloqueo`` milisegundos: se reduce a la
+mitad si un lote tardó más y se duplica si tardó menos de la mitad::
+
+    python manage.py archivar_pedidos --simular
+    python manage.py archivar_pedidos --meses 6 --max-bloqueo 250
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.archivo import ajustar_lote, archivables, archivar_lote, configuracion, fecha_limite
+
+
+class Command(BaseCommand):
+    help = 'Archiva los pedidos entregados o cancelados más antiguos que el límite.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=None,
+                            help='Antigüedad mínima en meses (por defecto ARCHIVO_PEDIDOS["MESES"]).')
+        parser.add_argument('--lote', type=int, default=None, help='Pedidos del primer lote.')
+        parser.add_argument('--max-bloqueo', type=int, default=None,
+                            help='Milisegundos máximos por transacción (por defecto ARCHIVO_PEDIDOS["MAX_BLOQUEO_MS"]).')
+        parser.add_argument('--pausa', type=float, default=0.1, help='Segundos de espera entre lotes.')
+        parser.add_argument('--simular', action='store_true', help='Solo cuenta los pedidos que se archivarían.')
+
+    def handle(self, *args, **opciones):
+        meses = opciones['meses'] or configuracion('MESES')
+        limite = fecha_limite(meses)
+        if opciones['simular']:
+            total = archivables(limite).count()
+            self.stdout.write(f'{total:,} pedido(s) entregados o cancelados hace más de {meses} meses.')
+            return
+
+        lote = opciones['lote'] or configuracion('LOTE')
+        max_bloqueo = opciones['max_bloqueo'] or configuracion('MAX_BLOQUEO_MS')
+        ultimo, archivados, mas_largo = 0, 0, 0.0
+        while True:
+            inicio = time.perf_counter()
+            ids = archivar_lote(limite, desde_id=ultimo, lote=lote)
+            milisegundos = (time.perf_counter() - inicio) * 1000
+            if not ids:
+                break
+            ultimo = ids[-1]
+            archivados += len(ids)
+            mas_largo = max(mas_largo, milisegundos)
+            self.stdout.write(
+                f'  {archivados:,} pedidos archivados (lote de {len(ids)} en {milisegundos:.0f} ms)...', ending='\r',
+            )
+            lote = ajustar_lote(lote, milisegundos, max_bloqueo)
+            time.sleep(opciones['pausa'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {archivados:,} pedido(s) archivados. Transacción más larga: {mas_largo:.0f} ms.'
+        ))
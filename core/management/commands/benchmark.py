@@ -0,0 +1,549 @@
+"""
+Suite de benchmarks de los recorridos críticos.
+
+Usa el cliente de pruebas de Django contra la base de datos configurada
+(SQLite o MySQL local, sin servicios externos). Cada ejecución guarda su
+resultado en ``benchmarks/<escenario>-ultimo.json`` y lo compara con el
+anterior.
+
+Ejemplo::
+
+    python manage.py benchmark --escenario recorridos --iteraciones 100
+"""
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core import benchmarks, rutas
+from core.models import Pedido
+
+
+class Command(BaseCommand):
+    help = 'Mide throughput, latencias p50/p95/p99 y consultas por petición de los recorridos críticos.'
+
+    escenarios = ['recorridos', 'conexiones', 'rutas', 'busqueda', 'asgi', 'sesiones', 'estaticos']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escenario', choices=self.escenarios, default='recorridos')
+        parser.add_argument('--iteraciones', type=int, default=30)
+        parser.add_argument('--calentamiento', type=int, default=3,
+                            help='Iteraciones iniciales que no se miden.')
+        parser.add_argument('--directorio', default=None,
+                            help='Dónde guardar los resultados (por defecto BASE_DIR/benchmarks).')
+        parser.add_argument('--comparar-con', default=None,
+                            help='JSON de referencia (por defecto el último resultado del escenario).')
+        parser.add_argument('--no-guardar', action='store_true', help='No sobrescribe el resultado guardado.')
+        parser.add_argument('--conservar-datos', action='store_true',
+                            help='No elimina los usuarios/productos/pedidos bench_ al terminar.')
+        parser.add_argument('--concurrencia', type=int, default=32,
+                            help='Escenario asgi: clientes simultáneos.')
+        parser.add_argument('--hilos', type=int, default=8,
+                            help='Escenario asgi: hilos del servidor WSGI (como gunicorn --threads).')
+        parser.add_argument('--latencia-bd', type=float, default=0,
+                            help='Escenario asgi: milisegundos que se suman a cada consulta (simula la red a MySQL).')
+
+    def handle(self, *args, **opciones):
+        if opciones['iteraciones'] < 1:
+            raise CommandError('--iteraciones debe ser mayor que 0.')
+        escenario = opciones['escenario']
+
+        # Permite el host "testserver" del cliente y usa el backend de correo en memoria
+        setup_test_environment()
+        try:
+            datos = benchmarks.preparar_datos()
+            resultado = getattr(self, f'escenario_{escenario}')(datos, **opciones)
+        finally:
+            if not opciones['conservar_datos']:
+                benchmarks.limpiar_datos()
+            teardown_test_environment()
+
+        resultado['escenario'] = escenario
+        resultado['iteraciones'] = opciones['iteraciones']
+        self._imprimir(resultado)
+
+        ruta_base = opciones['comparar_con'] or benchmarks.ruta_ultimo(escenario, opciones['directorio'])
+        base = benchmarks.cargar_resultado(ruta_base)
+        if base:
+            self._imprimir_comparacion(benchmarks.comparar(resultado, base), ruta_base)
+        if not opciones['no_guardar']:
+            benchmarks.guardar_resultado(escenario, resultado, opciones['directorio'])
+
+    # ---------- Escenarios ----------
+
+    def escenario_recorridos(self, datos, iteraciones, calentamiento, **_):
+        """catálogo → agregar al carrito → ver carrito → venta POS → estados del repartidor → dashboard."""
+        usuarios = datos['usuarios']
+        clientes = {rol: Client() for rol in usuarios}
+        for rol, cliente in clientes.items():
+            cliente.force_login(usuarios[rol])
+
+        productos = datos['productos']
+        url_catalogo = reverse('catalogo_productos') + '?ver_todo=1'
+        url_agregar = reverse('agregar_al_carrito')
+        url_carrito = reverse('ver_carrito')
+        url_pos = reverse('pos_view')
+        url_repartidor = reverse('repartidor_pedidos')
+        url_dashboard = reverse('admin_dashboard')
+
+        registro = None
+        for i in range(calentamiento + iteraciones):
+            if i == calentamiento:
+                registro = benchmarks.Registro()
+            medir = registro or benchmarks.Registro()
+            producto = productos[i % len(productos)]
+
+            medir.peticion('catalogo', clientes['cliente'], 'get', url_catalogo)
+            medir.peticion('agregar_carrito', clientes['cliente'], 'post', url_agregar,
+                           data={'product_id': producto.pk, 'cantidad': 1})
+            medir.peticion('ver_carrito', clientes['cliente'], 'get', url_carrito)
+
+            items = [{'id': p.pk, 'cantidad': 1} for p in productos[i % 3: i % 3 + 3]]
+            total = sum(float(p.precio) for p in productos[i % 3: i % 3 + 3])
+            medir.peticion('venta_pos', clientes['cajero'], 'post', url_pos, data={
+                'items': json.dumps(items), 'total': total,
+                'metodo_pago': datos['metodo_pago'].nombre, 'nombre_referencia': 'Bench',
+            })
+
+            # Preparación (no medida): un pedido delivery listo para el repartidor
+            pedido = Pedido.objects.create(
+                cliente=usuarios['cliente'], repartidor=datos['repartidor'],
+                metodo_pago=datos['metodo_pago'], tipo_orden='delivery', estado='listo',
+                direccion_entrega='Av. Providencia 1234, Providencia',
+                subtotal=producto.precio, total=producto.precio,
+            )
+            medir.peticion('repartidor_pedidos', clientes['repartidor'], 'get', url_repartidor)
+            for estado in ('en_camino', 'entregado'):
+                medir.peticion('repartidor_estado', clientes['repartidor'], 'post', url_repartidor,
+                               data={'pedido_id': pedido.pk, 'nuevo_estado': estado})
+
+            medir.peticion('dashboard', clientes['administrador'], 'get', url_dashboard)
+
+        return registro.resumen()
+
+    def escenario_conexiones(self, datos, iteraciones, calentamiento, **_):
+        """
+        Compara buscar_pedido_view sin conexiones persistentes (CONN_MAX_AGE=0)
+        contra conexiones persistentes con health check. Tras cada petición se
+        llama a close_old_connections(), igual que hace un servidor WSGI real.
+        """
+        cliente = Client()
+        cliente.force_login(datos['usuarios']['administrador'])
+        pedido = Pedido.objects.create(
+            cliente=datos['usuarios']['cliente'], metodo_pago=datos['metodo_pago'],
+            subtotal=1000, total=1000,
+        )
+        url = reverse('buscar_pedido') + f'?q={pedido.numero_pedido}'
+
+        nuevas = []
+        connection_created.connect(lambda **kwargs: nuevas.append(1), weak=False, dispatch_uid='bench_conexiones')
+        original = (connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS'])
+        registro = benchmarks.Registro()
+        conexiones = {}
+        try:
+            for paso, max_age, health in (('sin_persistencia', 0, False), ('persistente', 600, True)):
+                connection.close()
+                connection.settings_dict['CONN_MAX_AGE'] = max_age
+                connection.settings_dict['CONN_HEALTH_CHECKS'] = health
+                for i in range(calentamiento + iteraciones):
+                    if i == calentamiento:
+                        nuevas.clear()
+                    if i < calentamiento:
+                        cliente.get(url)
+                    else:
+                        registro.peticion(f'buscar_pedido_{paso}', cliente, 'get', url, esperado=(200,))
+                    close_old_connections()
+                conexiones[paso] = len(nuevas)
+
+            # Costo aislado de abrir una conexión (lo que se ahorra en cada petición)
+            tiempos = []
+            for _ in range(max(5, iteraciones // 5)):
+                connection.close()
+                inicio = time.perf_counter()
+                connection.ensure_connection()
+                tiempos.append(time.perf_counter() - inicio)
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_conexiones')
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS'] = original
+
+        resultado = registro.resumen()
+        resultado['conexiones_abiertas'] = conexiones
+        resultado['apertura_conexion_p50_ms'] = round(benchmarks.percentil(tiempos, 50) * 1000, 3)
+        return resultado
+
+    def escenario_rutas(self, datos, iteraciones, calentamiento, **_):
+        """Tiempo de agrupar_pedidos() con 100, 300 y 1000 pedidos listos (en memoria, sin BD)."""
+        rng = random.Random(7)
+        sectores = list(rutas.TABLA_POR_DEFECTO)
+        ahora = timezone.now()
+        registro = benchmarks.Registro()
+        for cantidad in (100, 300, 1000):
+            pedidos = [
+                Pedido(
+                    pk=i, numero_pedido=str(i), tipo_orden='delivery', estado='listo',
+                    direccion_entrega=f'Calle {rng.randint(1, 999)}, {rng.choice(sectores).title()}',
+                    fecha_creacion=ahora, fecha_listo=ahora - timedelta(minutes=rng.randint(0, 45)),
+                )
+                for i in range(1, cantidad + 1)
+            ]
+            for i in range(calentamiento + iteraciones):
+                if i < calentamiento:
+                    rutas.agrupar_pedidos(pedidos)
+                    continue
+                with registro.medir(f'agrupar_{cantidad}_pedidos'):
+                    resultado = rutas.agrupar_pedidos(pedidos)
+        resumen = registro.resumen()
+        resumen['rutas_para_1000_pedidos'] = len(resultado)
+        return resumen
+
+    def escenario_busqueda(self, datos, iteraciones, calentamiento, **_):
+        """
+        Sugerencias del buscador de pedidos del panel (core/busqueda.py) sobre los
+        pedidos existentes: número completo, su comienzo, sus últimos dígitos,
+        apellido del cliente y últimos dígitos de su teléfono. Tiene sentido con
+        una base grande (``generar_datos_carga``).
+        """
+        cliente = Client()
+        cliente.force_login(datos['usuarios']['administrador'])
+        muestras = list(
+            Pedido.objects.filter(cliente__isnull=False).order_by('-pk')
+            .values_list('numero_pedido', 'cliente__last_name', 'cliente__telefono')[:max(iteraciones, 1)]
+        )
+        if not muestras:
+            raise CommandError('No hay pedidos con cliente: genera datos con generar_datos_carga.')
+        url = reverse('buscar_pedido')
+
+        registro = benchmarks.Registro()
+        for i in range(calentamiento + iteraciones):
+            numero, apellido, telefono = muestras[i % len(muestras)]
+            consultas = {
+                'numero_completo': numero,
+                'comienzo_numero': numero[:4],
+                'parte_numero': numero[-4:],
+                'apellido': apellido or 'perez',
+                'telefono_final': (telefono or '0000')[-4:],
+            }
+            for paso, texto in consultas.items():
+                if i < calentamiento:
+                    cliente.get(url, {'q': texto})
+                else:
+                    registro.peticion(f'buscar_{paso}', cliente, 'get', url, data={'q': texto}, esperado=(200,))
+        resultado = registro.resumen()
+        resultado['pedidos_indexados'] = Pedido.objects.count()
+        return resultado
+
+    def escenario_asgi(self, datos, iteraciones, calentamiento, concurrencia, hilos, latencia_bd, **_):
+        """
+        Capacidad de las vistas JSON (búsqueda de pedidos, cola de reclamos y
+        eventos de stock) con el mismo número de clientes simultáneos bajo WSGI
+        y bajo ASGI. Se llama a los handlers reales de Django, sin servidor HTTP:
+
+        - WSGI: cada cliente es un hilo y a lo más ``--hilos`` peticiones se
+          atienden a la vez, como un worker de gunicorn con ``--threads``.
+        - ASGI: los clientes son corrutinas en un event loop y las vistas son
+          ``async def``; el ORM asíncrono corre cada consulta en un hilo.
+
+        La latencia incluye la espera por un hilo libre. ``--latencia-bd``
+        suma una pausa a cada consulta para simular la ida y vuelta a MySQL,
+        que es donde las vistas asíncronas dejan de ocupar un hilo.
+        """
+        if concurrencia < 1 or hilos < 1:
+            raise CommandError('--concurrencia y --hilos deben ser mayores que 0.')
+        cliente = Client()
+        cliente.force_login(datos['usuarios']['administrador'])
+        cookie = '; '.join(f'{nombre}={morsel.value}' for nombre, morsel in cliente.cookies.items())
+        numeros = list(Pedido.objects.order_by('-pk').values_list('numero_pedido', flat=True)[:50]) or ['000000']
+        urls = [
+            ('buscar_pedido', reverse('buscar_pedido'), lambda i: f'q={numeros[i % len(numeros)]}'),
+            ('reclamos_cola', reverse('admin_reclamos_cola'), lambda i: ''),
+            ('eventos_stock', reverse('eventos_stock'), lambda i: 'desde=0'),
+        ]
+
+        consultas = []
+        conexiones = []
+
+        def latencia(execute, sql, params, many, context):
+            consultas.append(1)
+            if latencia_bd:
+                time.sleep(latencia_bd / 1000)
+            return execute(sql, params, many, context)
+
+        def instalar(connection, **kwargs):
+            conexiones.append(1)
+            # La conexión de un hilo se vuelve a abrir en cada petición (CONN_MAX_AGE=0)
+            if latencia not in connection.execute_wrappers:
+                connection.execute_wrappers.append(latencia)
+
+        registro = benchmarks.Registro()
+        capacidad = {}
+        connection_created.connect(instalar, weak=False, dispatch_uid='bench_asgi')
+        try:
+            for modo, correr in (('wsgi', self._correr_wsgi), ('asgi', self._correr_asgi)):
+                correr(urls, cookie, 1, calentamiento, 1, registro=None)
+                consultas.clear()
+                conexiones.clear()
+                inicio = time.perf_counter()
+                peticiones = correr(urls, cookie, concurrencia, iteraciones, hilos, registro=registro, modo=modo)
+                duracion = time.perf_counter() - inicio
+                capacidad[modo] = {
+                    'rps': round(peticiones / duracion, 2),
+                    'consultas_por_peticion': round(len(consultas) / peticiones, 2),
+                    'conexiones_abiertas': len(conexiones),
+                }
+        finally:
+            connection_created.disconnect(dispatch_uid='bench_asgi')
+            connections.close_all()
+
+        resultado = registro.resumen()
+        resultado['concurrencia'] = concurrencia
+        resultado['hilos_wsgi'] = hilos
+        resultado['latencia_bd_ms'] = latencia_bd
+        resultado['capacidad'] = capacidad
+        resultado['asgi_vs_wsgi'] = f"{capacidad['asgi']['rps'] / capacidad['wsgi']['rps']:.2f}x"
+        return resultado
+
+    def escenario_sesiones(self, datos, iteraciones, calentamiento, **_):
+        """
+        Costo de la sesión y los mensajes por petición con cada motor de
+        ``SESSION_ENGINE``: un visitante navega el catálogo y agrega al carrito
+        (mensaje + redirect) y un cliente con sesión hace lo mismo. Cuenta las
+        consultas a ``django_session`` por petición y las filas creadas.
+        """
+        modos = {
+            'db': ('django.contrib.sessions.backends.db', 'django.contrib.messages.storage.fallback.FallbackStorage'),
+            'cached_db': ('django.contrib.sessions.backends.cached_db',
+                          'django.contrib.messages.storage.fallback.FallbackStorage'),
+            'cache': ('django.contrib.sessions.backends.cache', 'django.contrib.messages.storage.fallback.FallbackStorage'),
+            'cookies': ('django.contrib.sessions.backends.signed_cookies',
+                        'django.contrib.messages.storage.cookie.CookieStorage'),
+        }
+        producto = datos['productos'][0]
+        url_catalogo = reverse('catalogo_productos')
+        url_agregar = reverse('agregar_al_carrito')
+        tabla = Session._meta.db_table
+
+        registro = benchmarks.Registro()
+        consultas_sesion = {}
+        filas_creadas = {}
+        bytes_cookie = {}
+        for modo, (motor, mensajes) in modos.items():
+            with override_settings(SESSION_ENGINE=motor, MESSAGE_STORAGE=mensajes):
+                filas_antes = Session.objects.count()
+                anonimo = Client()
+                cliente = Client()
+                cliente.force_login(datos['usuarios']['cliente'])
+                for i in range(calentamiento + iteraciones):
+                    for paso, navegador, metodo, url, data in (
+                        ('anonimo_catalogo', anonimo, 'get', url_catalogo, None),
+                        ('anonimo_agregar', anonimo, 'post', url_agregar, {'product_id': producto.pk}),
+                        ('cliente_catalogo', cliente, 'get', url_catalogo, None),
+                        ('cliente_agregar', cliente, 'post', url_agregar, {'product_id': producto.pk}),
+                    ):
+                        with CaptureQueriesContext(connection) as consultas:
+                            if i < calentamiento:
+                                getattr(navegador, metodo)(url, data)
+                            else:
+                                registro.peticion(f'{modo}_{paso}', navegador, metodo, url, data=data)
+                        if i >= calentamiento:
+                            consultas_sesion.setdefault(f'{modo}_{paso}', []).append(
+                                sum(tabla in consulta['sql'] for consulta in consultas.captured_queries)
+                            )
+                filas_creadas[modo] = Session.objects.count() - filas_antes
+                bytes_cookie[modo] = len(cliente.cookies[settings.SESSION_COOKIE_NAME].value)
+                cliente.logout()
+
+        resultado = registro.resumen()
+        resultado['consultas_sesion_por_peticion'] = {
+            paso: round(sum(valores) / len(valores), 2) for paso, valores in consultas_sesion.items()
+        }
+        resultado['filas_sesion_creadas'] = filas_creadas
+        resultado['bytes_cookie_sesion'] = bytes_cookie
+        return resultado
+
+    def escenario_estaticos(self, datos, iteraciones, calentamiento, **_):
+        """
+        Bytes de archivos estáticos propios que descarga cada página, antes
+        (originales de core/static) y después del pipeline de core/estaticos.py
+        (imágenes optimizadas y, en los de texto, la versión .br o .gz). Corre
+        collectstatic en un directorio temporal. Cada archivo cuenta una vez por
+        página y los de CDN solo se cuentan.
+        """
+        usuarios = datos['usuarios']
+        navegadores = {rol: Client() for rol in ('anonimo', 'cliente', 'administrador')}
+        navegadores['cliente'].force_login(usuarios['cliente'])
+        navegadores['administrador'].force_login(usuarios['administrador'])
+        # Una línea en el carrito y un pedido para que sus páginas muestren imágenes
+        navegadores['cliente'].post(reverse('agregar_al_carrito'), {'product_id': datos['productos'][0].pk})
+        Pedido.objects.create(cliente=usuarios['cliente'], metodo_pago=datos['metodo_pago'], subtotal=1000, total=1000)
+        paginas = [
+            ('inicio', 'anonimo', reverse('home')),
+            ('catalogo', 'anonimo', reverse('catalogo_productos') + '?ver_todo=1'),
+            ('carrito', 'cliente', reverse('ver_carrito')),
+            ('mis_pedidos', 'cliente', reverse('mis_pedidos')),
+            ('panel', 'administrador', reverse('admin_dashboard')),
+            ('pos', 'administrador', reverse('pos_view')),
+        ]
+        referencia = re.compile(r'''(?:src|href)=["']([^"']+)["']''')
+
+        # Sin DEBUG, como en producción: {% static %} usa los nombres con hash
+        with tempfile.TemporaryDirectory() as destino, override_settings(
+            DEBUG=False, STATIC_ROOT=destino,
+            STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'core.estaticos.EstaticosOptimizados'}},
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            originales = {hasheado: nombre for nombre, hasheado in staticfiles_storage.hashed_files.items()}
+            prefijo = staticfiles_storage.base_url
+
+            def tamano(nombre):
+                return staticfiles_storage.size(nombre) if staticfiles_storage.exists(nombre) else None
+
+            registro = benchmarks.Registro()
+            bytes_por_pagina = {}
+            for i in range(calentamiento + iteraciones):
+                for pagina, rol, url in paginas:
+                    if i < calentamiento:
+                        respuesta = navegadores[rol].get(url)
+                    else:
+                        respuesta = registro.peticion(pagina, navegadores[rol], 'get', url, esperado=(200,))
+                    if pagina in bytes_por_pagina:
+                        continue
+                    rutas_html = set(referencia.findall(respuesta.content.decode()))
+                    antes = despues = 0
+                    for ruta in rutas_html:
+                        if not ruta.startswith(prefijo):
+                            continue
+                        hasheado = ruta[len(prefijo):]
+                        antes += os.path.getsize(finders.find(originales.get(hasheado, hasheado)))
+                        despues += min(filter(None, (tamano(hasheado + sufijo) for sufijo in ('', '.br', '.gz'))))
+                    bytes_por_pagina[pagina] = {
+                        'antes': antes,
+                        'despues': despues,
+                        'ahorro': f'{(1 - despues / antes) * 100:.0f}%' if antes else '-',
+                        'archivos_cdn': sum(ruta.startswith(('http://', 'https://', '//')) for ruta in rutas_html),
+                    }
+        resultado = registro.resumen()
+        resultado['bytes_estaticos_por_pagina'] = bytes_por_pagina
+        return resultado
+
+    @staticmethod
+    def _peticiones(urls, iteraciones, cliente):
+        for i in range(iteraciones):
+            for paso, ruta, consulta in urls:
+                yield paso, ruta, consulta(i + cliente)
+
+    def _correr_wsgi(self, urls, cookie, concurrencia, iteraciones, hilos, registro, modo='wsgi'):
+        """
+        Cada cliente en su hilo; el servidor atiende con ``hilos`` hilos y una
+        cola, como gunicorn con ``--threads``. Devuelve cuántas peticiones se hicieron.
+        """
+        aplicacion = WSGIHandler()
+
+        def atender(ruta, consulta):
+            estado = []
+            respuesta = aplicacion({
+                'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': ruta, 'QUERY_STRING': consulta,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            }, lambda status, headers: estado.append(status))
+            b''.join(respuesta)
+            respuesta.close()  # Envía request_finished: cierra la conexión como un servidor real
+            return int(estado[0].split()[0])
+
+        with ThreadPoolExecutor(max_workers=hilos) as servidor:
+            def cliente(numero):
+                for paso, ruta, consulta in self._peticiones(urls, iteraciones, numero):
+                    inicio = time.perf_counter()
+                    estado = servidor.submit(atender, ruta, consulta).result()
+                    if registro:
+                        registro.registrar(f'{modo}_{paso}', time.perf_counter() - inicio, error=estado != 200)
+
+            with ThreadPoolExecutor(max_workers=concurrencia) as clientes:
+                list(clientes.map(cliente, range(concurrencia)))
+        return concurrencia * iteraciones * len(urls)
+
+    def _correr_asgi(self, urls, cookie, concurrencia, iteraciones, hilos, registro, modo='asgi'):
+        """Cada cliente es una corrutina en el mismo event loop. Devuelve cuántas peticiones se hicieron."""
+        aplicacion = ASGIHandler()
+
+        async def peticion(ruta, consulta):
+            estado = []
+            recibido = asyncio.Event()
+
+            async def recibir():
+                if not recibido.is_set():
+                    recibido.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await asyncio.Future()  # El cliente nunca se desconecta
+
+            async def enviar(mensaje):
+                if mensaje['type'] == 'http.response.start':
+                    estado.append(mensaje['status'])
+
+            await aplicacion({
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'root_path': '',
+                'query_string': consulta.encode(), 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+                'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            }, recibir, enviar)
+            return estado[0]
+
+        async def cliente(numero):
+            for paso, ruta, consulta in self._peticiones(urls, iteraciones, numero):
+                inicio = time.perf_counter()
+                estado = await peticion(ruta, consulta)
+                if registro:
+                    registro.registrar(f'{modo}_{paso}', time.perf_counter() - inicio, error=estado != 200)
+
+        async def todos():
+            await asyncio.gather(*(cliente(numero) for numero in range(concurrencia)))
+
+        asyncio.run(todos())
+        return concurrencia * iteraciones * len(urls)
+
+    # ---------- Salida ----------
+
+    def _imprimir(self, resultado):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nEscenario '{resultado['escenario']}' · {resultado['iteraciones']} iteraciones · "
+            f"BD {resultado['entorno']['motor_bd']} · {resultado['duracion_s']}s"
+        ))
+        self.stdout.write(f"{'paso':<32}{'n':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'SQL':>7}{'err':>5}")
+        for paso, d in resultado['pasos'].items():
+            self.stdout.write(
+                f"{paso:<32}{d['peticiones']:>6}{d['throughput_rps']:>9}{d['p50_ms']:>10}"
+                f"{d['p95_ms']:>10}{d['p99_ms']:>10}{d['consultas_por_peticion']:>7}{d['errores']:>5}"
+            )
+        for clave, valor in resultado.items():
+            if clave not in ('pasos', 'entorno', 'fecha', 'duracion_s', 'escenario', 'iteraciones'):
+                self.stdout.write(f'{clave}: {valor}')
+
+    def _imprimir_comparacion(self, filas, ruta_base):
+        if not filas:
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nComparación con {ruta_base}'))
+        for paso, metrica, base, actual, variacion in filas:
+            estilo = self.style.ERROR if variacion > 10 else self.style.SUCCESS if variacion < -10 else str
+            self.stdout.write(estilo(f'{paso:<32}{metrica:<24}{base:>10} → {actual:<10} ({variacion:+.1f}%)'))
@@ -0,0 +1,67 @@
+"""
+Verifica que ``Producto.stock`` coincida con la suma del libro de stock.
+
+La suma de cada producto se calcula en la base de datos con una sola
+consulta (``Sum`` agrupado por producto). Con ``--corregir`` se registra un
+ajuste por la diferencia, de modo que el libro vuelva a cuadrar con el saldo
+actual (el saldo no se modifica)::
+
+    python manage.py conciliar_stock
+    python manage.py conciliar_stock --corregir
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.models import MovimientoStock, Producto
+
+
+def diferencias(productos=None):
+    """[(pk, nombre, stock, libro)] de los productos cuyo saldo no coincide con la suma de su libro."""
+    productos = Producto.objects.all() if productos is None else productos
+    return list(
+        productos
+        .annotate(libro=Coalesce(Sum('movimientos_stock__cantidad'), Value(0)))
+        .exclude(stock=F('libro'))
+        .order_by('pk')
+        .values_list('pk', 'nombre', 'stock', 'libro')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compara el stock de cada producto con la suma de sus movimientos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true',
+                            help='Registra un ajuste por cada diferencia encontrada.')
+        parser.add_argument('--lote', type=int, default=5000, help='Ajustes por INSERT al corregir.')
+
+    def handle(self, *args, **opciones):
+        encontradas = diferencias()
+        self.stdout.write(f'{MovimientoStock.objects.count():,} movimientos revisados.')
+        if not encontradas:
+            self.stdout.write(self.style.SUCCESS('✅ Todos los saldos coinciden con el libro.'))
+            return
+
+        for pk, nombre, stock, libro in encontradas:
+            self.stdout.write(self.style.WARNING(
+                f'  {nombre} (id {pk}): stock {stock}, libro {libro}, diferencia {stock - libro:+d}'
+            ))
+        self.stdout.write(self.style.WARNING(f'⚠️  {len(encontradas)} producto(s) no cuadran.'))
+
+        if opciones['corregir']:
+            self.stdout.write(self.style.SUCCESS(f'{self.corregir(encontradas, opciones["lote"])} ajuste(s) registrados.'))
+
+    def corregir(self, encontradas, lote):
+        with transaction.atomic():
+            # Bloquear los productos espera a las ventas en curso (actualizan el saldo antes de
+            # escribir su movimiento); con el bloqueo tomado se recalcula la diferencia
+            pks = [pk for pk, *_ in encontradas]
+            list(Producto.objects.select_for_update().filter(pk__in=pks).order_by('pk').values_list('pk', flat=True))
+            ajustes = [
+                MovimientoStock(producto_id=pk, tipo='ajuste', cantidad=stock - libro, nota='Conciliación')
+                for pk, _, stock, libro in diferencias(Producto.objects.filter(pk__in=pks))
+            ]
+            MovimientoStock.objects.bulk_create(ajustes, batch_size=lote)
+        return len(ajustes)
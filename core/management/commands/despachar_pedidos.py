@@ -0,0 +1,24 @@
+"""
+Asigna repartidores en lote a los pedidos delivery listos sin asignar.
+
+Una pasada o proceso continuo como los demás comandos de core/management/base.py::
+
+    python manage.py despachar_pedidos --continuo --intervalo 15
+"""
+from core.despacho import motor
+from core.management.base import ComandoContinuo
+
+
+class Command(ComandoContinuo):
+    help = 'Asigna automáticamente repartidores a los pedidos delivery listos.'
+    intervalo = 15
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=None, help='Máximo de pedidos por pasada.')
+
+    def pasada(self, **opciones):
+        # Cada pasada parte de una cola recién cargada desde la base de datos
+        motor.recargar()
+        asignaciones = motor.asignar_pendientes(limite=opciones['limite'])
+        if asignaciones or not opciones['continuo']:
+            self.stdout.write(self.style.SUCCESS(f'{len(asignaciones)} pedido(s) asignados.'))
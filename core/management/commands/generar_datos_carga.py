@@ -0,0 +1,404 @@
+"""
+Genera un dataset realista para pruebas de rendimiento.
+
+Reemplaza al antiguo ``seed_data.py`` (que importaba modelos inexistentes).
+Crea usuarios, catálogo, repartidores, pedidos y detalles usando
+``bulk_create`` por lotes y una semilla fija, de modo que dos ejecuciones con
+los mismos parámetros producen exactamente los mismos datos.
+
+Ejemplo::
+
+    python manage.py generar_datos_carga --usuarios 50000 --pedidos 100000 --detalles 400000
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.busqueda import CAMPOS_CLIENTE, indexar_clientes, indexar_pedidos
+from core.historial import escribir_resumenes
+from core.models import (
+    Categoria, DetallePedido, MetodoPago, MovimientoStock, Pedido, Producto, Repartidor, Usuario
+)
+
+
+# Peso relativo de cada hora del día (0-23). Reproduce el patrón típico de un
+# local de comida: almuerzo entre 12 y 15 h y la punta de la cena entre 19 y 22 h.
+PESOS_HORA = [
+    1, 0.5, 0.2, 0.1, 0.1, 0.1, 0.3, 0.8, 1.5, 2, 2.5, 4,
+    9, 12, 10, 5, 3, 3.5, 6, 11, 14, 12, 7, 3,
+]
+
+# Los fines de semana se vende más (lunes=0 ... domingo=6)
+PESOS_DIA_SEMANA = [0.8, 0.85, 0.9, 1.0, 1.3, 1.5, 1.25]
+
+CATEGORIAS = [
+    ('Hamburguesas', ['Clásica', 'Doble Queso', 'BBQ', 'Pollo Crispy', 'Vegana', 'Italiana']),
+    ('Pizzas', ['Margarita', 'Pepperoni', 'Napolitana', 'Hawaiana', 'Cuatro Quesos', 'Española']),
+    ('Completos', ['Italiano', 'Dinámico', 'Chacarero', 'As', 'Luco', 'Barros Jarpa']),
+    ('Acompañamientos', ['Papas Fritas', 'Spicy Potatoes', 'Aros de Cebolla', 'Nuggets', 'Empanaditas']),
+    ('Bebidas', ['Bebida 500cc', 'Bebida 1.5L', 'Jugo Natural', 'Agua Mineral', 'Té Helado']),
+    ('Postres', ['Sundae', 'Brownie', 'Cheesecake', 'Mote con Huesillo', 'Leche Asada']),
+    ('Platos', ['Chorrillana', 'Pichanga', 'Lomo a lo Pobre', 'Pollo Asado', 'Churrasco']),
+]
+
+NOMBRES = [
+    'Juan', 'María', 'José', 'Camila', 'Diego', 'Valentina', 'Matías', 'Fernanda',
+    'Benjamín', 'Javiera', 'Tomás', 'Catalina', 'Felipe', 'Constanza', 'Vicente',
+    'Antonia', 'Sebastián', 'Isidora', 'Nicolás', 'Francisca', 'Martín', 'Sofía',
+]
+APELLIDOS = [
+    'González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva',
+    'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández',
+    'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela', 'Castillo', 'Tapia',
+]
+# Comunas usadas en las direcciones de delivery
+COMUNAS = [
+    'Santiago Centro', 'Providencia', 'Ñuñoa', 'Las Condes', 'La Reina',
+    'Macul', 'San Miguel', 'Independencia', 'Recoleta', 'Estación Central',
+]
+# numero_pedido es "carga<semilla>-<9 dígitos>" y tiene max_length=20
+MAX_SEMILLA = 99999
+CALLES = [
+    'Av. Providencia', 'Irarrázaval', 'Los Leones', 'Av. Grecia', 'Gran Avenida',
+    'Av. Matta', 'Vicuña Mackenna', 'Pedro de Valdivia', 'Av. Ossa', 'Manuel Montt',
+]
+
+METODOS_PAGO = [
+    ('Efectivo', 'efectivo'), ('Tarjeta', 'tarjeta'),
+    ('Transferencia', 'transferencia'), ('Webpay', 'webpay'),
+]
+
+ESTADOS_ACTIVOS = ['pendiente', 'confirmado', 'en_preparacion', 'listo', 'en_camino']
+
+
+@contextmanager
+def _sin_auto_now(*campos):
+    """Desactiva temporalmente auto_now/auto_now_add para poder fijar fechas históricas."""
+    originales = [(campo, campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo in campos:
+        campo.auto_now = False
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now = auto_now
+            campo.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Genera datos realistas y deterministas para pruebas de carga (usuarios, productos, pedidos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=5000, help='Clientes a crear.')
+        parser.add_argument('--pedidos', type=int, default=10000, help='Pedidos a crear.')
+        parser.add_argument('--detalles', type=int, default=None,
+                            help='Total aproximado de líneas de pedido (por defecto 4 por pedido).')
+        parser.add_argument('--productos', type=int, default=150, help='Productos del catálogo.')
+        parser.add_argument('--repartidores', type=int, default=40, help='Repartidores a crear.')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historia a repartir.')
+        parser.add_argument('--semilla', type=int, default=42,
+                            help=f'Semilla del generador aleatorio (0 a {MAX_SEMILLA}).')
+        parser.add_argument('--lote', type=int, default=5000, help='Tamaño de lote para bulk_create.')
+        parser.add_argument('--limpiar', action='store_true',
+                            help='Elimina antes los datos generados previamente con la misma semilla.')
+
+    def handle(self, *args, **opciones):
+        if opciones['pedidos'] and not opciones['usuarios']:
+            raise CommandError('Se necesita al menos un usuario para generar pedidos.')
+        if not 0 <= opciones['semilla'] <= MAX_SEMILLA:
+            raise CommandError(f'--semilla debe estar entre 0 y {MAX_SEMILLA}: es parte del número de pedido.')
+
+        self.rng = random.Random(opciones['semilla'])
+        self.lote = max(100, opciones['lote'])
+        self.prefijo = f"carga{opciones['semilla']}"
+        self.ahora = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.filas_creadas = 0
+        inicio = time.monotonic()
+
+        if opciones['limpiar']:
+            self._limpiar()
+
+        detalles = opciones['detalles'] or opciones['pedidos'] * 4
+        lineas_por_pedido = detalles / opciones['pedidos'] if opciones['pedidos'] else 0
+
+        metodos = self._metodos_pago()
+        productos = self._catalogo(opciones['productos'])
+        clientes = self._usuarios(opciones['usuarios'])
+        repartidores = self._repartidores(opciones['repartidores'])
+        self._pedidos(
+            opciones['pedidos'], lineas_por_pedido, opciones['dias'],
+            clientes, productos, repartidores, metodos,
+        )
+
+        total = self.filas_creadas
+        duracion = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {total:,} filas generadas en {duracion:.1f}s ({total / max(duracion, 0.001):,.0f} filas/s).'
+        ))
+
+    # ------------------------------------------------------------------
+
+    def _limpiar(self):
+        self.stdout.write('🗑️  Eliminando datos generados previamente...')
+        with transaction.atomic():
+            pedidos = Pedido.objects.filter(numero_pedido__startswith=f'{self.prefijo}-')
+            DetallePedido.objects.filter(pedido__in=pedidos).delete()
+            pedidos.delete()
+            Usuario.objects.filter(username__startswith=f'{self.prefijo}_').delete()
+            Producto.objects.filter(nombre__endswith=f'#{self.prefijo}').delete()
+
+    def _metodos_pago(self):
+        metodos = []
+        for nombre, tipo in METODOS_PAGO:
+            metodo, _ = MetodoPago.objects.get_or_create(nombre=nombre, defaults={'tipo': tipo, 'activo': True})
+            metodos.append(metodo)
+        return metodos
+
+    def _catalogo(self, cantidad):
+        self.stdout.write(f'🍔 Creando catálogo de {cantidad} productos...')
+        categorias = {}
+        for nombre, _ in CATEGORIAS:
+            categorias[nombre], _ = Categoria.objects.get_or_create(nombre=nombre)
+
+        existentes = set(Producto.objects.filter(nombre__endswith=f'#{self.prefijo}').values_list('nombre', flat=True))
+        nuevos = []
+        for i in range(cantidad):
+            categoria, variantes = CATEGORIAS[i % len(CATEGORIAS)]
+            variante = variantes[(i // len(CATEGORIAS)) % len(variantes)]
+            nombre = f'{categoria[:-1] if categoria.endswith("s") else categoria} {variante} {i + 1} #{self.prefijo}'
+            if nombre in existentes:
+                continue
+            nuevos.append(Producto(
+                nombre=nombre,
+                descripcion=f'{variante} preparada al momento.',
+                precio=Decimal(self.rng.randrange(1500, 15000, 100)),
+                stock=self.rng.randint(0, 400),
+                activo=self.rng.random() > 0.03,
+                en_promocion=self.rng.random() < 0.08,
+                categoria=categorias[categoria],
+            ))
+        Producto.objects.bulk_create(nuevos, batch_size=self.lote)
+        self.filas_creadas += len(nuevos)
+
+        # Saldo inicial en el libro de stock, para que conciliar_stock cuadre
+        creados = Producto.objects.filter(nombre__in=[p.nombre for p in nuevos]).exclude(stock=0)
+        MovimientoStock.objects.bulk_create(
+            [MovimientoStock(producto_id=pk, tipo='ajuste', cantidad=stock, nota='Saldo inicial')
+             for pk, stock in creados.values_list('pk', 'stock')],
+            batch_size=self.lote,
+        )
+
+        productos = list(
+            Producto.objects.filter(nombre__endswith=f'#{self.prefijo}').order_by('pk').values_list('pk', 'precio')
+        )
+        # Popularidad tipo Zipf: unos pocos productos concentran la mayoría de las ventas
+        orden = list(range(len(productos)))
+        self.rng.shuffle(orden)
+        pesos = [0.0] * len(productos)
+        for rango, indice in enumerate(orden, start=1):
+            pesos[indice] = 1 / (rango ** 1.07)
+        # Pesos acumulados precalculados: random.choices no los recalcula en cada llamada
+        self.pesos_productos = list(accumulate(pesos))
+        return productos
+
+    def _usuarios(self, cantidad):
+        self.stdout.write(f'👤 Creando {cantidad:,} clientes...')
+        # Hashear una sola vez: con 50k usuarios el hash sería el cuello de botella
+        password = make_password('Carga1234')
+        existentes = Usuario.objects.filter(username__startswith=f'{self.prefijo}_cliente').count()
+        usuarios = []
+        for i in range(existentes, cantidad):
+            nombre = self.rng.choice(NOMBRES)
+            apellido = self.rng.choice(APELLIDOS)
+            usuarios.append(Usuario(
+                username=f'{self.prefijo}_cliente{i:07d}',
+                email=f'{self.prefijo}_cliente{i:07d}@example.com',
+                first_name=nombre,
+                last_name=apellido,
+                telefono=f'+569{self.rng.randint(10000000, 99999999)}',
+                direccion=self._direccion(),
+                rol='cliente',
+                password=password,
+            ))
+            if len(usuarios) >= self.lote:
+                self._crear_usuarios(usuarios)
+                usuarios = []
+        self._crear_usuarios(usuarios)
+        return list(
+            Usuario.objects.filter(username__startswith=f'{self.prefijo}_cliente')
+            .order_by('pk').values_list('pk', 'direccion')[:cantidad]
+        )
+
+    def _crear_usuarios(self, usuarios):
+        Usuario.objects.bulk_create(usuarios, batch_size=self.lote)
+        self.filas_creadas += len(usuarios)
+        # bulk_create no dispara señales: se indexan aquí para la búsqueda de pedidos del panel
+        indexar_clientes(
+            Usuario.objects.filter(username__in=[usuario.username for usuario in usuarios]).values_list(*CAMPOS_CLIENTE)
+        )
+
+    def _repartidores(self, cantidad):
+        self.stdout.write(f'🛵 Creando {cantidad} repartidores...')
+        password = make_password('Carga1234')
+        existentes = set(Usuario.objects.filter(username__startswith=f'{self.prefijo}_repartidor').values_list('username', flat=True))
+        usuarios = [
+            Usuario(
+                username=f'{self.prefijo}_repartidor{i:04d}',
+                email=f'{self.prefijo}_repartidor{i:04d}@example.com',
+                first_name=self.rng.choice(NOMBRES),
+                last_name=self.rng.choice(APELLIDOS),
+                rol='repartidor',
+                password=password,
+            )
+            for i in range(cantidad)
+            if f'{self.prefijo}_repartidor{i:04d}' not in existentes
+        ]
+        self._crear_usuarios(usuarios)
+        sin_perfil = Usuario.objects.filter(
+            username__startswith=f'{self.prefijo}_repartidor', perfil_repartidor__isnull=True
+        ).values_list('pk', flat=True)
+        perfiles = Repartidor.objects.bulk_create([
+            Repartidor(
+                usuario_id=pk,
+                vehiculo=self.rng.choice(['Moto', 'Bicicleta', 'Scooter eléctrico']),
+                disponible=self.rng.random() > 0.25,
+                calificacion_promedio=Decimal(self.rng.randint(300, 500)) / 100,
+            )
+            for pk in sin_perfil
+        ], batch_size=self.lote)
+        self.filas_creadas += len(perfiles)
+        return list(
+            Repartidor.objects.filter(usuario__username__startswith=f'{self.prefijo}_repartidor')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def _pedidos(self, cantidad, lineas_por_pedido, dias, clientes, productos, repartidores, metodos):
+        self.stdout.write(f'🧾 Creando {cantidad:,} pedidos (~{lineas_por_pedido:.1f} líneas c/u)...')
+        ya_creados = Pedido.objects.filter(numero_pedido__startswith=f'{self.prefijo}-').count()
+        if ya_creados:
+            self.stdout.write(f'   {ya_creados:,} pedidos ya existían, se continúa desde ahí.')
+
+        # Días candidatos ponderados por día de la semana
+        dias_candidatos = list(range(dias))
+        pesos_dias = list(accumulate(
+            PESOS_DIA_SEMANA[(self.ahora - timedelta(days=d)).weekday()] for d in dias_candidatos
+        ))
+        horas = list(range(24))
+        pesos_horas = list(accumulate(PESOS_HORA))
+        indices_productos = list(range(len(productos)))
+        max_lineas = max(1, round(lineas_por_pedido * 2 - 1))
+
+        campos_fecha = [Pedido._meta.get_field('fecha_creacion')]
+        with _sin_auto_now(*campos_fecha):
+            for inicio_lote in range(ya_creados, cantidad, self.lote):
+                fin_lote = min(inicio_lote + self.lote, cantidad)
+                pedidos, lineas = [], {}
+                for i in range(inicio_lote, fin_lote):
+                    pedido, detalle = self._pedido(
+                        i, dias_candidatos, pesos_dias, horas, pesos_horas, indices_productos,
+                        max_lineas, clientes, productos, repartidores, metodos,
+                    )
+                    pedidos.append(pedido)
+                    lineas[pedido.numero_pedido] = detalle
+
+                with transaction.atomic():
+                    Pedido.objects.bulk_create(pedidos, batch_size=self.lote)
+                    # MySQL no devuelve las PK de bulk_create: se recuperan por número de pedido
+                    ids = dict(
+                        Pedido.objects.filter(numero_pedido__in=lineas.keys()).values_list('numero_pedido', 'pk')
+                    )
+                    detalles = [
+                        DetallePedido(pedido_id=ids[numero], **datos)
+                        for numero, datos_pedido in lineas.items()
+                        for datos in datos_pedido
+                    ]
+                    DetallePedido.objects.bulk_create(detalles, batch_size=self.lote)
+                    # bulk_create no dispara señales: el historial del cliente y la búsqueda se escriben aquí
+                    escribir_resumenes(ids.values())
+                    indexar_pedidos((pk, numero) for numero, pk in ids.items())
+
+                self.filas_creadas += len(pedidos) * 2 + len(detalles)
+                self.stdout.write(f'   {fin_lote:,}/{cantidad:,} pedidos', ending='\r')
+                self.stdout.flush()
+        self.stdout.write('')
+
+    def _pedido(self, i, dias_candidatos, pesos_dias, horas, pesos_horas, indices_productos,
+                max_lineas, clientes, productos, repartidores, metodos):
+        rng = self.rng
+        dias_atras = rng.choices(dias_candidatos, cum_weights=pesos_dias)[0]
+        hora = rng.choices(horas, cum_weights=pesos_horas)[0]
+        creado = (self.ahora - timedelta(days=dias_atras)).replace(hour=hora) + timedelta(
+            minutes=rng.randint(0, 59), seconds=rng.randint(0, 59)
+        )
+        if creado > self.ahora:
+            creado -= timedelta(days=1)
+
+        tipo_orden = rng.choices(['local', 'retiro', 'delivery'], [0.35, 0.2, 0.45])[0]
+        cliente_id, direccion = rng.choice(clientes)
+        reciente = (self.ahora - creado) < timedelta(hours=3)
+        if reciente:
+            estado = rng.choice(ESTADOS_ACTIVOS)
+        else:
+            estado = 'cancelado' if rng.random() < 0.04 else 'entregado'
+
+        # Líneas del pedido: productos elegidos según su popularidad
+        seleccion = rng.choices(indices_productos, cum_weights=self.pesos_productos, k=rng.randint(1, max_lineas))
+        detalle, subtotal = [], Decimal('0')
+        for indice in seleccion:
+            producto_id, precio = productos[indice]
+            cantidad = rng.choices([1, 2, 3, 4], [0.7, 0.2, 0.07, 0.03])[0]
+            linea = precio * cantidad
+            subtotal += linea
+            detalle.append({
+                'producto_id': producto_id,
+                'cantidad': cantidad,
+                'precio_unitario': precio,
+                'subtotal': linea,
+            })
+
+        costo_envio = Decimal(rng.choice([1500, 2000, 2500])) if tipo_orden == 'delivery' else Decimal('0')
+        pedido = Pedido(
+            numero_pedido=f'{self.prefijo}-{i:09d}',
+            cliente_id=cliente_id,
+            metodo_pago=rng.choice(metodos),
+            tipo_orden=tipo_orden,
+            estado=estado,
+            subtotal=subtotal,
+            costo_envio=costo_envio,
+            total=subtotal + costo_envio,
+            fecha_creacion=creado,
+        )
+        if tipo_orden == 'delivery':
+            pedido.direccion_entrega = direccion
+            if repartidores and estado in ('en_camino', 'entregado'):
+                pedido.repartidor_id = rng.choice(repartidores)
+
+        # Marcas de tiempo coherentes con el estado alcanzado
+        pasos = ['pendiente', 'confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
+        alcance = pasos.index(estado) if estado in pasos else 1
+        momento = creado
+        if alcance >= 1:
+            momento += timedelta(minutes=rng.randint(1, 5))
+            pedido.fecha_confirmacion = momento
+        if alcance >= 2:
+            momento += timedelta(minutes=rng.randint(1, 8))
+            pedido.fecha_preparacion = momento
+        if alcance >= 3:
+            momento += timedelta(minutes=rng.randint(8, 25))
+            pedido.fecha_listo = momento
+        if alcance >= 5:
+            momento += timedelta(minutes=rng.randint(10, 40))
+            pedido.fecha_entrega = momento
+        return pedido, detalle
+
+    def _direccion(self):
+        return f'{self.rng.choice(CALLES)} {self.rng.randint(100, 9999)}, {self.rng.choice(COMUNAS)}'
@@ -0,0 +1,38 @@
+"""
+Importa productos desde un archivo CSV o JSON (ver ``core/menu.py``)::
+
+    python manage.py importar_productos menu.csv --simular
+    python manage.py importar_productos precios.json
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.menu import LOTE, importar
+
+
+class Command(BaseCommand):
+    help = 'Crea o actualiza productos por nombre desde un archivo CSV o JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo (.csv, .json o .jsonl).')
+        parser.add_argument('--simular', action='store_true', help='Muestra los cambios sin guardarlos.')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Filas por lote.')
+
+    def handle(self, *args, **opciones):
+        formato = 'json' if opciones['archivo'].lower().endswith(('.json', '.jsonl')) else 'csv'
+        try:
+            archivo = open(opciones['archivo'], 'rb')
+        except OSError as error:
+            raise CommandError(f'No se pudo abrir el archivo: {error}')
+        with archivo:
+            resultado = importar(archivo, formato, simular=opciones['simular'], lote=opciones['lote'])
+
+        for fila, nombre, accion, cambios in resultado.cambios:
+            detalle = ', '.join(f'{campo}: {antes} → {despues}' for campo, (antes, despues) in cambios.items())
+            self.stdout.write(f'  [{accion}] fila {fila} {nombre}: {detalle}')
+        for error in resultado.errores:
+            self.stdout.write(self.style.ERROR(f'  {error}'))
+        prefijo = 'Simulación: ' if resultado.simulado else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefijo}{resultado.creados} creados, {resultado.actualizados} actualizados, '
+            f'{resultado.sin_cambios} sin cambios, {len(resultado.errores)} con errores.'
+        ))
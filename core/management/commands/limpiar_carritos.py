@@ -0,0 +1,53 @@
+"""
+Archiva en ``CarritoAbandonado`` y elimina los carritos sin actividad.
+
+Cada lote es una transacción corta (se bloquean solo los carritos del lote,
+saltando los que otra petición tenga tomados), con una pausa entre lotes.
+Una pasada o proceso continuo como los demás comandos de core/management/base.py::
+
+    python manage.py limpiar_carritos --dias 30 --lote 500
+    python manage.py limpiar_carritos --continuo --intervalo 3600
+"""
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.carrito import archivar_abandonados, configuracion
+from core.management.base import ComandoContinuo
+from core.models import Carrito
+
+
+class Command(ComandoContinuo):
+    help = 'Archiva y elimina los carritos abandonados.'
+    ayuda_simular = 'Solo cuenta los carritos que se archivarían.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Días sin actividad (por defecto CARRITO["DIAS_ABANDONO"]).')
+        parser.add_argument('--lote', type=int, default=500, help='Carritos por transacción.')
+        parser.add_argument('--pausa', type=float, default=0.2, help='Segundos de espera entre lotes.')
+
+    def simular(self, **opciones):
+        dias = opciones['dias'] or configuracion('DIAS_ABANDONO')
+        total = Carrito.objects.filter(fecha_actualizacion__lt=timezone.now() - timedelta(days=dias)).count()
+        self.stdout.write(f'{total:,} carrito(s) sin actividad hace más de {dias} días.')
+
+    def pasada(self, **opciones):
+        limite = timezone.now() - timedelta(days=opciones['dias'] or configuracion('DIAS_ABANDONO'))
+        self.limpiar(limite, opciones['lote'], opciones['pausa'])
+
+    def limpiar(self, limite, lote, pausa):
+        ultimo, eliminados, archivados = 0, 0, 0
+        while True:
+            ids, en_archivo = archivar_abandonados(limite, desde_id=ultimo, lote=lote)
+            if not ids:
+                break
+            ultimo = ids[-1]
+            eliminados += len(ids)
+            archivados += en_archivo
+            self.stdout.write(f'  {eliminados:,} carritos eliminados...', ending='\r')
+            time.sleep(pausa)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {eliminados:,} carrito(s) eliminados, {archivados:,} archivados con sus productos.'
+        ))
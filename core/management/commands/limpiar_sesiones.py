@@ -0,0 +1,56 @@
+"""
+Elimina por lotes las sesiones vencidas de la base de datos (ver ``core/sesiones.py``).
+
+Reemplaza a ``clearsessions``, que lo hace con un único ``DELETE``. Se ejecuta
+como los demás comandos de core/management/base.py::
+
+    python manage.py limpiar_sesiones --simular
+    python manage.py limpiar_sesiones --lote 1000 --pausa 0.2
+    python manage.py limpiar_sesiones --continuo --intervalo 3600
+"""
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.management.base import ComandoContinuo
+from core.sesiones import borrar_vencidas, configuracion, vencidas
+
+
+class Command(ComandoContinuo):
+    help = 'Elimina por lotes las sesiones vencidas (motores db y cached_db).'
+    ayuda_simular = 'Solo cuenta las sesiones vencidas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Sesiones por DELETE (por defecto SESIONES["LOTE"]).')
+        parser.add_argument('--pausa', type=float, default=0.2, help='Segundos de espera entre lotes.')
+
+    def handle(self, *args, **opciones):
+        if vencidas() is None:
+            self.stdout.write(f'{settings.SESSION_ENGINE} no guarda sesiones en la base de datos: no hay nada que limpiar.')
+            return
+        super().handle(*args, **opciones)
+
+    def simular(self, **opciones):
+        self.stdout.write(f'{vencidas().count():,} sesión(es) vencidas.')
+
+    def pasada(self, **opciones):
+        self.limpiar(opciones['lote'] or configuracion('LOTE'), opciones['pausa'])
+
+    def limpiar(self, lote, pausa):
+        # Límite fijo: las sesiones que vencen durante la limpieza quedan para la próxima pasada
+        limite = timezone.now()
+        eliminadas, mas_largo = 0, 0.0
+        while True:
+            inicio = time.perf_counter()
+            borradas = borrar_vencidas(limite, lote)
+            if not borradas:
+                break
+            mas_largo = max(mas_largo, (time.perf_counter() - inicio) * 1000)
+            eliminadas += borradas
+            self.stdout.write(f'  {eliminadas:,} sesiones eliminadas...', ending='\r')
+            time.sleep(pausa)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {eliminadas:,} sesión(es) vencidas eliminadas. Lote más largo: {mas_largo:.0f} ms.'
+        ))
@@ -0,0 +1,21 @@
+"""
+Envía a los administradores el aviso de los reclamos nuevos que aún no se
+notificaron (ver ``core/reclamos.py``). Los reclamos nuevos quedan
+pendientes en la base de datos hasta que este comando los envía. Una pasada
+(cron) o proceso continuo como los demás comandos de core/management/base.py::
+
+    python manage.py notificar_reclamos
+    python manage.py notificar_reclamos --continuo --intervalo 60
+"""
+from core.management.base import ComandoContinuo
+from core.reclamos import notificar_reclamos
+
+
+class Command(ComandoContinuo):
+    help = 'Envía por correo los reclamos pendientes de aviso.'
+    intervalo = 60
+
+    def pasada(self, **opciones):
+        enviados = notificar_reclamos()
+        if enviados or not opciones['continuo']:
+            self.stdout.write(self.style.SUCCESS(f'{enviados} reclamo(s) notificados.'))
@@ -0,0 +1,32 @@
+"""
+Recalcula el pronóstico de quiebre de stock y encola las alertas.
+
+Pensado para cron (por ejemplo cada hora)::
+
+    python manage.py pronosticar_stock --enviar
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.pronostico import configuracion, enviar_alertas, pronosticar
+
+
+class Command(BaseCommand):
+    help = 'Calcula el ritmo de venta por producto y estima cuándo se agota.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enviar', action='store_true', help='Envía por correo las alertas pendientes.')
+
+    def handle(self, *args, **opciones):
+        inicio = time.perf_counter()
+        pronosticos, alertas = pronosticar()
+        duracion = time.perf_counter() - inicio
+        en_riesgo = sum(1 for p in pronosticos if p.en_riesgo)
+        self.stdout.write(
+            f'{len(pronosticos)} producto(s) pronosticados con {configuracion("VENTANA_DIAS")} días '
+            f'de historial en {duracion:.2f}s. En riesgo: {en_riesgo}. Alertas nuevas: {len(alertas)}.'
+        )
+        if opciones['enviar']:
+            enviadas = enviar_alertas()
+            self.stdout.write(self.style.SUCCESS(f'{enviadas} alerta(s) enviadas.'))
@@ -0,0 +1,38 @@
+"""
+Reescribe el índice de búsqueda de pedidos del panel (``TerminoPedido`` y
+``TerminoCliente``, ver ``core/busqueda.py``) por lotes.
+
+Útil tras cargas masivas (``bulk_create`` no dispara las señales)::
+
+    python manage.py reconstruir_busqueda --lote 2000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.busqueda import CAMPOS_CLIENTE, indexar_clientes, indexar_pedidos
+from core.models import Pedido, Usuario
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de pedidos por número, cliente y teléfono.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por lote.')
+
+    def handle(self, *args, **opciones):
+        pedidos = self._recorrer(Pedido.objects.values_list('pk', 'numero_pedido'), indexar_pedidos, opciones['lote'])
+        self.stdout.write(f'  {pedidos:,} pedidos indexados.')
+        clientes = self._recorrer(Usuario.objects.values_list(*CAMPOS_CLIENTE), indexar_clientes, opciones['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {pedidos:,} pedidos y {clientes:,} usuarios indexados.'))
+
+    def _recorrer(self, consulta, indexar, lote):
+        ultimo, total = 0, 0
+        while True:
+            filas = list(consulta.filter(pk__gt=ultimo).order_by('pk')[:lote])
+            if not filas:
+                return total
+            with transaction.atomic():
+                indexar(filas)
+            ultimo = filas[-1][0]
+            total += len(filas)
+            self.stdout.write(f'  {total:,} filas...', ending='\r')
@@ -0,0 +1,30 @@
+"""
+Recalcula los contadores por estado y el plazo de atención de los reclamos
+abiertos (ver ``core/reclamos.py``). Útil tras cargas masivas o cambios
+hechos con ``update()``, que no disparan las señales::
+
+    python manage.py reconstruir_reclamos
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Reclamo
+from core.reclamos import ESTADOS_ABIERTOS, calcular_limite, reconstruir_contadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores y los plazos de la cola de reclamos.'
+
+    def handle(self, *args, **opciones):
+        cantidades = reconstruir_contadores()
+        actualizados = 0
+        abiertos = Reclamo.objects.filter(estado__in=ESTADOS_ABIERTOS).order_by('pk').only(
+            'pk', 'cliente_id', 'pedido_id', 'motivo', 'fecha_creacion',
+        )
+        for reclamo in abiertos.iterator(chunk_size=500):
+            Reclamo.objects.filter(pk=reclamo.pk).update(limite_atencion=calcular_limite(reclamo))
+            actualizados += 1
+        Reclamo.objects.exclude(estado__in=ESTADOS_ABIERTOS).filter(limite_atencion__isnull=False).update(
+            limite_atencion=None,
+        )
+        resumen = ', '.join(f'{estado}: {cantidad}' for estado, cantidad in cantidades.items())
+        self.stdout.write(self.style.SUCCESS(f'✅ Contadores: {resumen}. {actualizados:,} plazo(s) recalculados.'))
@@ -0,0 +1,35 @@
+"""
+Reescribe ``ResumenPedido`` desde los pedidos y sus detalles, por lotes.
+
+Útil tras cargas masivas (``bulk_create`` no dispara las señales) o si los
+resúmenes quedaron desalineados::
+
+    python manage.py reconstruir_resumenes --lote 2000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.historial import escribir_resumenes
+from core.models import Pedido
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes del historial de pedidos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Pedidos por lote.')
+
+    def handle(self, *args, **opciones):
+        ultimo, total = 0, 0
+        while True:
+            ids = list(
+                Pedido.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', flat=True)[:opciones['lote']]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                escribir_resumenes(ids)
+            ultimo = ids[-1]
+            total += len(ids)
+            self.stdout.write(f'  {total:,} pedidos resumidos...', ending='\r')
+        self.stdout.write(self.style.SUCCESS(f'✅ {total:,} resúmenes escritos.'))
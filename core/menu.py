@@ -0,0 +1,277 @@
+"""
+Importación y exportación masiva del menú (productos) en CSV o JSON.
+
+La importación lee el archivo fila a fila y lo procesa por lotes de
+``LOTE`` filas: valida cada fila, resuelve las categorías por nombre (se
+cargan todas con una consulta al comenzar), lee los productos existentes del
+lote con una consulta y escribe el lote con un único
+``bulk_create(update_conflicts=True)`` sobre ``Producto.nombre`` (único).
+Las filas con errores se informan y se omiten; el resto del lote se guarda.
+
+El stock no se sobrescribe: la diferencia con el saldo actual se registra
+como ajuste en el libro (``core/inventario.py``). Con ``simular=True`` no se
+escribe nada y el resultado trae el detalle de lo que cambiaría.
+
+Formatos:
+
+- CSV con encabezado: ``nombre,categoria,precio,stock,descripcion,activo,en_promocion``.
+  Solo ``nombre`` es obligatorio; las columnas ausentes o vacías conservan el
+  valor actual (un cambio de precios puede traer solo ``nombre,precio``).
+- JSON: un objeto por línea (JSON Lines, se lee en streaming) o una lista
+  de objetos, con las mismas claves.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+
+from django.db import connection, transaction
+
+from .catalogo import invalidar_productos
+from .inventario import ajustar_stock
+from .models import Categoria, Producto
+
+COLUMNAS = ['nombre', 'categoria', 'precio', 'stock', 'descripcion', 'activo', 'en_promocion']
+# Columnas que reescribe el upsert (el stock va por el libro)
+CAMPOS_UPSERT = ['descripcion', 'precio', 'categoria', 'activo', 'en_promocion', 'fecha_actualizacion']
+LOTE = 500
+
+_VERDADEROS = {'1', 'si', 'sí', 'true', 'verdadero', 's', 'x'}
+_FALSOS = {'0', 'no', 'false', 'falso', 'n', ''}
+
+
+class ErrorFila:
+    def __init__(self, fila, nombre, mensaje):
+        self.fila = fila
+        self.nombre = nombre
+        self.mensaje = mensaje
+
+    def __str__(self):
+        return f'Fila {self.fila} ({self.nombre or "sin nombre"}): {self.mensaje}'
+
+
+class ResultadoImportacion:
+    """Totales, errores por fila y, al simular, los cambios que se aplicarían."""
+
+    def __init__(self, simulado=False):
+        self.simulado = simulado
+        self.creados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self.errores = []
+        self.cambios = []  # (fila, nombre, 'nuevo' | 'cambio', {campo: (antes, después)})
+
+    @property
+    def procesados(self):
+        return self.creados + self.actualizados + self.sin_cambios
+
+
+# ---------- Lectura ----------
+
+def leer_filas(archivo, formato):
+    """Genera (número de fila, dict) desde un archivo binario, sin cargarlo entero si es CSV o JSON Lines."""
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        lector = csv.DictReader(texto)
+        for fila in lector:
+            yield lector.line_num, fila
+        return
+
+    primera = texto.readline()
+    if primera.lstrip().startswith('['):
+        # Lista JSON: se lee completa
+        for numero, fila in enumerate(json.loads(primera + texto.read()), start=1):
+            yield numero, fila
+        return
+    for numero, linea in enumerate(chain([primera], texto), start=1):
+        if linea.strip():
+            yield numero, json.loads(linea)
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = _texto(valor).lower()
+    if texto in _VERDADEROS:
+        return True
+    if texto in _FALSOS:
+        return False
+    raise ValueError(f'valor no reconocido "{valor}" (use sí/no)')
+
+
+def validar_fila(fila, categorias):
+    """
+    Convierte una fila en un dict con los campos presentes ya validados.
+    ``categorias`` es {nombre en minúsculas: id}. Lanza ValueError con el motivo.
+    """
+    if not isinstance(fila, dict):
+        raise ValueError('la fila no es un objeto')
+    nombre = _texto(fila.get('nombre'))
+    if not nombre:
+        raise ValueError('falta el nombre')
+    if len(nombre) > 100:
+        raise ValueError('el nombre supera los 100 caracteres')
+    datos = {'nombre': nombre}
+
+    if _texto(fila.get('categoria')):
+        categoria_id = categorias.get(_texto(fila['categoria']).lower())
+        if categoria_id is None:
+            raise ValueError(f'la categoría "{fila["categoria"]}" no existe')
+        datos['categoria_id'] = categoria_id
+    if _texto(fila.get('precio')):
+        try:
+            precio = Decimal(_texto(fila['precio']).replace(',', '.'))
+            if not precio.is_finite():  # NaN e Infinity no se pueden comparar ni guardar
+                raise InvalidOperation
+            precio = precio.quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f'precio inválido "{fila["precio"]}"')
+        if precio < 0 or precio >= Decimal('1e8'):
+            raise ValueError('el precio está fuera de rango')
+        datos['precio'] = precio
+    if _texto(fila.get('stock')):
+        try:
+            datos['stock'] = int(_texto(fila['stock']))
+        except ValueError:
+            raise ValueError(f'stock inválido "{fila["stock"]}"')
+        if datos['stock'] < 0:
+            raise ValueError('el stock no puede ser negativo')
+    if fila.get('descripcion') is not None:
+        datos['descripcion'] = _texto(fila['descripcion'])[:500] or None
+    for campo in ('activo', 'en_promocion'):
+        if fila.get(campo) is not None and _texto(fila[campo]):
+            try:
+                datos[campo] = _booleano(fila[campo])
+            except ValueError as error:
+                raise ValueError(f'{campo}: {error}')
+    return datos
+
+
+# ---------- Importación ----------
+
+def _procesar_lote(lote, resultado, usuario, simular, nombres_categoria):
+    """``lote`` es una lista de (fila, datos validados) con nombres únicos."""
+    existentes = Producto.objects.in_bulk([datos['nombre'] for _, datos in lote], field_name='nombre')
+    productos, stock_deseado = [], {}
+
+    for fila, datos in lote:
+        actual = existentes.get(datos['nombre'])
+        if actual is None:
+            if 'precio' not in datos or 'categoria_id' not in datos:
+                resultado.errores.append(ErrorFila(fila, datos['nombre'], 'un producto nuevo necesita precio y categoría'))
+                continue
+            producto = Producto(stock=0, **{campo: valor for campo, valor in datos.items() if campo != 'stock'})
+            cambios = {campo: (None, valor) for campo, valor in datos.items() if campo != 'nombre'}
+            resultado.creados += 1
+            accion = 'nuevo'
+        else:
+            cambios = {
+                campo: (getattr(actual, campo), valor)
+                for campo, valor in datos.items() if campo != 'nombre' and getattr(actual, campo) != valor
+            }
+            if not cambios:
+                resultado.sin_cambios += 1
+                continue
+            # Instancia sin pk: el upsert resuelve la fila por nombre
+            producto = Producto(nombre=actual.nombre, stock=actual.stock, **{
+                campo: getattr(actual, campo) for campo in ('descripcion', 'precio', 'categoria_id', 'activo', 'en_promocion')
+            })
+            for campo, (_, valor) in cambios.items():
+                if campo != 'stock':
+                    setattr(producto, campo, valor)
+            resultado.actualizados += 1
+            accion = 'cambio'
+        if 'stock' in cambios:
+            stock_deseado[datos['nombre']] = (cambios['stock'][0] or 0, cambios['stock'][1])
+        if any(campo != 'stock' for campo in cambios) or actual is None:
+            productos.append(producto)
+        if simular:
+            if 'categoria_id' in cambios:
+                antes, despues = cambios.pop('categoria_id')
+                cambios['categoria'] = (nombres_categoria.get(antes), nombres_categoria.get(despues))
+            resultado.cambios.append((fila, datos['nombre'], accion, cambios))
+
+    if simular or not (productos or stock_deseado):
+        return
+    opciones = {'update_conflicts': True, 'update_fields': CAMPOS_UPSERT}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = ['nombre']
+    with transaction.atomic():
+        Producto.objects.bulk_create(productos, batch_size=LOTE, **opciones)
+        if stock_deseado:
+            ids = dict(Producto.objects.filter(nombre__in=stock_deseado).values_list('nombre', 'pk'))
+            for nombre, (mostrado, deseado) in stock_deseado.items():
+                ajustar_stock(Producto(pk=ids[nombre], nombre=nombre), mostrado, deseado,
+                              usuario=usuario, nota='Importación de productos')
+
+
+def importar(archivo, formato, usuario=None, simular=False, lote=LOTE):
+    """Importa el archivo (binario) en ``formato`` ('csv' o 'json'). Devuelve un ResultadoImportacion."""
+    resultado = ResultadoImportacion(simulado=simular)
+    nombres_categoria = dict(Categoria.objects.values_list('pk', 'nombre'))
+    categorias = {nombre.lower(): pk for pk, nombre in nombres_categoria.items()}
+    vistos = {}
+    pendientes = []
+    try:
+        for fila, datos_crudos in leer_filas(archivo, formato):
+            try:
+                datos = validar_fila(datos_crudos, categorias)
+            except ValueError as error:
+                nombre = datos_crudos.get('nombre') if isinstance(datos_crudos, dict) else None
+                resultado.errores.append(ErrorFila(fila, nombre, str(error)))
+                continue
+            if datos['nombre'] in vistos:
+                resultado.errores.append(ErrorFila(fila, datos['nombre'], f'nombre repetido (ya en la fila {vistos[datos["nombre"]]})'))
+                continue
+            vistos[datos['nombre']] = fila
+            pendientes.append((fila, datos))
+            if len(pendientes) >= lote:
+                _procesar_lote(pendientes, resultado, usuario, simular, nombres_categoria)
+                pendientes = []
+    except (csv.Error, UnicodeDecodeError, json.JSONDecodeError) as error:
+        resultado.errores.append(ErrorFila('-', None, f'archivo ilegible: {error}'))
+    if pendientes:
+        _procesar_lote(pendientes, resultado, usuario, simular, nombres_categoria)
+    if not simular and (resultado.creados or resultado.actualizados):
+        # bulk_create no dispara post_save: se invalidan los listados en caché aquí
+        invalidar_productos()
+    return resultado
+
+
+# ---------- Exportación ----------
+
+class _Eco:
+    """Buffer mínimo para que csv.writer devuelva cada línea en vez de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _filas_exportacion():
+    return (
+        Producto.objects.order_by('nombre')
+        .values_list('nombre', 'categoria__nombre', 'precio', 'stock', 'descripcion', 'activo', 'en_promocion')
+        .iterator(chunk_size=LOTE)
+    )
+
+
+def exportar(formato):
+    """Genera el menú completo en CSV o JSON Lines, línea a línea (para StreamingHttpResponse)."""
+    if formato == 'csv':
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(COLUMNAS)
+        for nombre, categoria, precio, stock, descripcion, activo, en_promocion in _filas_exportacion():
+            yield escritor.writerow([
+                nombre, categoria or '', precio, stock, descripcion or '',
+                'sí' if activo else 'no', 'sí' if en_promocion else 'no',
+            ])
+        return
+    for fila in _filas_exportacion():
+        datos = dict(zip(COLUMNAS, fila))
+        datos['precio'] = str(datos['precio'])
+        yield json.dumps(datos, ensure_ascii=False) + '\n'
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def saldos_iniciales(apps, schema_editor):
+    """El stock existente entra al libro como un ajuste inicial por producto."""
+    Producto = apps.get_model('core', 'Producto')
+    MovimientoStock = apps.get_model('core', 'MovimientoStock')
+    saldos = Producto.objects.exclude(stock=0).values_list('pk', 'stock').iterator(chunk_size=2000)
+    lote = []
+    for producto_id, stock in saldos:
+        lote.append(MovimientoStock(producto_id=producto_id, tipo='ajuste', cantidad=stock, nota='Saldo inicial'))
+        if len(lote) >= 2000:
+            MovimientoStock.objects.bulk_create(lote)
+            lote = []
+    MovimientoStock.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_producto_en_promocion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('venta', 'Venta'), ('reposicion', 'Reposición'), ('ajuste', 'Ajuste'), ('devolucion', 'Devolución por Cancelación')], max_length=20)),
+                ('cantidad', models.IntegerField(help_text='Positivo: entra stock. Negativo: sale stock.')),
+                ('nota', models.CharField(blank=True, max_length=200, null=True)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='core.pedido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_stock', to='core.producto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='core_movimi_product_df0e18_idx')],
+            },
+        ),
+        migrations.RunPython(saldos_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_movimientostock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoStock',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pronostico', serialize=False, to='core.producto')),
+                ('stock', models.IntegerField(help_text='Stock al momento del cálculo')),
+                ('venta_diaria', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('agotamiento', models.DateTimeField(blank=True, help_text='Vacío si no se agota dentro del horizonte', null=True)),
+                ('proxima_reposicion', models.DateTimeField()),
+                ('en_riesgo', models.BooleanField(default=False)),
+                ('fecha_calculo', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de Stock',
+                'verbose_name_plural': 'Pronósticos de Stock',
+                'indexes': [models.Index(fields=['en_riesgo', 'agotamiento'], name='core_pronos_en_ries_41f72a_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviada', 'Enviada'), ('resuelta', 'Resuelta')], default='pendiente', max_length=20)),
+                ('stock', models.IntegerField()),
+                ('agotamiento', models.DateTimeField(blank=True, null=True)),
+                ('proxima_reposicion', models.DateTimeField()),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_stock', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Stock',
+                'verbose_name_plural': 'Alertas de Stock',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'producto'], name='core_alerta_estado_e5a932_idx')],
+            },
+        ),
+    ]
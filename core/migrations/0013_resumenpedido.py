@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def crear_resumenes(apps, schema_editor):
+    """Resume los pedidos existentes por lotes (misma lógica que core/historial.py)."""
+    from django.core.files.storage import default_storage
+
+    Pedido = apps.get_model('core', 'Pedido')
+    DetallePedido = apps.get_model('core', 'DetallePedido')
+    ResumenPedido = apps.get_model('core', 'ResumenPedido')
+    ultimo = 0
+    while True:
+        pedidos = list(Pedido.objects.filter(pk__gt=ultimo).order_by('pk')[:2000])
+        if not pedidos:
+            break
+        ultimo = pedidos[-1].pk
+        lineas = {}
+        detalles = DetallePedido.objects.filter(pedido__in=pedidos).order_by('pedido_id', 'pk').values_list(
+            'pedido_id', 'producto__nombre', 'producto__imagen', 'cantidad')
+        for pedido_id, nombre, imagen, cantidad in detalles:
+            lineas.setdefault(pedido_id, []).append((nombre, imagen, cantidad))
+        resumenes = []
+        for pedido in pedidos:
+            nombres, miniatura = [], ''
+            for nombre, imagen, _ in lineas.get(pedido.pk, []):
+                if nombre not in nombres:
+                    nombres.append(nombre)
+                if imagen and not miniatura:
+                    miniatura = default_storage.url(imagen)
+            resumenes.append(ResumenPedido(
+                pedido_id=pedido.pk, cliente_id=pedido.cliente_id, numero_pedido=pedido.numero_pedido,
+                tipo_orden=pedido.tipo_orden, estado=pedido.estado, subtotal=pedido.subtotal,
+                costo_envio=pedido.costo_envio, total=pedido.total,
+                cantidad_items=sum(c for _, _, c in lineas.get(pedido.pk, [])),
+                productos=', '.join(nombres[:3])[:255], productos_restantes=max(len(nombres) - 3, 0),
+                miniatura=miniatura, fecha_creacion=pedido.fecha_creacion,
+            ))
+        ResumenPedido.objects.bulk_create(resumenes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_pronosticostock_alertastock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenPedido',
+            fields=[
+                ('pedido', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='core.pedido')),
+                ('numero_pedido', models.CharField(max_length=20)),
+                ('tipo_orden', models.CharField(choices=[('local', 'Para Comer en Local'), ('retiro', 'Para Retirar'), ('delivery', 'Delivery a Domicilio ')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('en_preparacion', 'En Preparación'), ('listo', 'Listo para Entregar'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('costo_envio', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad_items', models.PositiveIntegerField(default=0)),
+                ('productos', models.CharField(blank=True, help_text='Primeros productos del pedido', max_length=255)),
+                ('productos_restantes', models.PositiveIntegerField(default=0)),
+                ('miniatura', models.CharField(blank=True, help_text='URL de la imagen del primer producto', max_length=255)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('cliente', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_pedidos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumen de Pedido',
+                'verbose_name_plural': 'Resúmenes de Pedidos',
+                'indexes': [models.Index(fields=['cliente', '-fecha_creacion', '-pedido'], name='core_resume_cliente_150948_idx')],
+            },
+        ),
+        migrations.RunPython(crear_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_resumenpedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarritoAbandonado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_items', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('lineas', models.JSONField(default=list)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('ultima_actividad', models.DateTimeField()),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Carrito Abandonado',
+                'verbose_name_plural': 'Carritos Abandonados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(fields=['fecha_actualizacion'], name='core_carrit_fecha_a_cf8a21_idx'),
+        ),
+        migrations.AddField(
+            model_name='carritoabandonado',
+            name='usuario',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='carritos_abandonados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='carritoabandonado',
+            index=models.Index(fields=['ultima_actividad'], name='core_carrit_ultima__4ea246_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_carritoabandonado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promocion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('tipo', models.CharField(choices=[('porcentaje', 'Porcentaje de descuento'), ('monto', 'Monto de descuento'), ('precio_fijo', 'Precio especial')], default='porcentaje', max_length=20)),
+                ('valor', models.DecimalField(decimal_places=2, help_text='Porcentaje (0-100), monto a descontar o precio especial según el tipo.', max_digits=10)),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField()),
+                ('activo', models.BooleanField(default=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('categorias', models.ManyToManyField(blank=True, help_text='Aplica a todos los productos de estas categorías.', related_name='promociones', to='core.categoria')),
+                ('productos', models.ManyToManyField(blank=True, related_name='promociones', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Promoción',
+                'verbose_name_plural': 'Promociones',
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['activo', 'fin', 'inicio'], name='core_promoc_activo_dc895b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,135 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_promocion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetallePedidoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                'verbose_name': 'Detalle de Pedido Archivado',
+                'verbose_name_plural': 'Detalles de Pedidos Archivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='PedidoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('numero_pedido', models.CharField(max_length=20, unique=True)),
+                ('tipo_orden', models.CharField(choices=[('local', 'Para Comer en Local'), ('retiro', 'Para Retirar'), ('delivery', 'Delivery a Domicilio ')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('en_preparacion', 'En Preparación'), ('listo', 'Listo para Entregar'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('direccion_entrega', models.CharField(blank=True, max_length=1200, null=True)),
+                ('referencia_direccion', models.CharField(blank=True, max_length=200, null=True)),
+                ('nombre_referencia_cliente', models.CharField(blank=True, max_length=100, null=True)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('costo_envio', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('notas_cliente', models.TextField(blank=True, null=True)),
+                ('notas_cocina', models.TextField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_confirmacion', models.DateTimeField(blank=True, null=True)),
+                ('fecha_preparacion', models.DateTimeField(blank=True, null=True)),
+                ('fecha_listo', models.DateTimeField(blank=True, null=True)),
+                ('fecha_entrega', models.DateTimeField(blank=True, null=True)),
+                ('cantidad_items', models.PositiveIntegerField(default=0)),
+                ('productos', models.CharField(blank=True, max_length=255)),
+                ('productos_restantes', models.PositiveIntegerField(default=0)),
+                ('miniatura', models.CharField(blank=True, max_length=255)),
+                ('fecha_archivo', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Pedido Archivado',
+                'verbose_name_plural': 'Pedidos Archivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReclamoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('motivo', models.CharField(choices=[('pedido_incorrecto', 'Pedido Incorrecto'), ('producto_danado', 'Producto Dañado'), ('demora_excesiva', 'Demora Excesiva'), ('mala_atencion', 'Mala Atención'), ('otro', 'Otro')], max_length=20)),
+                ('descripcion', models.TextField()),
+                ('estado', models.CharField(choices=[('nuevo', 'Nuevo'), ('en_revision', 'En Revisión'), ('respondido', 'Respondido'), ('resuelto', 'Resuelto'), ('cerrado', 'Cerrado')], max_length=20)),
+                ('respuesta', models.TextField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_respuesta', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Reclamo Archivado',
+                'verbose_name_plural': 'Reclamos Archivados',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='pedido',
+            options={'verbose_name': 'Pedido', 'verbose_name_plural': 'Pedidos'},
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_creacion'], name='core_pedido_fecha_c_26bdca_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='core_pedido_estado_f6dd98_idx'),
+        ),
+        migrations.AddField(
+            model_name='detallepedidoarchivado',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.producto'),
+        ),
+        migrations.AddField(
+            model_name='pedidoarchivado',
+            name='cliente',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos_archivados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='pedidoarchivado',
+            name='metodo_pago',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.metodopago'),
+        ),
+        migrations.AddField(
+            model_name='pedidoarchivado',
+            name='repartidor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.repartidor'),
+        ),
+        migrations.AddField(
+            model_name='detallepedidoarchivado',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='core.pedidoarchivado'),
+        ),
+        migrations.AddField(
+            model_name='reclamoarchivado',
+            name='atendido_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='reclamoarchivado',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='reclamoarchivado',
+            name='pedido',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reclamos', to='core.pedidoarchivado'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidoarchivado',
+            index=models.Index(fields=['cliente', '-fecha_creacion', '-id'], name='core_pedido_cliente_cb24ef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidoarchivado',
+            index=models.Index(fields=['fecha_creacion'], name='core_pedido_fecha_c_dca2bf_idx'),
+        ),
+    ]
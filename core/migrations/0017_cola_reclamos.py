@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:06
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def llenar_cola(apps, schema_editor):
+    """Contadores por estado y plazo de los reclamos abiertos (misma lógica que core/reclamos.py)."""
+    Reclamo = apps.get_model('core', 'Reclamo')
+    ContadorReclamos = apps.get_model('core', 'ContadorReclamos')
+    # Los estados sin reclamos no necesitan fila: sumar_contador la crea al primer uso
+    ContadorReclamos.objects.bulk_create([
+        ContadorReclamos(estado=estado, cantidad=cantidad)
+        for estado, cantidad in Reclamo.objects.order_by().values_list('estado').annotate(n=Count('pk'))
+    ])
+
+    horas_motivo = {'producto_danado': 24, 'pedido_incorrecto': 24, 'demora_excesiva': 12, 'mala_atencion': 6}
+    abiertos = Reclamo.objects.filter(estado__in=['nuevo', 'en_revision', 'respondido']).select_related('pedido')
+    for reclamo in abiertos:
+        previos = Reclamo.objects.filter(
+            cliente_id=reclamo.cliente_id, fecha_creacion__gte=reclamo.fecha_creacion - timedelta(days=90),
+        ).exclude(pk=reclamo.pk).count()
+        horas = 48 - horas_motivo.get(reclamo.motivo, 0)
+        horas -= min(int(reclamo.pedido.total // 2000), 12) + min(previos * 6, 24)
+        Reclamo.objects.filter(pk=reclamo.pk).update(
+            limite_atencion=reclamo.fecha_creacion + timedelta(hours=max(horas, 2)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_archivo_pedidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorReclamos',
+            fields=[
+                ('estado', models.CharField(choices=[('nuevo', 'Nuevo'), ('en_revision', 'En Revisión'), ('respondido', 'Respondido'), ('resuelto', 'Resuelto'), ('cerrado', 'Cerrado')], max_length=20, primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Contador de Reclamos',
+                'verbose_name_plural': 'Contadores de Reclamos',
+            },
+        ),
+        migrations.AddField(
+            model_name='reclamo',
+            name='limite_atencion',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reclamo',
+            index=models.Index(fields=['limite_atencion', 'id'], name='core_reclam_limite__b6f6bd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamo',
+            index=models.Index(fields=['estado', 'limite_atencion', 'id'], name='core_reclam_estado_6bbc6d_idx'),
+        ),
+        migrations.RunPython(llenar_cola, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:08
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marcar_existentes(apps, schema_editor):
+    """Los reclamos anteriores no se notifican."""
+    Reclamo = apps.get_model('core', 'Reclamo')
+    pendientes = Reclamo.objects.filter(fecha_notificacion__isnull=True)
+    if pendientes.exists():
+        pendientes.update(fecha_notificacion=F('fecha_creacion'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_cola_reclamos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reclamo',
+            name='fecha_notificacion',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
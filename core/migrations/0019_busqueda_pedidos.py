@@ -0,0 +1,93 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:16
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return re.sub(r'[^0-9a-z]+', '', texto.encode('ascii', 'ignore').decode('ascii'))
+
+
+def _sufijos(valor, largo_maximo, minimo=3):
+    valor = valor[-largo_maximo:]
+    if len(valor) <= minimo:
+        return [(valor, 0)] if valor else []
+    return [(valor[posicion:], posicion) for posicion in range(len(valor) - minimo + 1)]
+
+
+def llenar_indice(apps, schema_editor):
+    """Indexa pedidos y usuarios existentes por lotes (misma lógica que core/busqueda.py)."""
+    Pedido = apps.get_model('core', 'Pedido')
+    Usuario = apps.get_model('core', 'Usuario')
+    TerminoPedido = apps.get_model('core', 'TerminoPedido')
+    TerminoCliente = apps.get_model('core', 'TerminoCliente')
+    ultimo = 0
+    while True:
+        pedidos = list(Pedido.objects.filter(pk__gt=ultimo).order_by('pk').values_list('pk', 'numero_pedido')[:2000])
+        if not pedidos:
+            break
+        ultimo = pedidos[-1][0]
+        TerminoPedido.objects.bulk_create([
+            TerminoPedido(pedido_id=pk, termino=termino, posicion=posicion)
+            for pk, numero in pedidos
+            for termino, posicion in _sufijos(_normalizar(numero), 20)
+        ])
+    ultimo = 0
+    while True:
+        usuarios = list(
+            Usuario.objects.filter(pk__gt=ultimo).order_by('pk')
+            .values_list('pk', 'first_name', 'last_name', 'username', 'telefono')[:2000]
+        )
+        if not usuarios:
+            break
+        ultimo = usuarios[-1][0]
+        terminos = []
+        for pk, nombre, apellido, username, telefono in usuarios:
+            palabras = {_normalizar(palabra)[:40] for palabra in f'{nombre or ""} {apellido or ""} {username or ""}'.split()}
+            palabras.update(termino for termino, _ in _sufijos(_normalizar(telefono), 40))
+            palabras.discard('')
+            terminos.extend(TerminoCliente(cliente_id=pk, termino=termino) for termino in palabras)
+        TerminoCliente.objects.bulk_create(terminos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_reclamo_notificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Término de Cliente',
+                'verbose_name_plural': 'Términos de Clientes',
+                'indexes': [models.Index(fields=['termino', 'cliente'], name='core_termin_termino_37d3f3_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TerminoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=20)),
+                ('posicion', models.PositiveSmallIntegerField(help_text='0 si el término es el número completo')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.pedido')),
+            ],
+            options={
+                'verbose_name': 'Término de Pedido',
+                'verbose_name_plural': 'Términos de Pedidos',
+                'indexes': [models.Index(fields=['termino', 'pedido', 'posicion'], name='core_termin_termino_886b6c_idx')],
+            },
+        ),
+        migrations.RunPython(llenar_indice, migrations.RunPython.noop),
+    ]
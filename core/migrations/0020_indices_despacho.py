@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_busqueda_pedidos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['repartidor', 'estado'], name='core_pedido_reparti_dc6dd2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['repartidor', 'fecha_entrega'], name='core_pedido_reparti_7bf486_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 
 class Usuario(AbstractUser):
       ROLES = [
@@ -62,6 +63,45 @@ class Producto(models.Model):
             """Verifica si el producto está disponible para la venta"""
             return self.activo and self.stock > 0
 
+class Promocion(models.Model):
+      """
+      Descuento programado sobre productos y/o categorías, vigente entre
+      ``inicio`` (incluido) y ``fin`` (excluido). Los precios se resuelven en
+      core/promociones.py; si varias promociones aplican se usa el menor precio.
+      """
+      TIPO_CHOICES = [
+            ('porcentaje', 'Porcentaje de descuento'),
+            ('monto', 'Monto de descuento'),
+            ('precio_fijo', 'Precio especial'),
+      ]
+
+      nombre = models.CharField(max_length=100)
+      tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='porcentaje')
+      valor = models.DecimalField(max_digits=10, decimal_places=2, help_text="Porcentaje (0-100), monto a descontar o precio especial según el tipo.")
+      inicio = models.DateTimeField()
+      fin = models.DateTimeField()
+      productos = models.ManyToManyField(Producto, blank=True, related_name='promociones')
+      categorias = models.ManyToManyField(Categoria, blank=True, related_name='promociones', help_text="Aplica a todos los productos de estas categorías.")
+      activo = models.BooleanField(default=True)
+      fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+      class Meta:
+            verbose_name = 'Promoción'
+            verbose_name_plural = 'Promociones'
+            ordering = ['-inicio']
+            indexes = [models.Index(fields=['activo', 'fin', 'inicio'])]
+
+      def __str__(self):
+            return f"{self.nombre} ({self.inicio:%d/%m %H:%M} - {self.fin:%d/%m %H:%M})"
+
+      def clean(self):
+            if self.inicio and self.fin and self.fin <= self.inicio:
+                  raise ValidationError({'fin': 'El fin debe ser posterior al inicio.'})
+            if self.valor is not None and self.valor < 0:
+                  raise ValidationError({'valor': 'El valor no puede ser negativo.'})
+            if self.tipo == 'porcentaje' and self.valor is not None and self.valor > 100:
+                  raise ValidationError({'valor': 'El porcentaje no puede superar 100.'})
+
 class Repartidor(models.Model):
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, related_name='perfil_repartidor')
     vehiculo = models.CharField(max_length=100, blank=True, null=True)
@@ -83,6 +123,8 @@ class Carrito(models.Model):
       class Meta:
             verbose_name = 'Carrito'
             verbose_name_plural = 'Carritos'
+            # Para buscar carritos abandonados (limpiar_carritos)
+            indexes = [models.Index(fields=['fecha_actualizacion'])]
 
       def __str__(self):
             return f"Carrito de {self.usuario.username}"
@@ -110,7 +152,29 @@ class ItemCarrito(models.Model):
 
       @property
       def subtotal(self):
-            return self.producto.precio * self.cantidad
+            # Con el precio de promoción si la vista lo anotó (core/promociones.py)
+            return getattr(self.producto, 'precio_efectivo', self.producto.precio) * self.cantidad
+
+class CarritoAbandonado(models.Model):
+      """
+      Copia compacta de un carrito eliminado por inactividad (limpiar_carritos),
+      para análisis. Las líneas van en ``lineas`` como [producto_id, cantidad, precio].
+      """
+      usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='carritos_abandonados')
+      cantidad_items = models.PositiveIntegerField(default=0)
+      total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+      lineas = models.JSONField(default=list)
+      fecha_creacion = models.DateTimeField()
+      ultima_actividad = models.DateTimeField()
+      fecha_archivo = models.DateTimeField(auto_now_add=True)
+
+      class Meta:
+            verbose_name = 'Carrito Abandonado'
+            verbose_name_plural = 'Carritos Abandonados'
+            indexes = [models.Index(fields=['ultima_actividad'])]
+
+      def __str__(self):
+            return f"Carrito abandonado ({self.cantidad_items} ítems, {self.ultima_actividad:%d/%m/%Y})"
 
 class MetodoPago(models.Model):
       """Metodos de pagos disponibles"""
@@ -191,18 +255,36 @@ class Pedido(models.Model):
 
     #   verbose_name_plural: plural del nombre.
 
-    #   ordering: orden por defecto al consultar (-fecha_creacion → más recientes primero).
+    #   Sin ``ordering`` por defecto: cada consulta ordena explícitamente
+    #   (un orden implícito obliga a ordenar toda la tabla en cada queryset).
 
       class Meta:
             verbose_name = 'Pedido'
             verbose_name_plural = 'Pedidos'
-            ordering = ['-fecha_creacion']
+            indexes = [
+                  models.Index(fields=['fecha_creacion']),
+                  # Candidatos a archivo (core/archivo.py) y listados por estado
+                  models.Index(fields=['estado', 'fecha_creacion']),
+                  # Carga y última entrega de cada repartidor (core/despacho.py)
+                  models.Index(fields=['repartidor', 'estado']),
+                  models.Index(fields=['repartidor', 'fecha_entrega']),
+            ]
 
       def __str__(self):
            # Muestra nombre de referencia si existe, si no, username (si existe cliente)
            cliente_str = self.nombre_referencia_cliente or (self.cliente.username if self.cliente else "N/A")
            return f"#{self.numero_pedido} - Pedido de {cliente_str}"
 
+      @classmethod
+      def from_db(cls, db, field_names, values):
+            # Guardamos el estado, el repartidor y el número con que se leyó el pedido
+            # para que las señales (core/signals.py) detecten los cambios
+            instancia = super().from_db(db, field_names, values)
+            instancia._estado_original = instancia.__dict__.get('estado')
+            instancia._repartidor_original = instancia.__dict__.get('repartidor_id')
+            instancia._numero_original = instancia.__dict__.get('numero_pedido')
+            return instancia
+
       def save(self, *args, **kwargs):
             if not self.numero_pedido:
                   import random
@@ -211,7 +293,8 @@ class Pedido(models.Model):
                   # Genera número aleatorio si no existe
                   self.numero_pedido = ''.join(random.choices(string.digits, k=8))
                   # Asegura que sea único (aunque la probabilidad de colisión es baja)
-                  while Pedido.objects.filter(numero_pedido=self.numero_pedido).exists():
+                  while (Pedido.objects.filter(numero_pedido=self.numero_pedido).exists()
+                         or PedidoArchivado.objects.filter(numero_pedido=self.numero_pedido).exists()):
                       self.numero_pedido = ''.join(random.choices(string.digits, k=8))
             super().save(*args, **kwargs)
 
@@ -233,6 +316,146 @@ class DetallePedido(models.Model):
             self.subtotal = self.precio_unitario * self.cantidad
             super().save(*args, **kwargs)
 
+class ResumenPedido(models.Model):
+      """
+      Resumen desnormalizado de un pedido para el historial del cliente. Se
+      escribe al crear el pedido (core/historial.py) para que "Mis Pedidos" se
+      arme con una sola consulta por página, sin recorrer los detalles.
+      """
+      pedido = models.OneToOneField(Pedido, on_delete=models.CASCADE, primary_key=True, related_name='resumen')
+      cliente = models.ForeignKey(Usuario, on_delete=models.CASCADE, null=True, related_name='resumenes_pedidos')
+      numero_pedido = models.CharField(max_length=20)
+      tipo_orden = models.CharField(max_length=20, choices=Pedido.TIPO_ORDEN_CHOICES)
+      estado = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES)
+      subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+      costo_envio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+      total = models.DecimalField(max_digits=10, decimal_places=2)
+      cantidad_items = models.PositiveIntegerField(default=0)
+      productos = models.CharField(max_length=255, blank=True, help_text="Primeros productos del pedido")
+      productos_restantes = models.PositiveIntegerField(default=0)
+      miniatura = models.CharField(max_length=255, blank=True, help_text="URL de la imagen del primer producto")
+      fecha_creacion = models.DateTimeField()
+
+      class Meta:
+            verbose_name = 'Resumen de Pedido'
+            verbose_name_plural = 'Resúmenes de Pedidos'
+            indexes = [models.Index(fields=['cliente', '-fecha_creacion', '-pedido'])]
+
+      def __str__(self):
+            return f"Resumen #{self.numero_pedido}"
+
+class TerminoPedido(models.Model):
+      """
+      Índice de búsqueda por número de pedido (core/busqueda.py). Guarda cada
+      sufijo del número normalizado, así que un prefijo de cualquier sufijo
+      encuentra tanto el comienzo del número como una parte intermedia.
+      """
+      termino = models.CharField(max_length=20)
+      pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='+')
+      posicion = models.PositiveSmallIntegerField(help_text="0 si el término es el número completo")
+
+      class Meta:
+            verbose_name = 'Término de Pedido'
+            verbose_name_plural = 'Términos de Pedidos'
+            # Cubre la búsqueda: las filas se leen solo desde el índice
+            indexes = [models.Index(fields=['termino', 'pedido', 'posicion'])]
+
+      def __str__(self):
+            return self.termino
+
+class TerminoCliente(models.Model):
+      """Índice de búsqueda de clientes por palabras del nombre, usuario y teléfono (core/busqueda.py)."""
+      termino = models.CharField(max_length=40)
+      cliente = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='+')
+
+      class Meta:
+            verbose_name = 'Término de Cliente'
+            verbose_name_plural = 'Términos de Clientes'
+            indexes = [models.Index(fields=['termino', 'cliente'])]
+
+      def __str__(self):
+            return self.termino
+
+class MovimientoStock(models.Model):
+      """
+      Libro de stock: cada cambio de Producto.stock queda registrado aquí.
+      Es de solo inserción; Producto.stock es el saldo materializado y se
+      actualiza con incrementos F() desde core/inventario.py.
+      """
+      TIPO_CHOICES = [
+            ('venta', 'Venta'),
+            ('reposicion', 'Reposición'),
+            ('ajuste', 'Ajuste'),
+            ('devolucion', 'Devolución por Cancelación'),
+      ]
+
+      producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos_stock')
+      tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+      cantidad = models.IntegerField(help_text="Positivo: entra stock. Negativo: sale stock.")
+      pedido = models.ForeignKey(Pedido, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+      usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+      nota = models.CharField(max_length=200, blank=True, null=True)
+      fecha = models.DateTimeField(auto_now_add=True)
+
+      class Meta:
+            verbose_name = 'Movimiento de Stock'
+            verbose_name_plural = 'Movimientos de Stock'
+            indexes = [models.Index(fields=['producto', 'fecha'])]
+
+      def __str__(self):
+            return f"{self.get_tipo_display()} {self.cantidad:+d} - {self.producto.nombre}"
+
+      def save(self, *args, **kwargs):
+            if self.pk:
+                  raise ValueError('Los movimientos de stock no se modifican: registra un ajuste nuevo.')
+            super().save(*args, **kwargs)
+
+class PronosticoStock(models.Model):
+      """
+      Resultado de ``pronosticar_stock``: una fila por producto con su ritmo de
+      venta y la fecha estimada de quiebre. El dashboard lee esta tabla.
+      """
+      producto = models.OneToOneField(Producto, on_delete=models.CASCADE, primary_key=True, related_name='pronostico')
+      stock = models.IntegerField(help_text="Stock al momento del cálculo")
+      venta_diaria = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+      agotamiento = models.DateTimeField(null=True, blank=True, help_text="Vacío si no se agota dentro del horizonte")
+      proxima_reposicion = models.DateTimeField()
+      en_riesgo = models.BooleanField(default=False)
+      fecha_calculo = models.DateTimeField()
+
+      class Meta:
+            verbose_name = 'Pronóstico de Stock'
+            verbose_name_plural = 'Pronósticos de Stock'
+            indexes = [models.Index(fields=['en_riesgo', 'agotamiento'])]
+
+      def __str__(self):
+            return f"Pronóstico {self.producto.nombre}"
+
+class AlertaStock(models.Model):
+      """Aviso encolado cuando un producto se agotará antes de la próxima reposición."""
+      ESTADO_CHOICES = [
+            ('pendiente', 'Pendiente'),
+            ('enviada', 'Enviada'),
+            ('resuelta', 'Resuelta'),
+      ]
+
+      producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='alertas_stock')
+      estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+      stock = models.IntegerField()
+      agotamiento = models.DateTimeField(null=True, blank=True)
+      proxima_reposicion = models.DateTimeField()
+      fecha_creacion = models.DateTimeField(auto_now_add=True)
+      fecha_envio = models.DateTimeField(null=True, blank=True)
+
+      class Meta:
+            verbose_name = 'Alerta de Stock'
+            verbose_name_plural = 'Alertas de Stock'
+            ordering = ['-fecha_creacion']
+            indexes = [models.Index(fields=['estado', 'producto'])]
+
+      def __str__(self):
+            return f"Alerta {self.producto.nombre} ({self.get_estado_display()})"
+
 class Reclamo(models.Model):
       MOTIVO_CHOICES = [
             ('pedido_incorrecto', 'Pedido Incorrecto'),
@@ -263,14 +486,134 @@ class Reclamo(models.Model):
       fecha_creacion = models.DateTimeField(auto_now_add=True)
       fecha_respuesta = models.DateTimeField(null=True, blank=True)
 
+      # Plazo de atención según la prioridad (core/reclamos.py); vacío si está cerrado
+      limite_atencion = models.DateTimeField(null=True, blank=True, editable=False)
+      # Aviso a los administradores (core/reclamos.py); vacío mientras está pendiente
+      fecha_notificacion = models.DateTimeField(null=True, blank=True, editable=False)
+
       class Meta:
             verbose_name = 'Reclamo'
             verbose_name_plural = 'Reclamos'
             ordering = ['-fecha_creacion']
+            indexes = [
+                  # Cola de reclamos abiertos y cola por estado
+                  models.Index(fields=['limite_atencion', 'id']),
+                  models.Index(fields=['estado', 'limite_atencion', 'id']),
+            ]
 
       def __str__(self):
             return f"#{self.id} Reclamo - {self.cliente.username}"
 
+      @classmethod
+      def from_db(cls, db, field_names, values):
+            # Estado con que se leyó, para mover los contadores por estado (core/signals.py)
+            instancia = super().from_db(db, field_names, values)
+            instancia._estado_original = instancia.__dict__.get('estado')
+            return instancia
+
+class ContadorReclamos(models.Model):
+      """Cantidad de reclamos por estado, mantenida por señales para los contadores del panel."""
+      estado = models.CharField(max_length=20, primary_key=True, choices=Reclamo.ESTADO_CHOICES)
+      cantidad = models.IntegerField(default=0)
+
+      class Meta:
+            verbose_name = 'Contador de Reclamos'
+            verbose_name_plural = 'Contadores de Reclamos'
+
+      def __str__(self):
+            return f"{self.get_estado_display()}: {self.cantidad}"
+
+# ---------- Archivo de pedidos ----------
+# Pedidos entregados o cancelados antiguos que ``archivar_pedidos`` mueve fuera
+# de las tablas activas (core/archivo.py). Conservan el id y el número originales.
+
+class PedidoArchivado(models.Model):
+      """Pedido archivado, con las columnas de su ResumenPedido para el historial del cliente."""
+      id = models.BigIntegerField(primary_key=True)
+      cliente = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='pedidos_archivados')
+      repartidor = models.ForeignKey(Repartidor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+      metodo_pago = models.ForeignKey(MetodoPago, on_delete=models.PROTECT, related_name='+')
+
+      numero_pedido = models.CharField(max_length=20, unique=True)
+      tipo_orden = models.CharField(max_length=20, choices=Pedido.TIPO_ORDEN_CHOICES)
+      estado = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES)
+
+      direccion_entrega = models.CharField(max_length=1200, null=True, blank=True)
+      referencia_direccion = models.CharField(max_length=200, blank=True, null=True)
+      nombre_referencia_cliente = models.CharField(max_length=100, blank=True, null=True)
+
+      subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+      costo_envio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+      total = models.DecimalField(max_digits=10, decimal_places=2)
+
+      notas_cliente = models.TextField(blank=True, null=True)
+      notas_cocina = models.TextField(blank=True, null=True)
+
+      fecha_creacion = models.DateTimeField()
+      fecha_confirmacion = models.DateTimeField(null=True, blank=True)
+      fecha_preparacion = models.DateTimeField(null=True, blank=True)
+      fecha_listo = models.DateTimeField(null=True, blank=True)
+      fecha_entrega = models.DateTimeField(null=True, blank=True)
+
+      # Copiado de ResumenPedido
+      cantidad_items = models.PositiveIntegerField(default=0)
+      productos = models.CharField(max_length=255, blank=True)
+      productos_restantes = models.PositiveIntegerField(default=0)
+      miniatura = models.CharField(max_length=255, blank=True)
+
+      fecha_archivo = models.DateTimeField(auto_now_add=True)
+
+      class Meta:
+            verbose_name = 'Pedido Archivado'
+            verbose_name_plural = 'Pedidos Archivados'
+            indexes = [
+                  models.Index(fields=['cliente', '-fecha_creacion', '-id']),
+                  models.Index(fields=['fecha_creacion']),
+            ]
+
+      def __str__(self):
+            return f"#{self.numero_pedido} (archivado)"
+
+      @property
+      def pedido_id(self):
+            # Misma forma que ResumenPedido para las plantillas del historial
+            return self.id
+
+class DetallePedidoArchivado(models.Model):
+      id = models.BigIntegerField(primary_key=True)
+      pedido = models.ForeignKey(PedidoArchivado, on_delete=models.CASCADE, related_name='detalles')
+      producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name='+')
+      cantidad = models.PositiveIntegerField()
+      precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+      subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+      class Meta:
+            verbose_name = 'Detalle de Pedido Archivado'
+            verbose_name_plural = 'Detalles de Pedidos Archivados'
+
+      def __str__(self):
+            return f"{self.cantidad}x {self.producto.nombre} - {self.pedido.numero_pedido}"
+
+class ReclamoArchivado(models.Model):
+      """Reclamo cerrado de un pedido archivado."""
+      id = models.BigIntegerField(primary_key=True)
+      cliente = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='+')
+      pedido = models.ForeignKey(PedidoArchivado, on_delete=models.CASCADE, related_name='reclamos')
+      motivo = models.CharField(max_length=20, choices=Reclamo.MOTIVO_CHOICES)
+      descripcion = models.TextField()
+      estado = models.CharField(max_length=20, choices=Reclamo.ESTADO_CHOICES)
+      respuesta = models.TextField(blank=True, null=True)
+      atendido_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+      fecha_creacion = models.DateTimeField()
+      fecha_respuesta = models.DateTimeField(null=True, blank=True)
+
+      class Meta:
+            verbose_name = 'Reclamo Archivado'
+            verbose_name_plural = 'Reclamos Archivados'
+
+      def __str__(self):
+            return f"#{self.id} Reclamo archivado"
+
 class Slide(models.Model):
       """Modelo para gestionar los slides del carrusel de la página de inicio."""
       imagen = models.ImageField(upload_to='slides/', blank=True, null=True, help_text="Tamaño recomendado: 1200x600px")
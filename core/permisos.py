@@ -0,0 +1,196 @@
+"""
+Permisos por rol, guardados en la sesión.
+
+Cada vista protegida declara el permiso que necesita::
+
+    @permiso_requerido('panel')
+    def admin_productos_lista(request): ...
+
+``PERMISOS_POR_ROL`` dice qué puede hacer cada rol. Al iniciar sesión (señal
+``user_logged_in``) se guardan en la sesión el rol, sus permisos y el id del
+perfil de repartidor. La vista recibe los datos en ``request.permisos`` sin
+cargar el usuario ni ``perfil_repartidor``. Para saber si siguen vigentes hay
+dos modos (``PERMISOS['VERSION_EN_CACHE']``):
+
+- Caché compartida (Redis, Memcached; se elige sola si ``CACHES['default']``
+  no es LocMem): cero consultas por petición. Guardar un usuario o su perfil
+  de repartidor cambia la versión del usuario en la caché (señales en
+  core/signals.py) y todas sus sesiones, en cualquier proceso, recargan sus
+  permisos en la siguiente petición. Los cambios con ``update()`` no emiten
+  señales: hay que llamar a ``invalidar_permisos``.
+- Caché por proceso (LocMem, la configuración por defecto): una versión en la
+  caché de un worker no se entera de lo que cambió otro, así que se hace una
+  consulta indexada por petición (``values_list`` del usuario y su perfil)
+  que compara el rol, el estado activo, el hash de la contraseña y el perfil
+  con lo guardado en la sesión.
+
+En los dos casos, si los datos no coinciden los permisos se vuelven a cargar
+desde ``request.user``, que valida la sesión (usuario activo y hash de la
+contraseña) y la cierra si ya no es válida.
+"""
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.crypto import constant_time_compare
+
+from .models import Usuario
+
+CLAVE_SESION = '_permisos'
+
+PERMISOS_POR_ROL = {
+    'administrador': {'panel', 'pos', 'eventos_stock'},
+    'cajero': {'pos', 'eventos_stock'},
+    'cocina': {'eventos_stock'},
+    'repartidor': {'entregas'},
+    'cliente': set(),
+}
+
+SIN_PERMISOS = 'No tienes permisos para acceder aquí.'
+SIN_PERMISOS_ACCION = 'No tienes permisos para realizar esta acción.'
+
+CONFIGURACION = {
+    'VERSION_EN_CACHE': None,   # None: solo si la caché por defecto es compartida entre procesos
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'PERMISOS', {}).get(clave, CONFIGURACION[clave])
+
+
+def version_en_cache():
+    valor = configuracion('VERSION_EN_CACHE')
+    if valor is None:
+        return not isinstance(caches['default'], (LocMemCache, DummyCache))
+    return valor
+
+
+def _clave_version(usuario_id):
+    return f'permisos:version:{usuario_id}'
+
+
+def _version_cache(usuario_id):
+    return cache.get_or_set(_clave_version(usuario_id), time.time_ns, None)
+
+
+def invalidar_permisos(usuario_id):
+    """Con la versión en la caché, obliga a recargar los permisos de todas las sesiones del usuario."""
+    cache.set(_clave_version(usuario_id), time.time_ns(), None)
+
+
+def _estado(usuario_id):
+    """
+    (versión, repartidor_id) del usuario con una consulta, o None si no existe.
+    La versión cambia si cambia el rol, el estado activo, la contraseña o el perfil de repartidor.
+    """
+    fila = (
+        Usuario.objects.filter(pk=usuario_id)
+        .values_list('is_active', 'rol', 'password', 'perfil_repartidor__id')
+        .first()
+    )
+    if fila is None:
+        return None
+    activo, rol, password, repartidor_id = fila
+    # El mismo hash que Django guarda en la sesión al iniciarla (HASH_SESSION_KEY)
+    hash_sesion = Usuario(password=password).get_session_auth_hash()
+    return [activo, rol, repartidor_id, hash_sesion], repartidor_id
+
+
+def cargar_permisos(request, usuario):
+    """Guarda en la sesión los permisos de ``usuario`` y los devuelve."""
+    # La versión de la caché se lee antes que los datos: un cambio concurrente deja la sesión
+    # desactualizada, nunca al revés
+    version = _version_cache(usuario.pk) if version_en_cache() else None
+    estado = _estado(usuario.pk)
+    version_bd, repartidor_id = estado if estado else (None, None)
+    datos = {
+        'usuario_id': str(usuario.pk),
+        'rol': usuario.rol,
+        'permisos': sorted(PERMISOS_POR_ROL.get(usuario.rol, ())),
+        'repartidor_id': repartidor_id if usuario.rol == 'repartidor' else None,
+        'version': version if version is not None else version_bd,
+    }
+    request.session[CLAVE_SESION] = datos
+    return datos
+
+
+def _vigentes(request, usuario_id, datos):
+    """True si los permisos guardados en la sesión siguen valiendo para el usuario."""
+    if not datos or datos['usuario_id'] != str(usuario_id):
+        return False
+    if version_en_cache():
+        return datos['version'] == _version_cache(usuario_id)
+    estado = _estado(usuario_id)
+    if estado is None or datos['version'] != estado[0]:
+        return False
+    activo, _, _, hash_sesion = estado[0]
+    return activo and constant_time_compare(request.session.get(HASH_SESSION_KEY, ''), hash_sesion)
+
+
+def permisos_de(request):
+    """Los permisos de la sesión (dict) o None si no hay un usuario autenticado."""
+    if hasattr(request, '_permisos'):
+        return request._permisos
+    usuario_id = request.session.get(SESSION_KEY)
+    datos = request.session.get(CLAVE_SESION)
+    if usuario_id is None:
+        datos = None
+    elif not _vigentes(request, usuario_id, datos):
+        # Sesión sin permisos o con datos desactualizados: request.user valida la sesión
+        # (y la cierra si el usuario fue desactivado o cambió su contraseña)
+        datos = cargar_permisos(request, request.user) if request.user.is_authenticated else None
+    request._permisos = datos
+    return datos
+
+
+def tiene_permiso(request, permiso):
+    datos = permisos_de(request)
+    return datos is not None and permiso in datos['permisos']
+
+
+def _rechazo(request, datos, permiso, mensaje, json):
+    """La respuesta si ``datos`` no alcanza para ``permiso``, o None."""
+    if datos is None:
+        return redirect_to_login(request.get_full_path())
+    if permiso not in datos['permisos']:
+        if json:
+            return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+        messages.error(request, mensaje)
+        return redirect('home')
+    request.permisos = datos
+    return None
+
+
+def permiso_requerido(permiso, mensaje=SIN_PERMISOS, json=False):
+    """
+    Decorador de vistas: sin sesión redirige al login; sin el permiso responde
+    403 en JSON (``json=True``) o vuelve al inicio con ``mensaje``. Acepta
+    vistas asíncronas: la sesión se lee en un hilo, como el resto del ORM.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_async(request, *args, **kwargs):
+                rechazo = _rechazo(request, await sync_to_async(permisos_de)(request), permiso, mensaje, json)
+                if rechazo is not None:
+                    return rechazo
+                return await vista(request, *args, **kwargs)
+            return envoltura_async
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            rechazo = _rechazo(request, permisos_de(request), permiso, mensaje, json)
+            if rechazo is not None:
+                return rechazo
+            return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
@@ -0,0 +1,154 @@
+"""
+Promociones programadas y precio efectivo.
+
+``precios_efectivos`` resuelve el precio de muchos productos (una página del
+catálogo, un carrito) en una sola pasada en memoria: las promociones vigentes
+se leen de la caché ya indexadas por producto y por categoría. Si varias
+aplican a un producto se usa la de menor precio.
+
+La entrada en caché de las vigentes (y la del carrusel de ofertas del home)
+vence justo en el próximo borde de ventana, es decir, el inicio o el fin más
+cercano de una promoción activa. Así una promoción empieza y termina a la hora
+exacta sin recalcularse en cada petición. Editar una promoción cambia la
+versión de la clave (``invalidar_promociones``), igual que en core/catalogo.py.
+"""
+import math
+import time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .catalogo import configuracion as configuracion_catalogo, version_listado
+from .models import Producto, Promocion
+
+CENTAVOS = Decimal('0.01')
+
+CONFIGURACION = {
+    'MAX_TIMEOUT': 3600,   # Vigencia máxima en caché si no hay bordes próximos
+    'OFERTAS_HOME': 6,     # Productos del carrusel de ofertas
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'PROMOCIONES', {}).get(clave, CONFIGURACION[clave])
+
+
+def _version():
+    return cache.get_or_set('promociones:version', time.time_ns, None)
+
+
+def invalidar_promociones():
+    cache.set('promociones:version', time.time_ns(), None)
+
+
+def segundos_hasta_borde(ahora):
+    """Segundos hasta el próximo inicio o fin de una promoción activa (tope MAX_TIMEOUT)."""
+    bordes = Promocion.objects.filter(activo=True).aggregate(
+        inicio=Min('inicio', filter=Q(inicio__gt=ahora)),
+        fin=Min('fin', filter=Q(fin__gt=ahora)),
+    )
+    proximos = [borde for borde in bordes.values() if borde is not None]
+    if not proximos:
+        return configuracion('MAX_TIMEOUT')
+    return max(1, min(math.ceil((min(proximos) - ahora).total_seconds()), configuracion('MAX_TIMEOUT')))
+
+
+def _cargar_vigentes(ahora):
+    """{'productos': {producto_id: [promo]}, 'categorias': {categoria_id: [promo]}} con promo = (nombre, tipo, valor)."""
+    promociones = {
+        pk: (nombre, tipo, valor)
+        for pk, nombre, tipo, valor in Promocion.objects.filter(activo=True, inicio__lte=ahora, fin__gt=ahora)
+        .values_list('pk', 'nombre', 'tipo', 'valor')
+    }
+    vigentes = {'productos': {}, 'categorias': {}}
+    if not promociones:
+        return vigentes
+    for promocion_id, producto_id in Promocion.productos.through.objects.filter(
+        promocion_id__in=promociones,
+    ).values_list('promocion_id', 'producto_id'):
+        vigentes['productos'].setdefault(producto_id, []).append(promociones[promocion_id])
+    for promocion_id, categoria_id in Promocion.categorias.through.objects.filter(
+        promocion_id__in=promociones,
+    ).values_list('promocion_id', 'categoria_id'):
+        vigentes['categorias'].setdefault(categoria_id, []).append(promociones[promocion_id])
+    return vigentes
+
+
+def vigentes():
+    """Promociones vigentes indexadas, desde la caché hasta el próximo borde de ventana."""
+    clave = f'promociones:vigentes:{_version()}'
+    datos = cache.get(clave)
+    if datos is None:
+        ahora = timezone.now()
+        datos = _cargar_vigentes(ahora)
+        cache.set(clave, datos, segundos_hasta_borde(ahora))
+    return datos
+
+
+def aplicar(precio, tipo, valor):
+    if tipo == 'porcentaje':
+        nuevo = precio * (100 - valor) / 100
+    elif tipo == 'monto':
+        nuevo = precio - valor
+    else:
+        nuevo = min(valor, precio)
+    return max(nuevo, Decimal(0)).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def precio_efectivo(producto_id, categoria_id, precio, promociones=None):
+    """(precio final, nombre de la promoción o None) para un producto."""
+    promociones = promociones if promociones is not None else vigentes()
+    candidatas = promociones['productos'].get(producto_id, []) + promociones['categorias'].get(categoria_id, [])
+    mejor, nombre_mejor = precio, None
+    for nombre, tipo, valor in candidatas:
+        final = aplicar(precio, tipo, valor)
+        if final < mejor:
+            mejor, nombre_mejor = final, nombre
+    return mejor, nombre_mejor
+
+
+def precios_efectivos(filas):
+    """``filas``: (producto_id, categoria_id, precio). Devuelve {producto_id: (precio final, promoción)}."""
+    promociones = vigentes()
+    return {
+        producto_id: precio_efectivo(producto_id, categoria_id, precio, promociones)
+        for producto_id, categoria_id, precio in filas
+    }
+
+
+def anotar_precios(productos):
+    """Agrega ``precio_efectivo`` y ``promocion`` a cada producto (para las plantillas). Devuelve la lista."""
+    productos = list(productos)
+    precios = precios_efectivos((p.pk, p.categoria_id, p.precio) for p in productos)
+    for producto in productos:
+        producto.precio_efectivo, producto.promocion = precios[producto.pk]
+    return productos
+
+
+def productos_en_oferta():
+    """
+    Carrusel de ofertas del home: productos con promoción vigente (o marcados
+    a mano con ``en_promocion``) y con stock. Se guarda en caché hasta el próximo
+    borde de ventana y también se descarta cuando cambian los listados de productos.
+    """
+    clave = f'promociones:home:{_version()}:{version_listado("catalogo")}'
+    productos = cache.get(clave)
+    if productos is None:
+        ahora = timezone.now()
+        promociones = vigentes()
+        productos = anotar_precios(
+            Producto.objects.filter(activo=True, stock__gt=0)
+            .filter(
+                Q(en_promocion=True)
+                | Q(pk__in=list(promociones['productos']))
+                | Q(categoria_id__in=list(promociones['categorias']))
+            )
+            .select_related('categoria')
+            .order_by('-fecha_actualizacion', 'nombre')[:configuracion('OFERTAS_HOME')]
+        )
+        timeout = min(segundos_hasta_borde(ahora), configuracion_catalogo('TIMEOUT'))
+        cache.set(clave, productos, timeout)
+    return productos
@@ -0,0 +1,187 @@
+"""
+Pronóstico de quiebre de stock.
+
+1. Una sola consulta agregada (GROUP BY producto, día de la semana, hora)
+   resume las líneas de ``DetallePedido`` de la ventana móvil. La base de
+   datos hace el trabajo pesado; Python solo recibe como máximo
+   productos x 7 x 24 filas, aunque la ventana tenga un año de pedidos.
+2. Cada franja (día, hora) se divide por las veces que ese día aparece en la
+   ventana: el resultado son las unidades que se venden por hora en esa franja.
+3. Se consume el stock actual hora a hora con esas tasas (saltando semanas
+   completas) para estimar cuándo se agota.
+4. Si se agota antes de la próxima reposición, se encola una ``AlertaStock``.
+
+El resultado se guarda en ``PronosticoStock``, que es lo que lee el dashboard.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+
+from .models import AlertaStock, DetallePedido, Producto, PronosticoStock, Usuario
+
+ESTADOS_VENTA = ['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
+HORAS_SEMANA = 7 * 24
+
+CONFIGURACION = {
+    'VENTANA_DIAS': 56,          # Historial del promedio móvil
+    'HORIZONTE_DIAS': 14,        # Más allá de esto el producto "no se agota"
+    'DIAS_REPOSICION': [0, 3],   # Días en que llega mercadería (lunes=0)
+    'HORA_REPOSICION': 9,
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'PRONOSTICO', {}).get(clave, CONFIGURACION[clave])
+
+
+def proxima_reposicion(momento):
+    """Primer momento de reposición posterior a ``momento`` (hora local)."""
+    dias = configuracion('DIAS_REPOSICION')
+    hora = configuracion('HORA_REPOSICION')
+    local = timezone.localtime(momento)
+    for desplazamiento in range(8):
+        candidato = (local + timedelta(days=desplazamiento)).replace(hour=hora, minute=0, second=0, microsecond=0)
+        if candidato.weekday() in dias and candidato > local:
+            return candidato
+    return local + timedelta(days=7)
+
+
+def tasas_por_franja(desde, hasta):
+    """
+    Unidades vendidas por hora en cada franja de la semana, por producto:
+    ``{producto_id: [168 tasas]}`` (índice = día_semana * 24 + hora).
+    """
+    filas = (
+        DetallePedido.objects
+        .filter(
+            pedido__fecha_creacion__gte=desde,
+            pedido__fecha_creacion__lt=hasta,
+            pedido__estado__in=ESTADOS_VENTA,
+        )
+        .annotate(dia=ExtractIsoWeekDay('pedido__fecha_creacion'), hora=ExtractHour('pedido__fecha_creacion'))
+        .values('producto_id', 'dia', 'hora')
+        .annotate(unidades=Sum('cantidad'))
+        .order_by()
+    )
+
+    # Cuántas veces aparece cada día de la semana en la ventana
+    ocurrencias = [0] * 7
+    dia = desde
+    while dia < hasta:
+        ocurrencias[dia.weekday()] += 1
+        dia += timedelta(days=1)
+
+    tasas = {}
+    for fila in filas.iterator():
+        vector = tasas.setdefault(fila['producto_id'], [0.0] * HORAS_SEMANA)
+        dia_semana = fila['dia'] - 1
+        vector[dia_semana * 24 + fila['hora']] += fila['unidades'] / max(ocurrencias[dia_semana], 1)
+    return tasas
+
+
+def estimar_agotamiento(stock, tasas, momento, horizonte_horas):
+    """Momento en que ``stock`` se agota consumiendo ``tasas`` desde ``momento``, o None."""
+    if stock <= 0:
+        return momento
+    semanal = sum(tasas) if tasas else 0
+    if semanal <= 0:
+        return None
+
+    # Semanas completas de una vez; el resto hora a hora (máximo dos semanas)
+    semanas = max(int(stock // semanal) - 1, 0)
+    horas = semanas * HORAS_SEMANA
+    restante = stock - semanas * semanal
+    franja = momento.weekday() * 24 + momento.hour
+    while horas < horizonte_horas:
+        tasa = tasas[(franja + horas) % HORAS_SEMANA]
+        if tasa >= restante:
+            return momento + timedelta(hours=horas + restante / tasa)
+        restante -= tasa
+        horas += 1
+    return None
+
+
+def pronosticar(ahora=None):
+    """Recalcula PronosticoStock para los productos activos. Devuelve (pronósticos, alertas nuevas)."""
+    ahora = ahora or timezone.now()
+    local = timezone.localtime(ahora)
+    hasta = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    desde = hasta - timedelta(days=configuracion('VENTANA_DIAS'))
+    tasas = tasas_por_franja(desde, hasta)
+    reposicion = proxima_reposicion(local)
+    horizonte = configuracion('HORIZONTE_DIAS') * 24
+
+    pronosticos = []
+    for producto_id, stock in Producto.objects.filter(activo=True).values_list('pk', 'stock').iterator():
+        vector = tasas.get(producto_id)
+        agotamiento = estimar_agotamiento(stock, vector, local, horizonte)
+        pronosticos.append(PronosticoStock(
+            producto_id=producto_id,
+            stock=stock,
+            venta_diaria=round(sum(vector) / 7, 2) if vector else 0,
+            agotamiento=agotamiento,
+            proxima_reposicion=reposicion,
+            en_riesgo=agotamiento is not None and agotamiento < reposicion,
+            fecha_calculo=ahora,
+        ))
+
+    with transaction.atomic():
+        PronosticoStock.objects.all().delete()
+        PronosticoStock.objects.bulk_create(pronosticos, batch_size=1000)
+        alertas = encolar_alertas(pronosticos)
+    return pronosticos, alertas
+
+
+def encolar_alertas(pronosticos):
+    """Una alerta abierta por producto en riesgo; las de productos que ya no lo están se resuelven."""
+    abiertas = set(
+        AlertaStock.objects.filter(estado__in=['pendiente', 'enviada']).values_list('producto_id', flat=True)
+    )
+    en_riesgo = {p.producto_id: p for p in pronosticos if p.en_riesgo}
+    AlertaStock.objects.filter(
+        estado__in=['pendiente', 'enviada'], producto_id__in=abiertas - en_riesgo.keys(),
+    ).update(estado='resuelta')
+    nuevas = [
+        AlertaStock(
+            producto_id=producto_id, stock=p.stock,
+            agotamiento=p.agotamiento, proxima_reposicion=p.proxima_reposicion,
+        )
+        for producto_id, p in en_riesgo.items() if producto_id not in abiertas
+    ]
+    return AlertaStock.objects.bulk_create(nuevas)
+
+
+def enviar_alertas():
+    """Envía por correo las alertas pendientes a los administradores. Devuelve cuántas envió."""
+    pendientes = list(AlertaStock.objects.filter(estado='pendiente').select_related('producto'))
+    destinatarios = list(
+        Usuario.objects.filter(rol='administrador', is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    if not pendientes or not destinatarios:
+        return 0
+
+    lineas = []
+    for alerta in pendientes:
+        if alerta.stock <= 0:
+            detalle = 'agotado'
+        else:
+            detalle = f"{alerta.stock} unid., se agota el {timezone.localtime(alerta.agotamiento):%d/%m %H:%M}"
+        lineas.append(f"- {alerta.producto.nombre}: {detalle}")
+    reposicion = timezone.localtime(pendientes[0].proxima_reposicion)
+    send_mail(
+        subject=f'Alerta de Stock - {len(pendientes)} producto(s) - Cosmofood',
+        message=(
+            f"Estos productos se agotarán antes de la próxima reposición ({reposicion:%d/%m %H:%M}):\n\n"
+            + "\n".join(lineas)
+        ),
+        from_email=None,
+        recipient_list=destinatarios,
+        fail_silently=False,
+    )
+    AlertaStock.objects.filter(pk__in=[a.pk for a in pendientes]).update(estado='enviada', fecha_envio=timezone.now())
+    return len(pendientes)
@@ -0,0 +1,350 @@
+"""
+Cola de atención de reclamos.
+
+Cada reclamo abierto tiene un plazo de atención (``Reclamo.limite_atencion``):
+la fecha de creación más ``HORAS_SLA``, adelantada según el motivo, el monto
+del pedido y los reclamos recientes del mismo cliente. La cola se ordena por
+ese plazo, lo que equivale a una prioridad que crece con la antigüedad del
+reclamo: como todos envejecen al mismo ritmo, el orden no cambia con el paso
+del tiempo y la columna solo se reescribe cuando cambian sus datos (al crear
+el reclamo, al reabrirlo o cuando el cliente presenta otro reclamo).
+
+La cola se lee por páginas con cursor sobre el índice (limite_atencion, id).
+Los contadores por estado viven en ``ContadorReclamos`` y se mueven con
+incrementos F() desde core/signals.py, sin ``COUNT(*)``.
+
+Los clientes presentan reclamos desde "Mis Pedidos" (``crear_reclamo``):
+
+- El pedido se valida con una sola consulta por clave primaria y cliente.
+- Límite de reclamos creados por usuario y hora con un contador en la caché
+  (los rechazados no cuentan).
+- Un reclamo casi igual a uno reciente del mismo pedido y motivo se rechaza:
+  las palabras de cada reclamo quedan en la caché unas horas y se comparan
+  por similitud (Jaccard), sin consultar la base de datos. Una reserva con
+  ``cache.add`` por pedido y motivo evita que dos envíos simultáneos (doble
+  clic) pasen juntos la comparación.
+- El aviso a los administradores no se envía en la petición: el reclamo
+  queda pendiente (``fecha_notificacion`` vacía), una cola persistente que
+  vacía el comando ``notificar_reclamos`` (cron).
+"""
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .asincrono import aejecutar, ejecutar
+from .models import ContadorReclamos, Pedido, Reclamo, Usuario
+
+ESTADOS_ABIERTOS = ['nuevo', 'en_revision', 'respondido']
+ESTADOS_CERRADOS = ['resuelto', 'cerrado']
+
+CONFIGURACION = {
+    'HORAS_SLA': 48,               # Plazo de un reclamo sin agravantes
+    'HORAS_MINIMAS': 2,
+    # Horas que adelanta cada motivo
+    'HORAS_MOTIVO': {
+        'producto_danado': 24,
+        'pedido_incorrecto': 24,
+        'demora_excesiva': 12,
+        'mala_atencion': 6,
+        'otro': 0,
+    },
+    'MONTO_POR_HORA': 2000,        # Una hora menos por cada tramo del total del pedido...
+    'MAX_HORAS_MONTO': 12,         # ...hasta este tope
+    'HORAS_POR_REINCIDENCIA': 6,   # Por cada otro reclamo reciente del cliente...
+    'MAX_HORAS_REINCIDENCIA': 24,  # ...hasta este tope
+    'DIAS_REINCIDENCIA': 90,
+    'POR_PAGINA': 25,
+    # Reclamos de clientes
+    'DIAS_PARA_RECLAMAR': 30,      # Antigüedad máxima del pedido
+    'LIMITE_POR_HORA': 3,          # Reclamos por usuario y hora
+    'HORAS_DUPLICADO': 24,         # Vigencia de las huellas en la caché
+    'SIMILITUD_DUPLICADO': 0.6,    # Palabras en común para considerarlo repetido
+    'SEGUNDOS_RESERVA': 30,        # Tope de la reserva mientras se crea un reclamo
+}
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def configuracion(clave):
+    return getattr(settings, 'RECLAMOS', {}).get(clave, CONFIGURACION[clave])
+
+
+# ---------- Prioridad ----------
+
+def horas_sla(motivo, total_pedido, reclamos_previos):
+    """Horas de plazo para un reclamo con estos datos."""
+    horas = configuracion('HORAS_SLA')
+    horas -= configuracion('HORAS_MOTIVO').get(motivo, 0)
+    horas -= min(int(Decimal(total_pedido or 0) // configuracion('MONTO_POR_HORA')), configuracion('MAX_HORAS_MONTO'))
+    horas -= min(reclamos_previos * configuracion('HORAS_POR_REINCIDENCIA'), configuracion('MAX_HORAS_REINCIDENCIA'))
+    return max(horas, configuracion('HORAS_MINIMAS'))
+
+
+def _reclamos_recientes(cliente_id, fecha, excluir=None):
+    recientes = Reclamo.objects.filter(
+        cliente_id=cliente_id, fecha_creacion__gte=fecha - timedelta(days=configuracion('DIAS_REINCIDENCIA')),
+    )
+    if excluir:
+        recientes = recientes.exclude(pk=excluir)
+    return recientes.count()
+
+
+def calcular_limite(reclamo):
+    """Plazo de atención de ``reclamo`` (también sin guardar)."""
+    creado = reclamo.fecha_creacion or timezone.now()
+    total = Pedido.objects.filter(pk=reclamo.pedido_id).values_list('total', flat=True).first()
+    previos = _reclamos_recientes(reclamo.cliente_id, creado, excluir=reclamo.pk)
+    return creado + timedelta(hours=horas_sla(reclamo.motivo, total, previos))
+
+
+def recalcular_cliente(cliente_id, excluir=None):
+    """Un reclamo nuevo adelanta los demás reclamos abiertos del mismo cliente."""
+    abiertos = Reclamo.objects.filter(cliente_id=cliente_id, estado__in=ESTADOS_ABIERTOS)
+    if excluir:
+        abiertos = abiertos.exclude(pk=excluir)
+    for reclamo in abiertos.only('pk', 'cliente_id', 'pedido_id', 'motivo', 'fecha_creacion'):
+        # update() no dispara señales: solo cambia el plazo
+        Reclamo.objects.filter(pk=reclamo.pk).update(limite_atencion=calcular_limite(reclamo))
+
+
+# ---------- Contadores por estado ----------
+
+def sumar_contador(estado, cantidad):
+    if not ContadorReclamos.objects.filter(estado=estado).update(cantidad=F('cantidad') + cantidad):
+        ContadorReclamos.objects.get_or_create(estado=estado)
+        ContadorReclamos.objects.filter(estado=estado).update(cantidad=F('cantidad') + cantidad)
+
+
+def _plan_contadores():
+    cantidades = dict.fromkeys((estado for estado, _ in Reclamo.ESTADO_CHOICES), 0)
+    cantidades.update((yield ContadorReclamos.objects.values_list('estado', 'cantidad')))
+    cantidades['abiertos'] = sum(cantidades[estado] for estado in ESTADOS_ABIERTOS)
+    return cantidades
+
+
+def contadores():
+    """{estado: cantidad} para todos los estados, más 'abiertos' (una consulta a una tabla de 5 filas)."""
+    return ejecutar(_plan_contadores())
+
+
+async def acontadores():
+    return await aejecutar(_plan_contadores())
+
+
+def reconstruir_contadores():
+    """Recalcula los contadores desde la tabla de reclamos (tras cargas masivas o update())."""
+    cantidades = dict.fromkeys((estado for estado, _ in Reclamo.ESTADO_CHOICES), 0)
+    cantidades.update(Reclamo.objects.order_by().values_list('estado').annotate(n=Count('pk')))
+    for estado, cantidad in cantidades.items():
+        ContadorReclamos.objects.update_or_create(estado=estado, defaults={'cantidad': cantidad})
+    return cantidades
+
+
+# ---------- Cola ----------
+
+def _codificar_cursor(reclamo, por_plazo):
+    if not por_plazo:
+        return str(reclamo.pk)
+    microsegundos = (reclamo.limite_atencion - _EPOCA) // timedelta(microseconds=1)
+    return f'{microsegundos}.{reclamo.pk}'
+
+
+def _decodificar_cursor(cursor, por_plazo):
+    try:
+        partes = [int(parte) for parte in cursor.split('.')]
+        if por_plazo:
+            microsegundos, pk = partes
+            return _EPOCA + timedelta(microseconds=microsegundos), pk
+        (pk,) = partes
+        return pk
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def _plan_cola(estado, cursor, por_pagina):
+    por_pagina = por_pagina or configuracion('POR_PAGINA')
+    reclamos = Reclamo.objects.select_related('cliente', 'pedido')
+    por_plazo = not estado or estado in ESTADOS_ABIERTOS
+    if estado and estado != 'todos':
+        reclamos = reclamos.filter(estado=estado)
+    posicion = _decodificar_cursor(cursor, por_plazo) if cursor else None
+
+    if por_plazo:
+        # Los reclamos abiertos siempre tienen plazo; los cerrados no
+        reclamos = reclamos.filter(limite_atencion__isnull=False)
+        if posicion:
+            limite, pk = posicion
+            reclamos = reclamos.filter(Q(limite_atencion__gt=limite) | Q(limite_atencion=limite, pk__gt=pk))
+        reclamos = reclamos.order_by('limite_atencion', 'pk')
+    else:
+        if posicion:
+            reclamos = reclamos.filter(pk__lt=posicion)
+        reclamos = reclamos.order_by('-pk')
+
+    # Se pide una fila de más para saber si hay otra página
+    pagina = yield reclamos[:por_pagina + 1]
+    siguiente = _codificar_cursor(pagina[por_pagina - 1], por_plazo) if len(pagina) > por_pagina else None
+    ahora = timezone.now()
+    for reclamo in pagina:
+        reclamo.vencido = reclamo.limite_atencion is not None and reclamo.limite_atencion < ahora
+    return pagina[:por_pagina], siguiente
+
+
+def pagina_cola(estado=None, cursor=None, por_pagina=None):
+    """
+    Una página de reclamos. Sin ``estado`` (o con un estado abierto) se ordena
+    por plazo de atención, el más urgente primero; ``estado='todos'`` o un
+    estado cerrado, del más nuevo al más antiguo.
+    Devuelve (reclamos, cursor de la siguiente o None).
+    """
+    return ejecutar(_plan_cola(estado, cursor, por_pagina))
+
+
+async def apagina_cola(estado=None, cursor=None, por_pagina=None):
+    """``pagina_cola`` para vistas asíncronas (core/asincrono.py)."""
+    return await aejecutar(_plan_cola(estado, cursor, por_pagina))
+
+
+# ---------- Reclamos de clientes ----------
+
+class ReclamoRechazado(ValueError):
+    """El reclamo no se crea; ``estado_http`` es el código para la respuesta JSON."""
+
+    def __init__(self, mensaje, estado_http=400):
+        super().__init__(mensaje)
+        self.estado_http = estado_http
+
+
+def palabras(texto):
+    """Palabras normalizadas (sin tildes, minúsculas, de 3 letras o más) de ``texto``."""
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode().lower()
+    return frozenset(palabra for palabra in re.findall(r'[a-z0-9]+', texto) if len(palabra) >= 3)
+
+
+def _clave_huellas(pedido_id, motivo):
+    return f'reclamos:huellas:{pedido_id}:{motivo}'
+
+
+def es_duplicado(pedido_id, motivo, descripcion):
+    """True si un reclamo reciente del mismo pedido y motivo dice casi lo mismo."""
+    nuevas = palabras(descripcion)
+    if not nuevas:
+        return False  # Sin palabras ("!!!!!!!!!!") no hay con qué comparar
+    for anteriores in cache.get(_clave_huellas(pedido_id, motivo), []):
+        if len(nuevas & anteriores) / len(nuevas | anteriores) >= configuracion('SIMILITUD_DUPLICADO'):
+            return True
+    return False
+
+
+def recordar_huella(pedido_id, motivo, descripcion):
+    clave = _clave_huellas(pedido_id, motivo)
+    huellas = cache.get(clave, [])[-4:] + [palabras(descripcion)]
+    cache.set(clave, huellas, configuracion('HORAS_DUPLICADO') * 3600)
+
+
+def _clave_intentos(usuario_id):
+    return f'reclamos:intentos:{usuario_id}:{int(timezone.now().timestamp()) // 3600}'
+
+
+def _intentos(usuario_id):
+    """Reclamos creados por el usuario en la ventana de una hora actual."""
+    return cache.get(_clave_intentos(usuario_id), 0)
+
+
+def _registrar_intento(usuario_id):
+    """Suma un reclamo creado en la ventana de una hora del usuario. Devuelve los de la ventana."""
+    clave = _clave_intentos(usuario_id)
+    cache.add(clave, 0, 3600)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        # La clave venció entre add e incr
+        cache.set(clave, 1, 3600)
+        return 1
+
+
+def crear_reclamo(usuario, pedido_id, motivo, descripcion):
+    """Crea el reclamo de ``usuario`` sobre su pedido. Lanza ReclamoRechazado con el motivo."""
+    pedido = (
+        Pedido.objects.filter(pk=pedido_id, cliente=usuario)
+        .values_list('pk', 'fecha_creacion').first()
+    )
+    if pedido is None:
+        raise ReclamoRechazado('Pedido no encontrado.', estado_http=404)
+    if pedido[1] < timezone.now() - timedelta(days=configuracion('DIAS_PARA_RECLAMAR')):
+        raise ReclamoRechazado(
+            f'Solo se pueden hacer reclamos de pedidos de los últimos {configuracion("DIAS_PARA_RECLAMAR")} días.'
+        )
+    if _intentos(usuario.pk) >= configuracion('LIMITE_POR_HORA'):
+        raise ReclamoRechazado('Hiciste demasiados reclamos en la última hora. Intenta más tarde.', estado_http=429)
+    duplicado = ReclamoRechazado('Ya recibimos un reclamo igual para este pedido. Lo estamos revisando.', estado_http=409)
+    # Reserva del pedido y motivo: otro envío simultáneo no puede comparar antes de que quede la huella
+    reserva = f'reclamos:reserva:{pedido_id}:{motivo}'
+    if not cache.add(reserva, 1, configuracion('SEGUNDOS_RESERVA')):
+        raise duplicado
+    try:
+        if es_duplicado(pedido_id, motivo, descripcion):
+            raise duplicado
+        reclamo = Reclamo.objects.create(cliente=usuario, pedido_id=pedido_id, motivo=motivo, descripcion=descripcion)
+        recordar_huella(pedido_id, motivo, descripcion)
+    finally:
+        cache.delete(reserva)
+    _registrar_intento(usuario.pk)
+    return reclamo
+
+
+def reclamables(pedidos):
+    """Marca ``puede_reclamar`` en los pedidos del historial (resúmenes o archivados)."""
+    desde = timezone.now() - timedelta(days=configuracion('DIAS_PARA_RECLAMAR'))
+    for pedido in pedidos:
+        pedido.puede_reclamar = pedido.fecha_creacion >= desde
+    return pedidos
+
+
+# ---------- Aviso a los administradores ----------
+
+def notificar_reclamos():
+    """Envía por correo los reclamos pendientes de aviso a los administradores. Devuelve cuántos envió."""
+    destinatarios = list(
+        Usuario.objects.filter(rol='administrador', is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    if not destinatarios:
+        return 0
+    # Se toman los pendientes con una marca propia para que dos envíos simultáneos no repitan reclamos
+    marca = timezone.now()
+    pendientes = list(Reclamo.objects.filter(fecha_notificacion__isnull=True).values_list('pk', flat=True)[:100])
+    if not pendientes or not Reclamo.objects.filter(
+        pk__in=pendientes, fecha_notificacion__isnull=True,
+    ).update(fecha_notificacion=marca):
+        return 0
+    reclamos = list(
+        Reclamo.objects.filter(pk__in=pendientes, fecha_notificacion=marca)
+        .select_related('cliente', 'pedido').order_by('limite_atencion', 'pk')
+    )
+    lineas = []
+    for reclamo in reclamos:
+        linea = f"- #{reclamo.pk} {reclamo.get_motivo_display()} - pedido #{reclamo.pedido.numero_pedido} ({reclamo.cliente.username})"
+        if reclamo.limite_atencion:
+            linea += f", atender antes del {timezone.localtime(reclamo.limite_atencion):%d/%m %H:%M}"
+        lineas.append(linea)
+    try:
+        send_mail(
+            subject=f'Nuevos reclamos ({len(reclamos)}) - Cosmofood',
+            message='Se recibieron estos reclamos de clientes:\n\n' + '\n'.join(lineas),
+            from_email=None,
+            recipient_list=destinatarios,
+            fail_silently=False,
+        )
+    except Exception:
+        # Quedan pendientes para el próximo intento
+        Reclamo.objects.filter(pk__in=[r.pk for r in reclamos]).update(fecha_notificacion=None)
+        raise
+    return len(reclamos)
+
@@ -0,0 +1,217 @@
+"""
+Exportación de ventas (pedidos y detalles) para contabilidad.
+
+Todo se genera en streaming y en memoria constante:
+
+- Las filas se leen por lotes ordenados por id (keyset, ``id > último``)
+  con ``values_list`` y ``.iterator(chunk_size=...)``, sin instancias de
+  modelos. Los lotes son necesarios porque el cliente de MySQL recibe el
+  resultado completo de cada consulta aunque se use ``iterator()``.
+- Después de las tablas activas se recorren las de archivo (core/archivo.py),
+  que tienen las mismas columnas.
+- El CSV sale línea a línea; opcionalmente comprimido con gzip.
+- El XLSX se arma como un zip escrito sobre un buffer que se vacía en cada
+  trozo (la hoja usa cadenas en línea, sin tabla de cadenas compartidas), así
+  que no necesita dependencias ni guardar el archivo completo.
+"""
+import csv
+import re
+import zipfile
+import zlib
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .db_router import ALIAS_REPLICA, replica_configurada
+from .models import DetallePedido, DetallePedidoArchivado, Pedido, PedidoArchivado
+
+LOTE = 2000
+
+# (campo de values_list, encabezado)
+COLUMNAS = {
+    'pedidos': [
+        ('numero_pedido', 'Número'),
+        ('fecha_creacion', 'Fecha'),
+        ('estado', 'Estado'),
+        ('tipo_orden', 'Tipo'),
+        ('cliente__username', 'Cliente'),
+        ('metodo_pago__nombre', 'Método de pago'),
+        ('subtotal', 'Subtotal'),
+        ('costo_envio', 'Envío'),
+        ('total', 'Total'),
+        ('fecha_entrega', 'Entregado'),
+    ],
+    'detalles': [
+        ('pedido__numero_pedido', 'Pedido'),
+        ('pedido__fecha_creacion', 'Fecha'),
+        ('pedido__estado', 'Estado'),
+        ('producto__nombre', 'Producto'),
+        ('producto__categoria__nombre', 'Categoría'),
+        ('cantidad', 'Cantidad'),
+        ('precio_unitario', 'Precio unitario'),
+        ('subtotal', 'Subtotal'),
+    ],
+}
+
+# Tabla activa y tabla de archivo de cada tipo de datos
+_MODELOS = {
+    'pedidos': (Pedido, PedidoArchivado),
+    'detalles': (DetallePedido, DetallePedidoArchivado),
+}
+_FILTRO_FECHA = {'pedidos': 'fecha_creacion', 'detalles': 'pedido__fecha_creacion'}
+
+_CONTROL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def filas(datos, desde, hasta, lote=LOTE):
+    """Genera las filas de ``datos`` ('pedidos' o 'detalles') creadas en [desde, hasta), desde la réplica."""
+    campos = [campo for campo, _ in COLUMNAS[datos]]
+    # Alias explícito: el generador se consume después de que la vista retorna
+    alias = ALIAS_REPLICA if replica_configurada() else 'default'
+    fecha = _FILTRO_FECHA[datos]
+    for modelo in _MODELOS[datos]:
+        consulta = modelo.objects.using(alias).filter(**{f'{fecha}__gte': desde, f'{fecha}__lt': hasta}).order_by('pk')
+        ultimo = 0
+        while True:
+            leidas = 0
+            for fila in consulta.filter(pk__gt=ultimo).values_list('pk', *campos)[:lote].iterator(chunk_size=lote):
+                ultimo = fila[0]
+                leidas += 1
+                yield fila[1:]
+            if leidas < lote:
+                break
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if hasattr(valor, 'tzinfo'):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M:%S')
+    return str(valor)
+
+
+# ---------- CSV ----------
+
+class _Eco:
+    def write(self, valor):
+        return valor
+
+
+# Excel y LibreOffice interpretan como fórmula un texto que empieza con estos caracteres
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _celda_csv(valor):
+    """Texto de la celda; los textos que parecen fórmula van precedidos de ' (inyección CSV)."""
+    texto = _texto(valor)
+    if isinstance(valor, str) and texto.startswith(_INICIO_FORMULA):
+        return "'" + texto
+    return texto
+
+
+def generar_csv(datos, filas_datos):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([encabezado for _, encabezado in COLUMNAS[datos]])
+    for fila in filas_datos:
+        yield escritor.writerow([_celda_csv(valor) for valor in fila])
+
+
+def comprimir_gzip(trozos):
+    """Comprime un flujo de texto o bytes con gzip sin acumularlo."""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = cabecera gzip
+    for trozo in trozos:
+        datos = compresor.compress(trozo.encode('utf-8') if isinstance(trozo, str) else trozo)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+# ---------- XLSX ----------
+
+_TIPOS_CONTENIDO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELACIONES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{hoja}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_RELACIONES_LIBRO = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+class _Buffer:
+    """Destino del zip que se vacía a medida que se envía (no admite seek)."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _celda(valor):
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return f'<c t="n"><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_CONTROL.sub("", _texto(valor)))}</t></is></c>'
+
+
+def _fila_xml(valores):
+    return '<row>' + ''.join(_celda(valor) for valor in valores) + '</row>'
+
+
+def generar_xlsx(datos, filas_datos, hoja='Datos', filas_por_trozo=500):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', _TIPOS_CONTENIDO)
+        libro.writestr('_rels/.rels', _RELACIONES)
+        libro.writestr('xl/workbook.xml', _LIBRO.format(hoja=escape(hoja)))
+        libro.writestr('xl/_rels/workbook.xml.rels', _RELACIONES_LIBRO)
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja_xml:
+            hoja_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja_xml.write(_fila_xml([encabezado for _, encabezado in COLUMNAS[datos]]).encode('utf-8'))
+            for numero, fila in enumerate(filas_datos, start=1):
+                hoja_xml.write(_fila_xml(fila).encode('utf-8'))
+                if numero % filas_por_trozo == 0:
+                    trozo = buffer.vaciar()
+                    if trozo:
+                        yield trozo
+            hoja_xml.write(b'</sheetData></worksheet>')
+    yield buffer.vaciar()
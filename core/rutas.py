@@ -0,0 +1,212 @@
+"""
+Agrupación de pedidos delivery en rutas de varias paradas.
+
+1. Cada ``direccion_entrega`` se geocodifica con una tabla local (sin red):
+   la comuna/sector es la última parte de la dirección separada por comas
+   ("Av. Santiago Bueras 123, Maipú" -> maipu). Si no, vale el último nombre
+   conocido que aparezca como palabra completa y, por último, cualquier
+   aparición dentro del texto. El geocodificador es intercambiable con
+   ``RUTAS['GEOCODIFICADOR']``.
+2. Los pedidos se reparten en una grilla de celdas del tamaño del radio de
+   agrupación, así cada pedido solo se compara con las 9 celdas vecinas.
+3. Partiendo del pedido que lleva más tiempo listo, se suman los vecinos
+   más cercanos que estén dentro del radio y de la ventana de tiempo.
+4. Las paradas de cada ruta se ordenan por vecino más cercano desde el local.
+"""
+import csv
+import math
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Coordenadas aproximadas (centro de cada comuna) para Santiago
+TABLA_POR_DEFECTO = {
+    'santiago centro': (-33.4378, -70.6505),
+    'santiago': (-33.4378, -70.6505),
+    'providencia': (-33.4314, -70.6093),
+    'nunoa': (-33.4569, -70.5976),
+    'las condes': (-33.4080, -70.5670),
+    'vitacura': (-33.3900, -70.5780),
+    'la reina': (-33.4436, -70.5395),
+    'macul': (-33.4892, -70.5990),
+    'penalolen': (-33.4850, -70.5420),
+    'la florida': (-33.5227, -70.5980),
+    'san miguel': (-33.4970, -70.6510),
+    'san joaquin': (-33.4960, -70.6290),
+    'independencia': (-33.4167, -70.6667),
+    'recoleta': (-33.4068, -70.6395),
+    'estacion central': (-33.4594, -70.6983),
+    'quinta normal': (-33.4280, -70.6980),
+    'maipu': (-33.5110, -70.7580),
+    'puente alto': (-33.6117, -70.5758),
+    'la cisterna': (-33.5300, -70.6640),
+    'lo barnechea': (-33.3500, -70.5180),
+}
+
+CONFIGURACION = {
+    'GEOCODIFICADOR': 'core.rutas.GeocodificadorLocal',
+    'TABLA_CSV': None,               # CSV opcional con columnas nombre,lat,lon
+    'ORIGEN': (-33.4372, -70.6340),  # Ubicación del local
+    'RADIO_KM': 2.5,
+    'VENTANA_MINUTOS': 15,
+    'MAX_PARADAS': 3,
+    'CACHE_DIRECCIONES': 4096,       # Direcciones ya geocodificadas que se recuerdan (LRU)
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'RUTAS', {}).get(clave, CONFIGURACION[clave])
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Ñuñoa' -> 'nunoa'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+class GeocodificadorLocal:
+    """Geocodificador por tabla: devuelve las coordenadas del sector mencionado en la dirección."""
+
+    def __init__(self, tabla=None):
+        if tabla is None:
+            archivo = configuracion('TABLA_CSV')
+            tabla = self.leer_csv(archivo) if archivo else TABLA_POR_DEFECTO
+        # Los nombres más largos primero: "santiago centro" antes que "santiago"
+        self.tabla = sorted(((normalizar(k), v) for k, v in tabla.items()), key=lambda kv: -len(kv[0]))
+        self._por_nombre = dict(self.tabla)
+        self._palabras = re.compile(r'\b(?:%s)\b' % '|'.join(re.escape(nombre) for nombre, _ in self.tabla))
+        # La instancia vive todo el proceso (obtener_geocodificador): la caché tiene tope
+        self.geocodificar = lru_cache(maxsize=configuracion('CACHE_DIRECCIONES'))(self.geocodificar)
+
+    @staticmethod
+    def leer_csv(ruta):
+        with open(ruta, newline='', encoding='utf-8') as archivo:
+            return {fila['nombre']: (float(fila['lat']), float(fila['lon'])) for fila in csv.DictReader(archivo)}
+
+    def geocodificar(self, direccion):
+        return self._buscar(normalizar(direccion))
+
+    def _buscar(self, texto):
+        # 1. La comuna va al final: la última parte separada por comas que sea un nombre conocido
+        for parte in reversed(texto.split(',')):
+            nombre = ' '.join(parte.split())
+            if nombre in self._por_nombre:
+                return self._por_nombre[nombre]
+        # 2. El último nombre que aparezca como palabra completa ("santiago bueras 123 maipu")
+        ultima = None
+        for ultima in self._palabras.finditer(texto):
+            pass
+        if ultima is not None:
+            return self._por_nombre[ultima.group(0)]
+        # 3. Cualquier aparición dentro del texto
+        return next((coords for nombre, coords in self.tabla if nombre in texto), None)
+
+
+@lru_cache(maxsize=1)
+def obtener_geocodificador():
+    return import_string(configuracion('GEOCODIFICADOR'))()
+
+
+def distancia_km(a, b):
+    """Distancia aproximada (equirectangular); suficiente dentro de una ciudad."""
+    latitud_media = math.radians((a[0] + b[0]) / 2)
+    dx = math.radians(b[1] - a[1]) * math.cos(latitud_media)
+    dy = math.radians(b[0] - a[0])
+    return 6371 * math.hypot(dx, dy)
+
+
+class Ruta:
+    """Una salida de un repartidor: pedidos en orden de entrega."""
+
+    def __init__(self, paradas, distancia_km=0.0):
+        self.paradas = paradas
+        self.distancia_km = distancia_km
+
+    def __len__(self):
+        return len(self.paradas)
+
+    def __iter__(self):
+        return iter(self.paradas)
+
+    @property
+    def es_multiple(self):
+        return len(self.paradas) > 1
+
+
+def _momento_listo(pedido):
+    return pedido.fecha_listo or pedido.fecha_creacion
+
+
+def ordenar_paradas(pedidos, coordenadas, origen):
+    """Vecino más cercano desde el origen. Devuelve (pedidos ordenados, km totales)."""
+    pendientes = list(pedidos)
+    orden, posicion, total = [], origen, 0.0
+    while pendientes:
+        siguiente = min(pendientes, key=lambda p: distancia_km(posicion, coordenadas[p.pk]))
+        total += distancia_km(posicion, coordenadas[siguiente.pk])
+        posicion = coordenadas[siguiente.pk]
+        orden.append(siguiente)
+        pendientes.remove(siguiente)
+    return orden, round(total, 2)
+
+
+def agrupar_pedidos(pedidos, radio_km=None, ventana_minutos=None, max_paradas=None, origen=None, geocodificador=None):
+    """
+    Agrupa pedidos (con ``direccion_entrega``) en rutas. Los pedidos cuya
+    dirección no se puede ubicar quedan como rutas de una sola parada.
+    """
+    radio_km = radio_km or configuracion('RADIO_KM')
+    ventana = (ventana_minutos or configuracion('VENTANA_MINUTOS')) * 60
+    max_paradas = max_paradas or configuracion('MAX_PARADAS')
+    origen = origen or configuracion('ORIGEN')
+    geocodificador = geocodificador or obtener_geocodificador()
+
+    coordenadas, sin_ubicar = {}, []
+    for pedido in pedidos:
+        coords = geocodificador.geocodificar(pedido.direccion_entrega)
+        if coords is None:
+            sin_ubicar.append(pedido)
+        else:
+            coordenadas[pedido.pk] = coords
+
+    # Grilla con celdas de ~radio_km de lado
+    alto = radio_km / 111.0
+    ancho = alto / max(math.cos(math.radians(origen[0])), 0.01)
+    grilla = {}
+    ubicados = sorted((p for p in pedidos if p.pk in coordenadas), key=lambda p: (_momento_listo(p), p.pk))
+    for pedido in ubicados:
+        lat, lon = coordenadas[pedido.pk]
+        grilla.setdefault((int(lat // alto), int(lon // ancho)), []).append(pedido)
+
+    rutas, asignados = [], set()
+    for semilla in ubicados:
+        if semilla.pk in asignados:
+            continue
+        asignados.add(semilla.pk)
+        lat, lon = coordenadas[semilla.pk]
+        fila, columna = int(lat // alto), int(lon // ancho)
+        momento = _momento_listo(semilla)
+
+        candidatos = []
+        for df in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                for pedido in grilla.get((fila + df, columna + dc), ()):
+                    if pedido.pk in asignados:
+                        continue
+                    if abs((_momento_listo(pedido) - momento).total_seconds()) > ventana:
+                        continue
+                    distancia = distancia_km(coordenadas[semilla.pk], coordenadas[pedido.pk])
+                    if distancia <= radio_km:
+                        candidatos.append((distancia, pedido.pk, pedido))
+        candidatos.sort(key=lambda c: (c[0], c[1]))
+
+        grupo = [semilla] + [pedido for _, _, pedido in candidatos[:max_paradas - 1]]
+        asignados.update(p.pk for p in grupo)
+        paradas, distancia = ordenar_paradas(grupo, coordenadas, origen)
+        rutas.append(Ruta(paradas, distancia))
+
+    rutas.extend(Ruta([pedido]) for pedido in sin_ubicar)
+    return rutas
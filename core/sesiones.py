@@ -0,0 +1,51 @@
+"""
+Limpieza de sesiones vencidas.
+
+Con los motores ``db`` y ``cached_db`` (``SESSION_ENGINE``) cada sesión es una
+fila de ``django_session`` que nadie borra al vencer. ``clearsessions`` de
+Django las elimina con un solo ``DELETE`` que, con millones de filas, bloquea
+la tabla que lee cada petición. ``borrar_vencidas`` borra un lote por llamada
+usando el índice de ``expire_date`` y el comando ``limpiar_sesiones`` repite
+los lotes con una pausa entre ellos.
+
+Con ``cache`` o ``signed_cookies`` no hay filas: las sesiones vencen solas.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.utils import timezone
+
+CONFIGURACION = {
+    'LOTE': 1000,       # Sesiones por DELETE
+}
+
+
+def configuracion(clave):
+    return getattr(settings, 'SESIONES', {}).get(clave, CONFIGURACION[clave])
+
+
+def modelo_sesiones():
+    """El modelo de las sesiones del motor configurado, o None si no las guarda en la base de datos."""
+    motor = import_module(settings.SESSION_ENGINE).SessionStore
+    return motor.get_model_class() if hasattr(motor, 'get_model_class') else None
+
+
+def vencidas(limite=None):
+    modelo = modelo_sesiones()
+    if modelo is None:
+        return None
+    return modelo.objects.filter(expire_date__lt=limite or timezone.now())
+
+
+def borrar_vencidas(limite=None, lote=None):
+    """Borra hasta ``lote`` sesiones vencidas antes de ``limite`` (ahora). Devuelve cuántas."""
+    limite = limite or timezone.now()
+    sesiones = vencidas(limite)
+    if sesiones is None:
+        return 0
+    claves = list(sesiones.order_by('expire_date').values_list('pk', flat=True)[:lote or configuracion('LOTE')])
+    if not claves:
+        return 0
+    # Se repite el filtro: una sesión renovada entre la lectura y el DELETE se conserva
+    borradas, _ = sesiones.filter(pk__in=claves).delete()
+    return borradas
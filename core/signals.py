@@ -0,0 +1,170 @@
+"""Receptores de señales de los modelos de core (se registran en CoreConfig.ready)."""
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .busqueda import CAMPOS_CLIENTE, indexar_clientes, indexar_pedidos
+from .catalogo import invalidar_productos, publicar_evento
+from .despacho import configuracion, motor
+from .historial import actualizar_estado, escribir_resumen
+from .inventario import devolver_stock_pedido, umbral_stock
+from .models import Pedido, Producto, Promocion, Reclamo, Repartidor, Usuario
+from .permisos import cargar_permisos, invalidar_permisos
+from .promociones import invalidar_promociones
+from .reclamos import ESTADOS_ABIERTOS, calcular_limite, recalcular_cliente, sumar_contador
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    estado_anterior = getattr(instance, '_estado_original', None)
+    repartidor_anterior = getattr(instance, '_repartidor_original', None)
+    # El próximo save compara contra lo que se acaba de guardar
+    instance._estado_original = instance.estado
+    instance._repartidor_original = instance.repartidor_id
+
+    # --- Devolución de stock al cancelar ---
+    if instance.estado == 'cancelado' and estado_anterior != 'cancelado' and not created:
+        devolver_stock_pedido(instance)
+
+    if instance.tipo_orden != 'delivery':
+        return
+
+    # --- Despacho automático al quedar listo ---
+    if (instance.estado == 'listo' and estado_anterior != 'listo'
+            and instance.repartidor_id is None and configuracion('AUTOMATICO')):
+        transaction.on_commit(lambda: motor.asignar_pedido(instance.pk))
+
+    # --- La carga de los repartidores involucrados cambió ---
+    if instance.estado != estado_anterior or instance.repartidor_id != repartidor_anterior:
+        for repartidor_id in {instance.repartidor_id, repartidor_anterior} - {None}:
+            transaction.on_commit(lambda rid=repartidor_id: motor.actualizar_repartidor(rid))
+
+
+# ---------- Resumen para el historial del cliente ----------
+
+@receiver(post_save, sender=Pedido)
+def pedido_guardado_resumen(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # Tras el commit, cuando los detalles del pedido ya existen
+        transaction.on_commit(lambda: escribir_resumen(instance.pk))
+    else:
+        actualizar_estado(instance)
+
+
+@receiver(post_save, sender=Repartidor)
+def repartidor_guardado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: motor.actualizar_repartidor(instance.pk))
+
+
+@receiver(post_delete, sender=Repartidor)
+def repartidor_eliminado(sender, instance, **kwargs):
+    motor.descartar_repartidor(instance.pk)
+
+
+# ---------- Stock y listados en caché ----------
+
+@receiver(umbral_stock)
+def stock_cruzo_umbral(sender, producto_id, stock, agotado, **kwargs):
+    """El producto se agotó o se repuso: sale/vuelve a los listados y se avisa al POS y la cocina."""
+    invalidar_productos()
+    publicar_evento('agotado' if agotado else 'repuesto', producto_id, stock)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def producto_modificado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(invalidar_productos)
+
+
+# ---------- Promociones ----------
+
+@receiver(post_save, sender=Promocion)
+@receiver(post_delete, sender=Promocion)
+@receiver(m2m_changed, sender=Promocion.productos.through)
+@receiver(m2m_changed, sender=Promocion.categorias.through)
+def promocion_modificada(sender, raw=False, **kwargs):
+    """Las ventanas y los productos alcanzados cambiaron: se recalculan vigentes y carrusel."""
+    if not raw:
+        transaction.on_commit(invalidar_promociones)
+
+
+# ---------- Cola de reclamos ----------
+
+@receiver(pre_save, sender=Reclamo)
+def reclamo_por_guardar(sender, instance, raw=False, **kwargs):
+    """El plazo se calcula al abrir (o reabrir) el reclamo y se borra al cerrarlo."""
+    if raw:
+        return
+    if instance.estado not in ESTADOS_ABIERTOS:
+        instance.limite_atencion = None
+    elif instance.limite_atencion is None:
+        instance.limite_atencion = calcular_limite(instance)
+
+
+@receiver(post_save, sender=Reclamo)
+def reclamo_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    estado_anterior = getattr(instance, '_estado_original', None)
+    instance._estado_original = instance.estado
+    if created:
+        sumar_contador(instance.estado, 1)
+        cliente_id, reclamo_id = instance.cliente_id, instance.pk
+        transaction.on_commit(lambda: recalcular_cliente(cliente_id, excluir=reclamo_id))
+    elif instance.estado != estado_anterior:
+        if estado_anterior:
+            sumar_contador(estado_anterior, -1)
+        sumar_contador(instance.estado, 1)
+
+
+@receiver(post_delete, sender=Reclamo)
+def reclamo_eliminado(sender, instance, **kwargs):
+    sumar_contador(getattr(instance, '_estado_original', None) or instance.estado, -1)
+
+
+# ---------- Índice de búsqueda de pedidos ----------
+
+@receiver(post_save, sender=Pedido)
+def pedido_guardado_busqueda(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    numero_anterior = getattr(instance, '_numero_original', None)
+    instance._numero_original = instance.numero_pedido
+    # El número casi nunca cambia: solo se reindexa al crear o si se corrigió a mano
+    if created or instance.numero_pedido != numero_anterior:
+        indexar_pedidos([(instance.pk, instance.numero_pedido)])
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado_busqueda(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not set(update_fields) & set(CAMPOS_CLIENTE)):
+        return
+    indexar_clientes([tuple(getattr(instance, campo) for campo in CAMPOS_CLIENTE)])
+
+# ---------- Permisos en la sesión ----------
+
+@receiver(user_logged_in)
+def usuario_ingreso(sender, request, user, **kwargs):
+    cargar_permisos(request, user)
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Rol, contraseña o estado pueden haber cambiado (el último ingreso no afecta los permisos)."""
+    if raw or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    transaction.on_commit(lambda: invalidar_permisos(instance.pk))
+
+
+@receiver(post_save, sender=Repartidor)
+@receiver(post_delete, sender=Repartidor)
+def perfil_repartidor_modificado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: invalidar_permisos(instance.usuario_id))
@@ -0,0 +1,62 @@
+/*
+ * Carrito sin recargas: los formularios marcados con data-carrito se envían
+ * con fetch a la misma URL y la vista responde JSON (línea + totales) en vez
+ * de redirigir. Sin JavaScript los formularios siguen funcionando igual.
+ */
+(function () {
+    const formato = new Intl.NumberFormat('es-CL', { maximumFractionDigits: 0 });
+
+    function aviso(mensaje, ok) {
+        if (!mensaje) return;
+        const div = document.createElement('div');
+        div.className = 'fixed bottom-24 right-6 z-50 p-4 rounded-lg shadow-md animate-fade-in ' +
+            (ok ? 'bg-green-50 text-green-800 border border-green-200' : 'bg-red-50 text-red-800 border border-red-200');
+        div.textContent = mensaje;
+        document.body.appendChild(div);
+        setTimeout(() => div.remove(), 3000);
+    }
+
+    function actualizarTotales(carrito) {
+        document.querySelectorAll('[data-carrito-contador]').forEach(el => {
+            el.textContent = carrito.total_items;
+            el.classList.toggle('hidden', carrito.total_items === 0);
+        });
+        document.querySelectorAll('[data-carrito-total]').forEach(el => {
+            el.textContent = '$' + formato.format(carrito.total_precio);
+        });
+    }
+
+    function actualizarLinea(form, linea) {
+        const contenedor = form.closest('[data-linea]');
+        if (!contenedor) return;
+        if (!linea) {
+            contenedor.remove();
+            if (!document.querySelector('[data-linea]')) window.location.reload();  // Carrito vacío
+            return;
+        }
+        contenedor.querySelector('[data-linea-cantidad]').value = linea.cantidad;
+        contenedor.querySelector('[data-linea-subtotal]').textContent = '$' + formato.format(linea.subtotal);
+    }
+
+    document.addEventListener('submit', function (e) {
+        const form = e.target.closest('form[data-carrito]');
+        if (!form) return;
+        e.preventDefault();
+        const boton = form.querySelector('button[type="submit"]');
+        if (boton) boton.disabled = true;
+        fetch(form.action, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: { 'X-Requested-With': 'XMLHttpRequest' },
+            credentials: 'same-origin',
+        })
+            .then(r => r.json())
+            .then(datos => {
+                actualizarTotales(datos.carrito);
+                if (form.dataset.carrito === 'linea') actualizarLinea(form, datos.linea);
+                aviso(datos.mensaje, datos.ok);
+            })
+            .catch(() => form.submit())
+            .finally(() => { if (boton) boton.disabled = false; });
+    });
+})();
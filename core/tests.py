@@ -1,3 +1,1254 @@
-from django.test import TestCase
+import contextvars
+import csv
+import io
+import json
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import SESSION_KEY, get_user
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from PIL import Image
+
+from . import busqueda, carrito, estaticos, menu, promociones, pronostico, reclamos, rutas
+from .archivo import archivar_lote, obtener_pedido
+from .carrito import COOKIE_CARRITO, CarritoCookie, agregar_producto
+from .db_router import (
+    ALIAS_REPLICA, COOKIE_PRIMARIO, FijarPrimarioMiddleware, ReplicaRouter, using_replica
+)
+from .despacho import MotorDespacho
+from .historial import decodificar_cursor
+from .inventario import StockInsuficiente, devolver_stock_pedido, registrar_movimiento
+from .management.commands import conciliar_stock
+from .models import (
+    AlertaStock, Carrito, Categoria, DetallePedido, ItemCarrito, MetodoPago, MovimientoStock, Pedido,
+    PedidoArchivado, Producto, Promocion, PronosticoStock, Reclamo, Repartidor, TerminoPedido, Usuario,
+)
+from .permisos import CLAVE_SESION, PERMISOS_POR_ROL, permiso_requerido
+from .reportes import generar_csv
+
+REPLICA_SEPARADA = (
+    ALIAS_REPLICA in settings.DATABASES
+    and not settings.DATABASES[ALIAS_REPLICA].get('TEST', {}).get('MIRROR')
+)
+
+
+def en_contexto_nuevo(funcion):
+    """Ejecuta el test en un contexto limpio para que no herede un primario fijado."""
+    def envoltura(*args, **kwargs):
+        return contextvars.copy_context().run(funcion, *args, **kwargs)
+    return envoltura
+
+
+@mock.patch('core.db_router.replica_configurada', return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    router = ReplicaRouter()
+
+    @en_contexto_nuevo
+    def test_lecturas_fuera_del_contexto_usan_default(self, _):
+        self.assertIsNone(self.router.db_for_read(Producto))
+
+    @en_contexto_nuevo
+    def test_lecturas_dentro_del_contexto_usan_replica(self, _):
+        with using_replica():
+            self.assertEqual(self.router.db_for_read(Producto), ALIAS_REPLICA)
+        self.assertIsNone(self.router.db_for_read(Producto))
+
+    @en_contexto_nuevo
+    def test_escritura_fija_el_primario(self, _):
+        with using_replica():
+            self.assertEqual(self.router.db_for_write(Producto), 'default')
+            self.assertIsNone(self.router.db_for_read(Producto))
+
+    @en_contexto_nuevo
+    def test_cookie_fija_el_primario_en_peticiones_siguientes(self, _):
+        vistas = []
+
+        def vista(request):
+            with using_replica():
+                vistas.append(self.router.db_for_read(Producto))
+            return HttpResponse()
+
+        middleware = FijarPrimarioMiddleware(vista)
+        request = RequestFactory().get('/')
+        request.COOKIES[COOKIE_PRIMARIO] = '1'
+        middleware(request)
+        middleware(RequestFactory().get('/'))
+        self.assertEqual(vistas, [None, ALIAS_REPLICA])
+
+    @en_contexto_nuevo
+    def test_escritura_emite_cookie(self, _):
+        def vista(request):
+            self.router.db_for_write(Producto)
+            return HttpResponse()
+
+        response = FijarPrimarioMiddleware(vista)(RequestFactory().post('/'))
+        self.assertIn(COOKIE_PRIMARIO, response.cookies)
+
+
+@skipUnless(
+    REPLICA_SEPARADA,
+    'Requiere DB_REPLICA_NAME apuntando a una segunda base (ej. DB_REPLICA_ENGINE=django.db.backends.sqlite3)',
+)
+class ReplicaSeparadaTests(TestCase):
+    """Con la réplica en otra base, lo escrito en default no aparece en ella hasta replicarse."""
+    databases = {'default', ALIAS_REPLICA} if REPLICA_SEPARADA else {'default'}
+
+    @en_contexto_nuevo
+    def test_lectura_va_a_la_segunda_base(self):
+        Producto.objects.using('default').create(nombre='Solo en primario', precio=1000)
+        with using_replica():
+            self.assertFalse(Producto.objects.filter(nombre='Solo en primario').exists())
+
+    @en_contexto_nuevo
+    def test_lectura_despues_de_escribir_usa_el_primario(self):
+        with using_replica():
+            Producto.objects.create(nombre='Recién creado', precio=1000)
+            self.assertTrue(Producto.objects.filter(nombre='Recién creado').exists())
+
+
+class PermisosPorRolTests(TestCase):
+    """Matriz rol × vista: quién entra a cada área y qué recibe el resto."""
+    ROLES = ['administrador', 'cajero', 'cocina', 'repartidor', 'cliente', None]
+    # (nombre de la URL, permiso requerido, responde JSON)
+    VISTAS = [
+        ('admin_dashboard', 'panel', False),
+        ('admin_productos_lista', 'panel', False),
+        ('admin_pedidos_lista', 'panel', False),
+        ('admin_reclamos_lista', 'panel', False),
+        ('admin_reclamos_cola', 'panel', True),
+        ('admin_repartidores_lista', 'panel', False),
+        ('buscar_pedido', 'panel', True),
+        ('pos_view', 'pos', False),
+        ('eventos_stock', 'eventos_stock', True),
+        ('repartidor_pedidos', 'entregas', False),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        # Las escrituras fijarían el primario en el contexto de los tests del router
+        contextvars.copy_context().run(cls._crear_usuarios)
+
+    @classmethod
+    def _crear_usuarios(cls):
+        cls.usuarios = {
+            rol: Usuario.objects.create_user(username=f'permisos_{rol or "sin_rol"}', password='clave', rol=rol)
+            for rol in cls.ROLES
+        }
+        cls.repartidor = Repartidor.objects.create(usuario=cls.usuarios['repartidor'])
+
+    @en_contexto_nuevo
+    def test_matriz_de_roles(self):
+        for rol, usuario in self.usuarios.items():
+            self.client.force_login(usuario)
+            permisos = PERMISOS_POR_ROL.get(rol, set())
+            for nombre, permiso, json in self.VISTAS:
+                with self.subTest(rol=rol, vista=nombre):
+                    response = self.client.get(reverse(nombre))
+                    if permiso in permisos:
+                        self.assertEqual(response.status_code, 200)
+                    elif json:
+                        self.assertEqual(response.status_code, 403)
+                    else:
+                        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+    @en_contexto_nuevo
+    def test_sin_sesion_redirige_al_login(self):
+        for nombre, _, _ in self.VISTAS:
+            with self.subTest(vista=nombre):
+                response = self.client.get(reverse(nombre))
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response.url.startswith(reverse('login')))
+
+    @en_contexto_nuevo
+    def test_autorizar_hace_una_sola_consulta(self):
+        self.client.force_login(self.usuarios['repartidor'])
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.session.keys()  # El middleware de sesiones ya la leyó
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        vista = permiso_requerido('entregas')(lambda request: HttpResponse(request.permisos['repartidor_id']))
+
+        # Solo la verificación del usuario en la base de datos; no se carga el usuario ni su perfil
+        with self.assertNumQueries(1):
+            response = vista(request)
+        self.assertEqual(response.content, str(self.repartidor.pk).encode())
+
+    @en_contexto_nuevo
+    @override_settings(PERMISOS={'VERSION_EN_CACHE': True})
+    def test_con_cache_compartida_autorizar_no_consulta_la_base(self):
+        self.client.force_login(self.usuarios['repartidor'])
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.session.keys()
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        vista = permiso_requerido('entregas')(lambda request: HttpResponse(request.permisos['repartidor_id']))
+
+        with self.assertNumQueries(0):
+            response = vista(request)
+        self.assertEqual(response.content, str(self.repartidor.pk).encode())
+
+    @en_contexto_nuevo
+    @override_settings(PERMISOS={'VERSION_EN_CACHE': True})
+    def test_con_cache_compartida_el_cambio_de_rol_invalida_la_sesion(self):
+        usuario = self.usuarios['cajero']
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(reverse('eventos_stock')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.rol = 'cliente'
+            usuario.save()
+        self.assertEqual(self.client.get(reverse('eventos_stock')).status_code, 403)
+
+    @en_contexto_nuevo
+    def test_sesion_sin_permisos_los_carga_una_vez(self):
+        self.client.force_login(self.usuarios['administrador'])
+        session = self.client.session
+        del session[CLAVE_SESION]
+        session.save()
+
+        self.assertEqual(self.client.get(reverse('eventos_stock')).status_code, 200)
+        self.assertIn(CLAVE_SESION, self.client.session)
+
+    @en_contexto_nuevo
+    def test_cambio_de_rol_invalida_la_sesion(self):
+        usuario = self.usuarios['administrador']
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(reverse('eventos_stock')).status_code, 200)
+
+        usuario.rol = 'cliente'
+        usuario.save()
+        self.assertEqual(self.client.get(reverse('eventos_stock')).status_code, 403)
+
+    @en_contexto_nuevo
+    def test_usuario_desactivado_pierde_el_acceso(self):
+        usuario = self.usuarios['administrador']
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(reverse('eventos_stock')).status_code, 200)
+
+        # Con un update() no hay señales ni caché que avisen: lo detecta la consulta de la petición
+        Usuario.objects.filter(pk=usuario.pk).update(is_active=False)
+        response = self.client.get(reverse('eventos_stock'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('login')))
+
+    @en_contexto_nuevo
+    def test_cambio_de_contrasena_cierra_la_sesion(self):
+        usuario = self.usuarios['cajero']
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(reverse('pos_view')).status_code, 200)
+
+        usuario.set_password('otra clave')
+        usuario.save()
+        response = self.client.get(reverse('pos_view'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('login')))
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+    @en_contexto_nuevo
+    def test_repartidor_sin_perfil(self):
+        usuario = Usuario.objects.create_user(username='permisos_sin_perfil', password='clave', rol='repartidor')
+        self.client.force_login(usuario)
+        response = self.client.get(reverse('repartidor_pedidos'))
+
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertIn('perfil de repartidor', str(list(messages.get_messages(response.wsgi_request))[0]))
+
+
+@override_settings(DESPACHO={'PESO_CARGA': 0})
+class ColaDespachoTests(SimpleTestCase):
+    """La cola de repartidores respeta los cupos libres (MAX_PEDIDOS_POR_REPARTIDOR = 3)."""
+
+    def setUp(self):
+        self.motor = MotorDespacho()
+        self.motor._cargado_en = time.monotonic()
+        # Sin peso de carga, el de mejor calificación va primero
+        self.motor._registrar(1, 5.0, 2, None)
+        self.motor._registrar(2, 1.0, 0, None)
+        self.motor._registrar(3, 4.0, 3, None)
+
+    def test_toma_el_mejor_con_cupos_suficientes(self):
+        self.assertEqual(self.motor._tomar_mejor(3), 2)
+        # El apartado por falta de cupos sigue en la cola
+        self.assertEqual(self.motor._tomar_mejor(), 1)
+
+    def test_repartidor_lleno_sale_de_la_cola(self):
+        self.assertEqual(self.motor._tomar_mejor(), 1)
+        self.assertEqual(self.motor._tomar_mejor(), 2)
+        self.assertIsNone(self.motor._tomar_mejor())
+        self.assertNotIn(3, self.motor._repartidores)
+
+
+@override_settings(DESPACHO={'PESO_CARGA': 0, 'AUTOMATICO': False})
+class AsignarPendientesTests(TestCase):
+    """Asignación por lotes con rutas de varias paradas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.metodo_pago = MetodoPago.objects.create(nombre='Efectivo', tipo='efectivo')
+        cls.repartidores = [
+            Repartidor.objects.create(
+                usuario=Usuario.objects.create_user(username=f'despacho_{i}', password='clave', rol='repartidor'),
+                calificacion_promedio=calificacion,
+            )
+            for i, calificacion in enumerate((5, 4))
+        ]
+
+    def _pedido(self, **campos):
+        datos = {
+            'metodo_pago': self.metodo_pago, 'tipo_orden': 'delivery', 'estado': 'listo',
+            'direccion_entrega': 'Av. Providencia 1234, Providencia', 'subtotal': 1000, 'total': 1000,
+        }
+        datos.update(campos)
+        return Pedido.objects.create(**datos)
+
+    def _cargas(self):
+        return {
+            repartidor.pk: Pedido.objects.filter(repartidor=repartidor, estado__in=['listo', 'en_camino']).count()
+            for repartidor in self.repartidores
+        }
+
+    @en_contexto_nuevo
+    def test_ruta_se_divide_sin_superar_el_maximo(self):
+        for repartidor in self.repartidores:
+            self._pedido(estado='en_camino', repartidor=repartidor)
+        pendientes = [self._pedido() for _ in range(3)]
+
+        asignaciones = MotorDespacho().asignar_pendientes(agrupar_rutas=True)
+
+        self.assertEqual(set(asignaciones), {pedido.pk for pedido in pendientes})
+        self.assertEqual(sorted(self._cargas().values()), [2, 3])
+
+    @en_contexto_nuevo
+    def test_ruta_completa_al_repartidor_con_cupo(self):
+        self._pedido(estado='en_camino', repartidor=self.repartidores[0])
+        self._pedido(estado='en_camino', repartidor=self.repartidores[0])
+        pendientes = [self._pedido() for _ in range(3)]
+
+        asignaciones = MotorDespacho().asignar_pendientes(agrupar_rutas=True)
+
+        # El mejor calificado solo tiene un cupo: la ruta entera va al otro
+        self.assertEqual(set(asignaciones.values()), {self.repartidores[1].pk})
+        self.assertEqual(len(asignaciones), len(pendientes))
+
+    @en_contexto_nuevo
+    def test_cola_desactualizada_no_supera_el_maximo(self):
+        motor = MotorDespacho()
+        motor.recargar()  # Ambos repartidores sin carga en la cola de este proceso
+        # Otro proceso llena al mejor calificado mientras tanto
+        for _ in range(3):
+            self._pedido(estado='en_camino', repartidor=self.repartidores[0])
+        pedido = self._pedido()
+
+        self.assertEqual(motor.asignar_pedido(pedido.pk), self.repartidores[1].pk)
+        self.assertEqual(self._cargas()[self.repartidores[0].pk], 3)
+
+    @en_contexto_nuevo
+    def test_lote_con_cola_desactualizada_no_supera_el_maximo(self):
+        motor = MotorDespacho()
+        motor.recargar()
+        for repartidor in self.repartidores:
+            self._pedido(estado='en_camino', repartidor=repartidor)
+            self._pedido(estado='en_camino', repartidor=repartidor)
+        pendientes = [self._pedido() for _ in range(3)]
+
+        # La cola cree que el mejor calificado tiene 3 cupos: solo se guarda el que le cabe de verdad
+        self.assertEqual(len(motor.asignar_pendientes(agrupar_rutas=False)), 1)
+        self.assertEqual(self._cargas(), {self.repartidores[0].pk: 3, self.repartidores[1].pk: 2})
+
+        # La pasada siguiente parte de una cola recargada
+        self.assertEqual(len(motor.asignar_pendientes(agrupar_rutas=False)), 1)
+        self.assertEqual(sorted(self._cargas().values()), [3, 3])
+        self.assertEqual(Pedido.objects.filter(pk__in=[p.pk for p in pendientes], repartidor__isnull=True).count(), 1)
+
+    @en_contexto_nuevo
+    def test_recarga_ignora_entregas_antiguas(self):
+        ahora = timezone.now()
+        self._pedido(estado='entregado', repartidor=self.repartidores[0], fecha_entrega=ahora - timedelta(days=30))
+        self._pedido(estado='entregado', repartidor=self.repartidores[1], fecha_entrega=ahora - timedelta(minutes=5))
+        self._pedido(estado='en_camino', repartidor=self.repartidores[1])
+
+        filas = {pk: (carga, libre_desde) for pk, _, carga, libre_desde in MotorDespacho._filas(Repartidor.objects.all())}
+
+        self.assertEqual(filas[self.repartidores[0].pk], (0, None))
+        self.assertEqual(filas[self.repartidores[1].pk][0], 1)
+        self.assertIsNotNone(filas[self.repartidores[1].pk][1])
+
+    @en_contexto_nuevo
+    def test_no_asigna_un_pedido_que_dejo_de_ser_delivery(self):
+        pedido = self._pedido()
+        agrupar = rutas.agrupar_pedidos
+
+        def cambiar_y_agrupar(pedidos, **kwargs):
+            Pedido.objects.filter(pk=pedido.pk).update(tipo_orden='local')
+            return agrupar(pedidos, **kwargs)
+
+        with mock.patch('core.rutas.agrupar_pedidos', side_effect=cambiar_y_agrupar):
+            asignaciones = MotorDespacho().asignar_pendientes(agrupar_rutas=True)
+
+        self.assertEqual(asignaciones, {})
+        pedido.refresh_from_db()
+        self.assertIsNone(pedido.repartidor_id)
+
+
+class GeocodificadorLocalTests(SimpleTestCase):
+    def setUp(self):
+        self.geocodificador = rutas.GeocodificadorLocal()
+
+    def test_la_comuna_es_la_ultima_parte(self):
+        self.assertEqual(
+            self.geocodificador.geocodificar('Av. Santiago Bueras 123, Maipú'), rutas.TABLA_POR_DEFECTO['maipu'],
+        )
+        self.assertEqual(
+            self.geocodificador.geocodificar('Los Militares 5000, Las Condes, Región Metropolitana'),
+            rutas.TABLA_POR_DEFECTO['las condes'],
+        )
+
+    def test_sin_comas_vale_el_ultimo_nombre(self):
+        self.assertEqual(
+            self.geocodificador.geocodificar('Av. Santiago Bueras 123 Maipú'), rutas.TABLA_POR_DEFECTO['maipu'],
+        )
+
+    def test_busqueda_por_subcadena_como_respaldo(self):
+        self.assertEqual(self.geocodificador.geocodificar('Villa Ñuñoa2'), rutas.TABLA_POR_DEFECTO['nunoa'])
+        self.assertIsNone(self.geocodificador.geocodificar('Sin comuna conocida'))
+
+    @override_settings(RUTAS={'CACHE_DIRECCIONES': 2})
+    def test_la_cache_de_direcciones_tiene_tope(self):
+        geocodificador = rutas.GeocodificadorLocal()
+        for numero in range(5):
+            geocodificador.geocodificar(f'Av. Grecia {numero}, Ñuñoa')
+        geocodificador.geocodificar('Av. Grecia 4, Ñuñoa')
+
+        informe = geocodificador.geocodificar.cache_info()
+        self.assertEqual((informe.currsize, informe.maxsize, informe.hits), (2, 2, 1))
+
+
+class OptimizarImagenTests(SimpleTestCase):
+    def _jpeg(self, tamano, orientacion=None):
+        imagen = Image.effect_noise(tamano, 64).convert('RGB')
+        exif = Image.Exif()
+        if orientacion:
+            exif[0x0112] = orientacion
+        salida = io.BytesIO()
+        imagen.save(salida, 'JPEG', quality=100, exif=exif.tobytes())
+        return salida.getvalue()
+
+    def test_aplica_la_orientacion_exif_antes_de_reducir(self):
+        # Foto apaisada en el sensor con orientación 6: se ve vertical
+        contenido, extension = estaticos.optimizar_imagen(self._jpeg((2000, 1000), orientacion=6), '.jpg')
+
+        imagen = Image.open(io.BytesIO(contenido))
+        self.assertEqual(extension, '.jpg')
+        self.assertEqual(imagen.size, (600, 1200))
+        self.assertNotIn(0x0112, imagen.getexif())
+
+    def test_sin_orientacion_conserva_la_forma(self):
+        contenido, _ = estaticos.optimizar_imagen(self._jpeg((2000, 1000)), '.jpg')
+        self.assertEqual(Image.open(io.BytesIO(contenido)).size, (1200, 600))
+
+
+class LibroStockTests(TestCase):
+    """Ventas, devoluciones y conciliación sobre el libro de stock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.cajero = Usuario.objects.create_user(username='libro_cajero', password='clave', rol='cajero')
+        cls.metodo_pago = MetodoPago.objects.create(nombre='Efectivo', tipo='efectivo')
+        cls.producto = Producto.objects.create(nombre='Completo', precio=2500)
+        registrar_movimiento(cls.producto, 10, 'reposicion')
+
+    def _stock(self):
+        return Producto.objects.values_list('stock', flat=True).get(pk=self.producto.pk)
+
+    def _libro(self, **filtros):
+        return list(MovimientoStock.objects.filter(producto=self.producto, **filtros).values_list('tipo', 'cantidad'))
+
+    @en_contexto_nuevo
+    def test_venta_descuenta_y_registra(self):
+        registrar_movimiento(self.producto, -3, 'venta')
+        self.assertEqual(self._stock(), 7)
+        self.assertEqual(self._libro(tipo='venta'), [('venta', -3)])
+        with self.assertRaises(StockInsuficiente):
+            registrar_movimiento(self.producto, -8, 'venta')
+        self.assertEqual(self._stock(), 7)
+
+    @en_contexto_nuevo
+    def test_cancelar_devuelve_una_sola_vez(self):
+        pedido = Pedido.objects.create(
+            cliente=self.cajero, metodo_pago=self.metodo_pago, estado='en_preparacion', subtotal=5000, total=5000,
+        )
+        registrar_movimiento(self.producto, -2, 'venta', pedido=pedido)
+        pedido.estado = 'cancelado'
+        pedido.save()
+        self.assertEqual(self._stock(), 10)
+        self.assertEqual(self._libro(tipo='devolucion', pedido=pedido), [('devolucion', 2)])
+
+        self.assertEqual(devolver_stock_pedido(pedido), [])
+        self.assertEqual(self._stock(), 10)
+
+    @en_contexto_nuevo
+    def test_pos_registra_la_venta_en_el_libro(self):
+        self.client.force_login(self.cajero)
+        items = json.dumps([{'id': self.producto.pk, 'cantidad': 4}])
+        datos = {'items': items, 'total': '10000', 'metodo_pago': 'Efectivo'}
+        response = self.client.post(reverse('pos_view'), datos)
+
+        self.assertRedirects(response, reverse('pos_view'), fetch_redirect_response=False)
+        pedido = Pedido.objects.get(tipo_orden='local')
+        self.assertEqual(list(pedido.detalles.values_list('producto_id', 'cantidad')), [(self.producto.pk, 4)])
+        self.assertEqual(self._libro(pedido=pedido), [('venta', -4)])
+        self.assertEqual(self._stock(), 6)
+
+        # Sin stock suficiente no queda ni el pedido ni el movimiento
+        datos['items'] = json.dumps([{'id': self.producto.pk, 'cantidad': 7}])
+        self.client.post(reverse('pos_view'), datos)
+        self.assertEqual(Pedido.objects.count(), 1)
+        self.assertEqual(self._stock(), 6)
+
+    @en_contexto_nuevo
+    def test_admin_no_pisa_una_venta_ocurrida_mientras_se_editaba(self):
+        admin_usuario = Usuario.objects.create_superuser(username='libro_admin', password='clave', email='a@a.cl')
+        categoria = Categoria.objects.create(nombre='Sándwiches')
+        Producto.objects.filter(pk=self.producto.pk).update(categoria=categoria)
+        self.client.force_login(admin_usuario)
+        url = reverse('admin:core_producto_change', args=[self.producto.pk])
+
+        response = self.client.get(url)
+        self.assertContains(response, 'name="stock_original" value="10"')
+        registrar_movimiento(self.producto, -3, 'venta')  # Venta mientras la página está abierta
+
+        response = self.client.post(url, {
+            'nombre': 'Completo', 'precio': '2500', 'stock': '15', 'stock_original': '10',
+            'activo': 'on', 'categoria': categoria.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        # La edición suma +5 sobre el saldo real (7), no lo reemplaza por 15
+        self.assertEqual(self._stock(), 12)
+        self.assertEqual(self._libro(tipo='ajuste'), [('ajuste', 5)])
+
+    @en_contexto_nuevo
+    def test_conciliar_stock_registra_el_ajuste(self):
+        Producto.objects.filter(pk=self.producto.pk).update(stock=12)
+        self.assertEqual(conciliar_stock.diferencias(), [(self.producto.pk, 'Completo', 12, 10)])
+
+        call_command('conciliar_stock', '--corregir', stdout=io.StringIO())
+
+        self.assertEqual(conciliar_stock.diferencias(), [])
+        self.assertEqual(self._libro(tipo='ajuste'), [('ajuste', 2)])
+        self.assertEqual(self._stock(), 12)
+
+
+class CursorHistorialTests(SimpleTestCase):
+    def test_cursor_valido(self):
+        self.assertEqual(decodificar_cursor('1000000.7'), (datetime(1970, 1, 1, 0, 0, 1, tzinfo=dt_timezone.utc), 7))
+
+    def test_cursor_invalido_o_fuera_de_rango(self):
+        for cursor in ('abc', '1.2.3', None, '9' * 30 + '.1', '-' + '9' * 30 + '.1'):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decodificar_cursor(cursor))
+
+
+class CursorColaReclamosTests(SimpleTestCase):
+    def test_cursor_por_plazo(self):
+        self.assertEqual(
+            reclamos._decodificar_cursor('1000000.7', por_plazo=True),
+            (datetime(1970, 1, 1, 0, 0, 1, tzinfo=dt_timezone.utc), 7),
+        )
+        self.assertEqual(reclamos._decodificar_cursor('7', por_plazo=False), 7)
+
+    def test_cursor_invalido_o_fuera_de_rango(self):
+        for cursor in ('abc', '1.2.3', None, '9' * 30 + '.1'):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(reclamos._decodificar_cursor(cursor, por_plazo=True))
+
+
+class AgregarAlCarritoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.cliente = Usuario.objects.create_user(username='carrito_cliente', password='clave', rol='cliente')
+        cls.producto = Producto.objects.create(nombre='Empanada', precio=1500, stock=10)
+
+    def _cantidades(self):
+        return list(ItemCarrito.objects.filter(carrito__usuario=self.cliente).values_list('cantidad', flat=True))
+
+    @en_contexto_nuevo
+    def test_rechaza_cantidades_invalidas(self):
+        self.client.force_login(self.cliente)
+        for cantidad in ('abc', '1.5', '0', '-3'):
+            with self.subTest(cantidad=cantidad):
+                datos = {'product_id': self.producto.pk, 'cantidad': cantidad}
+                response = self.client.post(reverse('agregar_al_carrito'), datos, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['ok'])
+
+                response = self.client.post(reverse('agregar_al_carrito'), datos)
+                self.assertRedirects(response, reverse('catalogo_productos'), fetch_redirect_response=False)
+        self.assertEqual(self._cantidades(), [])
+
+    @en_contexto_nuevo
+    def test_reintenta_si_otra_peticion_creo_la_linea(self):
+        obtener_carrito = Carrito.objects.get_or_create
+
+        def otra_peticion_inserta_primero(**campos):
+            carrito, creado = obtener_carrito(**campos)
+            ItemCarrito.objects.create(carrito=carrito, producto=self.producto, cantidad=2)
+            return carrito, creado
+
+        with mock.patch.object(Carrito.objects, 'get_or_create', side_effect=otra_peticion_inserta_primero):
+            self.assertIsNotNone(agregar_producto(self.cliente, self.producto.pk, 2))
+        self.assertEqual(self._cantidades(), [4])
+
+    @en_contexto_nuevo
+    def test_otra_violacion_no_se_reintenta(self):
+        with self.assertRaises(IntegrityError):
+            agregar_producto(self.cliente, self.producto.pk, -1)
+        self.assertEqual(self._cantidades(), [])
+
+
+class ReporteCsvTests(SimpleTestCase):
+    def test_textos_con_formula_se_neutralizan(self):
+        fila = ['=HYPERLINK("http://x")', '+56 9 1234', '-2+3', '@SUM(A1)', 'Juan', Decimal('-1500.00'), None]
+        contenido = ''.join(generar_csv('pedidos', [fila])).splitlines()[1]
+        self.assertEqual(next(csv.reader([contenido])), [
+            '\'=HYPERLINK("http://x")', "'+56 9 1234", "'-2+3", "'@SUM(A1)", 'Juan', '-1500.00', '',
+        ])
+
+
+class ArchivarPedidosTests(TestCase):
+    """Un lote de archivo mueve el pedido con sus detalles y reclamos y conserva el libro de stock."""
+
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.cliente = Usuario.objects.create_user(username='archivo_cliente', password='clave', rol='cliente')
+        cls.metodo_pago = MetodoPago.objects.create(nombre='Efectivo', tipo='efectivo')
+        cls.producto = Producto.objects.create(nombre='Sopaipilla', precio=500)
+        registrar_movimiento(cls.producto, 20, 'reposicion')
+
+    def _pedido(self, estado_reclamo):
+        pedido = Pedido.objects.create(
+            cliente=self.cliente, metodo_pago=self.metodo_pago, estado='entregado', subtotal=1500, total=1500,
+        )
+        DetallePedido.objects.create(pedido=pedido, producto=self.producto, cantidad=3, precio_unitario=500, subtotal=1500)
+        registrar_movimiento(self.producto, -3, 'venta', pedido=pedido)
+        Reclamo.objects.create(cliente=self.cliente, pedido=pedido, motivo='otro', descripcion='Frío', estado=estado_reclamo)
+        return pedido
+
+    @en_contexto_nuevo
+    def test_archiva_el_pedido_completo(self):
+        pedido = self._pedido('cerrado')
+        self.assertEqual(reclamos.contadores()['cerrado'], 1)
+
+        self.assertEqual(archivar_lote(timezone.now() + timedelta(days=1)), [pedido.pk])
+
+        archivado = PedidoArchivado.objects.get(pk=pedido.pk)
+        self.assertEqual(archivado.numero_pedido, pedido.numero_pedido)
+        self.assertEqual(archivado.cantidad_items, 3)
+        self.assertIn('Sopaipilla', archivado.productos)
+        self.assertEqual(list(archivado.detalles.values_list('producto_id', 'cantidad')), [(self.producto.pk, 3)])
+        self.assertEqual(list(archivado.reclamos.values_list('estado', flat=True)), ['cerrado'])
+        self.assertFalse(Pedido.objects.filter(pk=pedido.pk).exists())
+        self.assertFalse(Reclamo.objects.exists())
+        self.assertEqual(reclamos.contadores()['cerrado'], 0)
+
+        venta = MovimientoStock.objects.get(tipo='venta')
+        self.assertIsNone(venta.pedido_id)
+        self.assertEqual(venta.nota, f'Pedido {pedido.numero_pedido}')
+        self.assertEqual(venta.cantidad, -3)
+
+        self.assertEqual(obtener_pedido(pk=pedido.pk, cliente=self.cliente), archivado)
+
+    @en_contexto_nuevo
+    def test_no_archiva_con_reclamo_abierto(self):
+        pedido = self._pedido('en_revision')
+
+        self.assertEqual(archivar_lote(timezone.now() + timedelta(days=1)), [])
+
+        self.assertEqual(obtener_pedido(pk=pedido.pk), pedido)
+        self.assertFalse(PedidoArchivado.objects.exists())
+        self.assertEqual(MovimientoStock.objects.get(tipo='venta').pedido_id, pedido.pk)
+
+
+class ImportarMenuTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.categoria = Categoria.objects.create(nombre='Bebidas')
+        cls.producto = Producto.objects.create(nombre='Jugo', precio=1000, categoria=cls.categoria)
+        registrar_movimiento(cls.producto, 5, 'reposicion')
+
+    def _importar(self, contenido, **opciones):
+        return menu.importar(io.BytesIO(contenido.encode()), 'csv', **opciones)
+
+    def test_precio_no_finito_es_un_error_de_fila(self):
+        for precio in ('NaN', 'sNaN', 'Infinity', '-inf', 'abc'):
+            with self.subTest(precio=precio):
+                with self.assertRaises(ValueError):
+                    menu.validar_fila({'nombre': 'x', 'precio': precio, 'stock': '1'}, {})
+
+    @en_contexto_nuevo
+    def test_importa_crea_y_actualiza(self):
+        resultado = self._importar(
+            'nombre,categoria,precio,stock\n'
+            'Bebida Cola,bebidas,1200,8\n'
+            'Jugo,,1500,7\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.errores), (1, 1, []))
+        self.assertEqual(Producto.objects.get(nombre='Bebida Cola').stock, 8)
+        jugo = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((jugo.precio, jugo.stock), (Decimal('1500.00'), 7))
+        # El stock pasa por el libro como ajuste, no se sobrescribe
+        self.assertEqual(list(MovimientoStock.objects.filter(producto=jugo, tipo='ajuste').values_list('cantidad', flat=True)), [2])
+
+    @en_contexto_nuevo
+    def test_filas_con_errores_no_detienen_la_importacion(self):
+        resultado = self._importar(
+            'nombre,categoria,precio\n'
+            'Agua,Bebidas,NaN\n'
+            'Té,Infusiones,900\n'
+            'Café,Bebidas,1100\n'
+        )
+        self.assertEqual([error.fila for error in resultado.errores], [2, 3])
+        self.assertIn('precio inválido', resultado.errores[0].mensaje)
+        self.assertIn('categoría', resultado.errores[1].mensaje)
+        self.assertEqual(resultado.creados, 1)
+        self.assertTrue(Producto.objects.filter(nombre='Café').exists())
+
+    @en_contexto_nuevo
+    def test_simular_no_escribe(self):
+        resultado = self._importar('nombre,categoria,precio,stock\nNuevo,Bebidas,500,3\nJugo,,2000,9\n', simular=True)
+
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 1))
+        self.assertEqual(resultado.cambios[1][3]['precio'], (Decimal('1000.00'), Decimal('2000.00')))
+        self.assertFalse(Producto.objects.filter(nombre='Nuevo').exists())
+        jugo = Producto.objects.get(pk=self.producto.pk)
+        self.assertEqual((jugo.precio, jugo.stock), (Decimal('1000.00'), 5))
+        self.assertEqual(MovimientoStock.objects.count(), 1)
+
+
+class ReclamosClienteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.cliente = Usuario.objects.create_user(username='reclamos_cliente', password='clave', rol='cliente')
+        cls.otro = Usuario.objects.create_user(username='reclamos_otro', password='clave', rol='cliente')
+        cls.admin = Usuario.objects.create_user(
+            username='reclamos_admin', password='clave', rol='administrador', email='admin@cosmofood.cl',
+        )
+        cls.metodo_pago = MetodoPago.objects.create(nombre='Efectivo', tipo='efectivo')
+        cls.pedido = Pedido.objects.create(
+            cliente=cls.cliente, metodo_pago=cls.metodo_pago, estado='entregado', subtotal=5000, total=5000,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _reclamar(self, descripcion='La bebida llegó abierta y derramada', motivo='producto_danado', pedido=None):
+        return reclamos.crear_reclamo(self.cliente, (pedido or self.pedido).pk, motivo, descripcion)
+
+    def _rechazo(self, **kwargs):
+        with self.assertRaises(reclamos.ReclamoRechazado) as contexto:
+            self._reclamar(**kwargs)
+        return contexto.exception.estado_http
+
+    @en_contexto_nuevo
+    def test_pedido_ajeno_responde_404(self):
+        self.client.force_login(self.otro)
+        response = self.client.post(
+            reverse('reclamar_pedido', args=[self.pedido.pk]),
+            {'motivo': 'otro', 'descripcion': 'No es mi pedido pero reclamo igual'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Reclamo.objects.exists())
+
+    @en_contexto_nuevo
+    def test_pedido_antiguo_se_rechaza(self):
+        Pedido.objects.filter(pk=self.pedido.pk).update(fecha_creacion=timezone.now() - timedelta(days=31))
+        self.assertEqual(self._rechazo(), 400)
+
+    @en_contexto_nuevo
+    def test_duplicado_se_rechaza_sin_gastar_el_limite(self):
+        self._reclamar()
+        for _ in range(3):
+            self.assertEqual(self._rechazo(descripcion='La bebida llegó abierta y toda derramada'), 409)
+        # Los rechazos no cuentan: quedan dos reclamos más en la hora
+        self._reclamar(motivo='demora_excesiva', descripcion='Tardó más de una hora en llegar')
+        self._reclamar(motivo='otro', descripcion='El repartidor no tenía vuelto')
+        self.assertEqual(self._rechazo(motivo='mala_atencion', descripcion='Me trataron mal por teléfono'), 429)
+        self.assertEqual(Reclamo.objects.count(), 3)
+
+    @en_contexto_nuevo
+    def test_textos_sin_palabras_no_son_duplicados(self):
+        self._reclamar(descripcion='!!!!!!!!!!!!')
+        self._reclamar(descripcion='?? ?? ?? ?? ??')
+        self.assertEqual(Reclamo.objects.count(), 2)
+
+    @en_contexto_nuevo
+    def test_envio_simultaneo_se_rechaza(self):
+        # Otra petición tiene tomada la reserva del pedido y motivo
+        cache.add(f'reclamos:reserva:{self.pedido.pk}:producto_danado', 1)
+        self.assertEqual(self._rechazo(), 409)
+        self.assertFalse(Reclamo.objects.exists())
+
+    @en_contexto_nuevo
+    def test_notificar_marca_los_reclamos_enviados(self):
+        reclamo = self._reclamar()
+        self.assertIsNone(reclamo.fecha_notificacion)
+
+        self.assertEqual(reclamos.notificar_reclamos(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['admin@cosmofood.cl'])
+        reclamo.refresh_from_db()
+        self.assertIsNotNone(reclamo.fecha_notificacion)
+        self.assertEqual(reclamos.notificar_reclamos(), 0)
+
+
+@override_settings(PRONOSTICO={'DIAS_REPOSICION': [1]})  # Reposición los martes a las 9:00
+class PronosticoStockTests(TestCase):
+    """Historial fijo: 2 unidades de Churrasco cada lunes a las 10:00 durante las 8 semanas de la ventana."""
+    AHORA = datetime(2026, 10, 14, 12, tzinfo=dt_timezone.utc)  # Miércoles
+
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cliente = Usuario.objects.create_user(username='pronostico_cliente', password='clave', rol='cliente')
+        metodo_pago = MetodoPago.objects.create(nombre='Efectivo', tipo='efectivo')
+        cls.churrasco = Producto.objects.create(nombre='Churrasco', precio=4000, stock=1)
+        cls.sin_ventas = Producto.objects.create(nombre='Barros Luco', precio=4500, stock=5)
+        cls.agotado = Producto.objects.create(nombre='Chacarero', precio=4200, stock=0)
+
+        lunes = datetime(2026, 10, 12, 10, tzinfo=dt_timezone.utc)
+        fechas = [(lunes - timedelta(weeks=semana), 'entregado') for semana in range(8)]
+        fechas.append((lunes, 'cancelado'))  # Las ventas canceladas no cuentan
+        for fecha, estado in fechas:
+            pedido = Pedido.objects.create(cliente=cliente, metodo_pago=metodo_pago, estado=estado, subtotal=8000, total=8000)
+            DetallePedido.objects.create(pedido=pedido, producto=cls.churrasco, cantidad=2, precio_unitario=4000, subtotal=8000)
+            Pedido.objects.filter(pk=pedido.pk).update(fecha_creacion=fecha)
+
+    def test_tasas_por_dia_y_hora(self):
+        hasta = datetime(2026, 10, 14, tzinfo=dt_timezone.utc)
+        tasas = pronostico.tasas_por_franja(hasta - timedelta(days=56), hasta)
+
+        self.assertEqual(set(tasas), {self.churrasco.pk})
+        self.assertEqual(tasas[self.churrasco.pk][0 * 24 + 10], 2.0)  # Lunes 10:00
+        self.assertEqual(sum(tasas[self.churrasco.pk]), 2.0)
+
+    def test_estimar_agotamiento(self):
+        lunes = datetime(2026, 10, 12, tzinfo=dt_timezone.utc)
+        self.assertEqual(pronostico.estimar_agotamiento(0, None, lunes, 336), lunes)
+        self.assertIsNone(pronostico.estimar_agotamiento(5, None, lunes, 336))
+        self.assertEqual(pronostico.estimar_agotamiento(5.5, [1.0] * 168, lunes, 336), lunes + timedelta(hours=5.5))
+
+        solo_lunes = [0.0] * 168
+        solo_lunes[10] = 2.0
+        # 10 unidades a 2 por semana: se saltan 4 semanas completas y se agota el quinto lunes a las 11:00
+        self.assertEqual(
+            pronostico.estimar_agotamiento(10, solo_lunes, lunes, 1000), lunes + timedelta(weeks=4, hours=11),
+        )
+        self.assertIsNone(pronostico.estimar_agotamiento(10, solo_lunes, lunes, 336))
+
+    @en_contexto_nuevo
+    def test_pronostico_y_alertas(self):
+        pronosticos, alertas = pronostico.pronosticar(self.AHORA)
+
+        resultado = {p.producto_id: p for p in PronosticoStock.objects.all()}
+        self.assertEqual(len(pronosticos), 3)
+        martes = datetime(2026, 10, 20, 9, tzinfo=dt_timezone.utc)
+        churrasco = resultado[self.churrasco.pk]
+        self.assertEqual(churrasco.venta_diaria, Decimal('0.29'))
+        # 1 unidad a 2 por hora: se agota el lunes 19 a las 10:30, antes de la reposición del martes
+        self.assertEqual(churrasco.agotamiento, datetime(2026, 10, 19, 10, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(churrasco.proxima_reposicion, martes)
+        self.assertTrue(churrasco.en_riesgo)
+        self.assertEqual(resultado[self.agotado.pk].agotamiento, self.AHORA)
+        self.assertTrue(resultado[self.agotado.pk].en_riesgo)
+        self.assertIsNone(resultado[self.sin_ventas.pk].agotamiento)
+        self.assertFalse(resultado[self.sin_ventas.pk].en_riesgo)
+        self.assertEqual({a.producto_id for a in alertas}, {self.churrasco.pk, self.agotado.pk})
+
+        # Tras reponer, la alerta del churrasco se resuelve y la del agotado no se duplica
+        Producto.objects.filter(pk=self.churrasco.pk).update(stock=50)
+        _, alertas = pronostico.pronosticar(self.AHORA)
+        self.assertEqual(alertas, [])
+        self.assertEqual(
+            dict(AlertaStock.objects.values_list('producto_id', 'estado')),
+            {self.churrasco.pk: 'resuelta', self.agotado.pk: 'pendiente'},
+        )
+
+    @en_contexto_nuevo
+    def test_enviar_alertas(self):
+        Usuario.objects.create_user(username='pronostico_admin', password='clave', rol='administrador', email='admin@cosmofood.cl')
+        pronostico.pronosticar(self.AHORA)
+
+        self.assertEqual(pronostico.enviar_alertas(), 2)
+        self.assertIn('- Chacarero: agotado', mail.outbox[0].body)
+        self.assertIn('- Churrasco: 1 unid., se agota el 19/10 10:30', mail.outbox[0].body)
+        self.assertEqual(set(AlertaStock.objects.values_list('estado', flat=True)), {'enviada'})
+        self.assertEqual(pronostico.enviar_alertas(), 0)
+
+
+class PromocionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.sandwiches = Categoria.objects.create(nombre='Sandwiches')
+        cls.bebidas = Categoria.objects.create(nombre='Bebidas')
+        cls.italiano = Producto.objects.create(nombre='Italiano', precio=4000, categoria=cls.sandwiches, stock=10)
+        cls.jugo = Producto.objects.create(nombre='Jugo Natural', precio=2000, categoria=cls.bebidas, stock=10)
+        cls.cajero = Usuario.objects.create_user(username='promo_cajero', password='clave', rol='cajero')
+
+    def setUp(self):
+        cache.clear()
+
+    def _promocion(self, tipo, valor, productos=(), categorias=(), inicio=None, fin=None):
+        ahora = timezone.now()
+        promocion = Promocion.objects.create(
+            nombre=f'{tipo} {valor}', tipo=tipo, valor=valor,
+            inicio=inicio or ahora - timedelta(hours=1), fin=fin or ahora + timedelta(hours=1),
+        )
+        promocion.productos.set(productos)
+        promocion.categorias.set(categorias)
+        return promocion
+
+    def _precios(self):
+        return {
+            pk: precio
+            for pk, (precio, _) in promociones.precios_efectivos(
+                (p.pk, p.categoria_id, p.precio) for p in (self.italiano, self.jugo)
+            ).items()
+        }
+
+    @en_contexto_nuevo
+    def test_superpuestas_gana_el_menor_precio(self):
+        self._promocion('porcentaje', 10, productos=[self.italiano])
+        mejor = self._promocion('precio_fijo', 3000, categorias=[self.sandwiches])
+        self._promocion('monto', 500, categorias=[self.sandwiches])
+
+        precio, nombre = promociones.precio_efectivo(self.italiano.pk, self.sandwiches.pk, self.italiano.precio)
+        self.assertEqual((precio, nombre), (Decimal('3000.00'), mejor.nombre))
+
+    @en_contexto_nuevo
+    def test_alcance_por_producto_y_por_categoria(self):
+        self._promocion('porcentaje', 25, categorias=[self.sandwiches])
+        self._promocion('monto', 500, productos=[self.jugo])
+        self._promocion('porcentaje', 50, productos=[self.jugo], inicio=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(self._precios(), {self.italiano.pk: Decimal('3000.00'), self.jugo.pk: Decimal('1500.00')})
+
+    @en_contexto_nuevo
+    def test_cache_vence_en_el_proximo_borde(self):
+        ahora = timezone.now().replace(microsecond=0)
+        self._promocion('porcentaje', 10, productos=[self.jugo], inicio=ahora - timedelta(hours=1), fin=ahora + timedelta(seconds=300))
+        self._promocion('porcentaje', 20, productos=[self.jugo], inicio=ahora + timedelta(seconds=120), fin=ahora + timedelta(days=1))
+
+        self.assertEqual(promociones.segundos_hasta_borde(ahora), 120)
+        with mock.patch('core.promociones.timezone.now', return_value=ahora), \
+                mock.patch.object(promociones.cache, 'set', wraps=promociones.cache.set) as guardar:
+            promociones.vigentes()
+        self.assertEqual(guardar.call_args.args[2], 120)
+
+        # Pasado el borde, la nueva entrada ya incluye la promoción que empezó
+        cache.clear()
+        with mock.patch('core.promociones.timezone.now', return_value=ahora + timedelta(seconds=121)):
+            self.assertEqual(self._precios()[self.jugo.pk], Decimal('1600.00'))
+        self.assertEqual(promociones.segundos_hasta_borde(ahora + timedelta(days=2)), promociones.configuracion('MAX_TIMEOUT'))
+
+    @en_contexto_nuevo
+    def test_pos_cobra_el_precio_con_promocion(self):
+        self._promocion('porcentaje', 50, productos=[self.italiano])
+        self.client.force_login(self.cajero)
+        self.assertContains(self.client.get(reverse('pos_view')), '$2000')
+
+        items = json.dumps([{'id': self.italiano.pk, 'cantidad': 2}])
+        self.client.post(reverse('pos_view'), {'items': items, 'total': '8000', 'metodo_pago': 'Efectivo'})
+
+        pedido = Pedido.objects.get(tipo_orden='local')
+        self.assertEqual(pedido.total, Decimal('4000.00'))
+        self.assertEqual(list(pedido.detalles.values_list('precio_unitario', flat=True)), [Decimal('2000.00')])
+
+
+class BusquedaPedidosTests(TestCase):
+    """Sugerencias del buscador de pedidos y filtro del listado del panel (core/busqueda.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.metodo_pago = MetodoPago.objects.create(nombre='Efectivo', tipo='efectivo')
+        cls.cliente = Usuario.objects.create_user(username='busqueda_cliente', password='clave', rol='cliente')
+        cls.maria = Usuario.objects.create_user(
+            username='mjperez', password='clave', rol='cliente',
+            first_name='María José', last_name='Pérez', telefono='+56 9 8765 4321',
+        )
+        cls.administrador = Usuario.objects.create_user(username='busqueda_admin', password='clave', rol='administrador')
+
+    def _pedido(self, numero, cliente=None, **campos):
+        return Pedido.objects.create(
+            numero_pedido=numero, cliente=cliente or self.cliente, metodo_pago=self.metodo_pago,
+            estado='entregado', subtotal=1000, total=1000, **campos
+        )
+
+    def _ids(self, texto):
+        return [resultado['pedido_id'] for resultado in busqueda.buscar(texto)]
+
+    @en_contexto_nuevo
+    def test_comienzo_y_parte_del_numero(self):
+        pedido = self._pedido('12345678')
+
+        for texto in ('12345678', '1234', '345', '5678', '#12-34'):
+            with self.subTest(texto=texto):
+                self.assertEqual(self._ids(texto), [pedido.pk])
+        self.assertEqual(self._ids('8765'), [])
+        self.assertTrue(busqueda.buscar('12345678')[0]['exacto'])
+        self.assertFalse(busqueda.buscar('1234')[0]['exacto'])
+
+    @en_contexto_nuevo
+    def test_ultimos_digitos_del_telefono(self):
+        pedido = self._pedido('11110000', cliente=self.maria)
+
+        for texto in ('4321', '8765 4321', '+56 9 8765 4321'):
+            with self.subTest(texto=texto):
+                self.assertEqual(self._ids(texto), [pedido.pk])
+
+    @en_contexto_nuevo
+    def test_nombres_de_varias_palabras(self):
+        pedido = self._pedido('22220000', cliente=self.maria)
+
+        for texto in ('maria', 'José Pérez', 'PEREZ mar', 'mjper'):
+            with self.subTest(texto=texto):
+                self.assertEqual(self._ids(texto), [pedido.pk])
+        self.assertEqual(self._ids('jose gomez'), [])
+
+    @en_contexto_nuevo
+    def test_orden_de_las_sugerencias(self):
+        exacto = self._pedido('5678')
+        por_id = self._pedido('90000001', pk=5678)
+        comienzo = self._pedido('56781234')
+        parte = self._pedido('12345678')
+        telefono = Usuario.objects.create_user(username='busqueda_fono', password='clave', telefono='+56 9 1111 5678')
+        de_cliente = self._pedido('99990000', cliente=telefono)
+
+        self.assertEqual(self._ids('5678'), [exacto.pk, por_id.pk, comienzo.pk, parte.pk, de_cliente.pk])
+
+    @en_contexto_nuevo
+    def test_reindexa_al_cambiar_numero_o_telefono(self):
+        pedido = self._pedido('33334444', cliente=self.maria)
+
+        pedido = Pedido.objects.get(pk=pedido.pk)
+        pedido.numero_pedido = '77770000'
+        pedido.save()
+        self.assertEqual(self._ids('7777'), [pedido.pk])
+        self.assertEqual(self._ids('3333'), [])
+
+        self.maria.telefono = '+56 2 2222 9999'
+        self.maria.save()
+        self.assertEqual(self._ids('9999'), [pedido.pk])
+        self.assertEqual(self._ids('4321'), [])
+
+    @en_contexto_nuevo
+    def test_archivar_saca_el_pedido_del_indice(self):
+        pedido = self._pedido('44445555', cliente=self.maria)
+
+        self.assertEqual(archivar_lote(timezone.now() + timedelta(days=1)), [pedido.pk])
+
+        self.assertFalse(TerminoPedido.objects.filter(pedido_id=pedido.pk).exists())
+        self.assertEqual(self._ids('4444'), [])
+        self.assertEqual(self._ids('maria'), [])
+
+    @en_contexto_nuevo
+    def test_filtro_del_listado_del_panel(self):
+        de_maria = self._pedido('55556666', cliente=self.maria)
+        otro = self._pedido('66667777')
+        self.client.force_login(self.administrador)
+
+        for texto, esperados in (('5555', {de_maria.pk}), ('6666', {de_maria.pk, otro.pk}), ('jose perez', {de_maria.pk}), ('8765', {de_maria.pk})):
+            with self.subTest(texto=texto):
+                respuesta = self.client.get(reverse('admin_pedidos_lista'), {'q': texto})
+                self.assertEqual({pedido.pk for pedido in respuesta.context['pedidos']}, esperados)
+
+
+class CarritoCookieTests(TestCase):
+    """Carrito de visitantes en cookie firmada y su fusión al iniciar sesión o registrarse."""
+
+    @classmethod
+    def setUpTestData(cls):
+        contextvars.copy_context().run(cls._crear_datos)
+
+    @classmethod
+    def _crear_datos(cls):
+        cls.cliente = Usuario.objects.create_user(username='cookie_cliente', password='Clave123', rol='cliente')
+        cls.empanada = Producto.objects.create(nombre='Empanada de Queso', precio=1500, stock=10)
+        cls.pebre = Producto.objects.create(nombre='Pebre', precio=500, stock=2)
+        cls.mote = Producto.objects.create(nombre='Mote con Huesillo', precio=1800, stock=5)
+
+    def _agregar(self, producto, cantidad=1, cliente=None):
+        return (cliente or self.client).post(
+            reverse('agregar_al_carrito'), {'product_id': producto.pk, 'cantidad': cantidad},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def _cookie(self, cantidades):
+        respuesta = HttpResponse()
+        carrito = CarritoCookie(cantidades)
+        carrito.modificado = True
+        carrito.guardar(respuesta)
+        return respuesta.cookies[COOKIE_CARRITO].value
+
+    def _leer(self, valor):
+        request = RequestFactory().get('/')
+        request.COOKIES[COOKIE_CARRITO] = valor
+        return CarritoCookie.desde(request).cantidades
+
+    def _en_base(self, usuario):
+        return dict(ItemCarrito.objects.filter(carrito__usuario=usuario).values_list('producto_id', 'cantidad'))
+
+    def test_firma_alterada_o_vencida(self):
+        valor = self._cookie({self.empanada.pk: 2})
+        self.assertEqual(self._leer(valor), {self.empanada.pk: 2})
+
+        self.assertIn(':2}', valor)
+        self.assertEqual(self._leer(valor.replace(':2}', ':9}')), {})
+        self.assertEqual(self._leer(json.dumps({self.empanada.pk: 9})), {})
+        with mock.patch('time.time', return_value=time.time() + carrito.configuracion('COOKIE_MAX_AGE') + 60):
+            self.assertEqual(self._leer(valor), {})
+
+    @en_contexto_nuevo
+    def test_no_supera_el_stock(self):
+        self.assertEqual(self._agregar(self.pebre, 3).status_code, 409)
+        self.assertNotIn(COOKIE_CARRITO, self.client.cookies)
+
+        self.assertTrue(self._agregar(self.pebre, 2).json()['ok'])
+        respuesta = self._agregar(self.pebre)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['carrito']['total_items'], 2)
+
+        respuesta = self.client.post(reverse('actualizar_carrito'), {'item_id': self.pebre.pk, 'action': 'increase'},
+                                     HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(self._leer(self.client.cookies[COOKIE_CARRITO].value), {self.pebre.pk: 2})
+        self.assertFalse(Carrito.objects.exists())
+
+    @en_contexto_nuevo
+    def test_rechaza_cookies_falsificadas(self):
+        falsificada = signing.get_cookie_signer(salt=COOKIE_CARRITO + 'otra.sal').sign(json.dumps({self.pebre.pk: 50}))
+        for valor in (json.dumps({self.pebre.pk: 50}), falsificada):
+            with self.subTest(valor=valor):
+                self.client.cookies[COOKIE_CARRITO] = valor
+                respuesta = self.client.post(reverse('actualizar_carrito'), {'item_id': self.pebre.pk, 'action': 'increase'},
+                                             HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                self.assertEqual(respuesta.status_code, 409)
+                self.assertEqual(respuesta.json()['carrito']['total_items'], 0)
+                self.assertEqual(self.client.post(reverse('eliminar_item_carrito'), {'item_id': self.pebre.pk},
+                                                  HTTP_X_REQUESTED_WITH='XMLHttpRequest').status_code, 409)
+        self.client.cookies.clear()
+
+        # Sin sesión las vistas del carrito siguen exigiendo el token CSRF
+        sin_token = Client(enforce_csrf_checks=True)
+        self.assertEqual(self._agregar(self.empanada, cliente=sin_token).status_code, 403)
+        self.assertNotIn(COOKIE_CARRITO, sin_token.cookies)
+
+    @en_contexto_nuevo
+    def test_fusiona_al_iniciar_sesion(self):
+        agregar_producto(self.cliente, self.empanada.pk, 8)
+        for producto, cantidad in ((self.empanada, 5), (self.pebre, 1), (self.mote, 2)):
+            self.assertTrue(self._agregar(producto, cantidad).json()['ok'])
+        Producto.objects.filter(pk=self.mote.pk).update(activo=False)
+
+        respuesta = self.client.post(reverse('login'), {'username': 'cookie_cliente', 'password': 'Clave123'})
+
+        self.assertRedirects(respuesta, reverse('ver_carrito'), fetch_redirect_response=False)
+        self.assertEqual(self._en_base(self.cliente), {self.empanada.pk: 10, self.pebre.pk: 1})
+        self.assertEqual(respuesta.cookies[COOKIE_CARRITO]['max-age'], 0)
+        aviso = [str(mensaje) for mensaje in messages.get_messages(respuesta.wsgi_request)][-1]
+        self.assertIn('Empanada de Queso', aviso)
+        self.assertIn('Mote con Huesillo', aviso)
+
+    @en_contexto_nuevo
+    def test_fusiona_al_registrarse(self):
+        self.assertTrue(self._agregar(self.mote, 2).json()['ok'])
+        self.assertTrue(self._agregar(self.pebre, 2).json()['ok'])
+        Producto.objects.filter(pk=self.mote.pk).update(activo=False)
+
+        respuesta = self.client.post(reverse('registro'), {
+            'username': 'cookie_nuevo', 'email': 'nuevo@example.com', 'first_name': 'Nuevo', 'last_name': 'Cliente',
+            'password1': 'Clave12345', 'password2': 'Clave12345',
+        })
+
+        self.assertRedirects(respuesta, reverse('ver_carrito'), fetch_redirect_response=False)
+        self.assertEqual(self._en_base(Usuario.objects.get(username='cookie_nuevo')), {self.pebre.pk: 2})
+
+
+class ComandoContinuoTests(TestCase):
+    """Base de los comandos que corren una vez o en bucle (core/management/base.py)."""
+
+    def test_simular_y_continuo_son_excluyentes(self):
+        for comando in ('limpiar_carritos', 'limpiar_sesiones'):
+            with self.subTest(comando=comando):
+                with self.assertRaises(CommandError):
+                    call_command(comando, '--simular', '--continuo', stdout=io.StringIO())
+                with self.assertRaises(CommandError):
+                    call_command(comando, simular=True, continuo=True, stdout=io.StringIO())
+
+    @en_contexto_nuevo
+    def test_simular_no_repite(self):
+        salida = io.StringIO()
+        with mock.patch('core.management.base.time.sleep') as dormir:
+            call_command('limpiar_carritos', '--simular', stdout=salida)
+        dormir.assert_not_called()
+        self.assertIn('0 carrito(s)', salida.getvalue())
+
+    @en_contexto_nuevo
+    def test_continuo_repite_la_pasada(self):
+        with mock.patch('core.management.base.time.sleep', side_effect=[None, KeyboardInterrupt]) as dormir, \
+                mock.patch('core.management.commands.notificar_reclamos.notificar_reclamos', return_value=0) as notificar:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('notificar_reclamos', '--continuo', '--intervalo', '5', stdout=io.StringIO())
+        self.assertEqual(notificar.call_count, 2)
+        dormir.assert_called_with(5)
+
+        salida = io.StringIO()
+        with mock.patch('core.management.commands.notificar_reclamos.notificar_reclamos', return_value=0):
+            call_command('notificar_reclamos', stdout=salida)
+        self.assertIn('0 reclamo(s) notificados', salida.getvalue())
@@ -19,6 +19,9 @@ urlpatterns = [
     path('perfil/', views.perfil_view, name='perfil'),
     path('perfil/editar/', views.editar_perfil_view, name='editar_perfil'),
     path('mis-pedidos/', views.mis_pedidos_view, name='mis_pedidos'),
+    path('mis-pedidos/mas/', views.mis_pedidos_mas_view, name='mis_pedidos_mas'),
+    path('mis-pedidos/<int:pk>/repetir/', views.repetir_pedido_view, name='repetir_pedido'),
+    path('mis-pedidos/<int:pk>/reclamar/', views.reclamar_pedido_view, name='reclamar_pedido'),
     
     # Carrito de compras
     path('carrito/', views.ver_carrito_view, name='ver_carrito'),
@@ -34,16 +37,22 @@ urlpatterns = [
     path('panel/productos/crear/', views.admin_producto_crear, name='admin_producto_crear'),
     path('panel/productos/<int:pk>/editar/', views.admin_producto_editar, name='admin_producto_editar'),
     path('panel/productos/<int:pk>/desactivar/', views.admin_producto_desactivar, name='admin_producto_desactivar'),
+    path('panel/productos/importar/', views.admin_productos_importar, name='admin_productos_importar'),
+    path('panel/productos/exportar/', views.admin_productos_exportar, name='admin_productos_exportar'),
 
     # Gestión de Pedidos
     path('panel/pedidos/', views.admin_pedidos_lista_view, name='admin_pedidos_lista'),
     path('panel/pedidos/<int:pk>/', views.admin_pedido_detalle_view, name='admin_pedido_detalle'),
+    path('panel/pedidos/despachar/', views.admin_despachar_pedidos_view, name='admin_despachar_pedidos'),
+    path('panel/pedidos/exportar/', views.admin_exportar_ventas_view, name='admin_exportar_ventas'),
     
     # Punto de Venta (POS)
     path('panel/pos/', views.pos_view, name='pos_view'),
+    path('panel/pos/eventos/', views.eventos_stock_view, name='eventos_stock'),
     
     # Gestión de Reclamos
     path('panel/reclamos/', views.admin_reclamos_lista, name='admin_reclamos_lista'),
+    path('panel/reclamos/cola/', views.admin_reclamos_cola, name='admin_reclamos_cola'),
     path('panel/reclamos/<int:pk_reclamo>/', views.admin_reclamo_detalle, name='admin_reclamo_detalle'),
     
     # Gestión de Repartidores
@@ -6,13 +6,34 @@ from django.core.mail import send_mail
 from django.contrib import messages
 from django.db import models
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from .forms import ( 
     RegistroForm, LoginForm, PerfilForm, ProductoForm,
-    RecuperarPasswordForm, ResetPasswordForm
+    RecuperarPasswordForm, ResetPasswordForm, ReclamoClienteForm
 )
-from .models import Carrito, Producto, Usuario, Categoria, ItemCarrito, Pedido, Slide,MetodoPago, DetallePedido,Reclamo,Repartidor
+from .models import Producto, Usuario, Categoria, ItemCarrito, Pedido, Slide,MetodoPago, DetallePedido,Reclamo,Repartidor,PronosticoStock,PedidoArchivado
 from .forms import RepartidorForm
+from .db_router import using_replica
+from .despacho import motor as motor_despacho
+from .rutas import agrupar_pedidos
+from .inventario import registrar_movimiento
+from .historial import pagina_historial
+from .archivo import obtener_pedido
+from .busqueda import abuscar as abuscar_pedidos, filtro as filtro_busqueda
+from .reclamos import (
+    ReclamoRechazado, acontadores, apagina_cola, contadores as contadores_reclamos, crear_reclamo, pagina_cola,
+    reclamables,
+)
+from .promociones import anotar_precios, precios_efectivos, productos_en_oferta
+from .reportes import comprimir_gzip, filas as filas_reporte, generar_csv, generar_xlsx
+from .menu import COLUMNAS as COLUMNAS_MENU, exportar as exportar_menu, importar as importar_menu
+from .carrito import (
+    CarritoCookie, agregar_producto, cambiar_cantidad, datos_linea, fusionar_carrito, quitar_item, repetir_pedido,
+)
+from .carrito import totales as totales_carrito
+from .catalogo import aeventos_desde, cursor_eventos, invalidar_productos, productos_listado
+from .permisos import SIN_PERMISOS_ACCION, permiso_requerido
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -20,18 +41,15 @@ from django.utils.encoding import force_bytes, force_str
 from django.contrib.sites.shortcuts import get_current_site
 from django.utils import timezone
 from django.db.models import Sum    
-from datetime import timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 import json
 
 
 def home(request):
     slides = Slide.objects.filter(activo=True).order_by('orden')
-    # Obtener productos en promoción (máximo 6 para el carrusel)
-    productos_promocion = Producto.objects.filter(
-        activo=True,
-        en_promocion=True,
-        stock__gt=0
-    ).select_related('categoria').order_by('-fecha_actualizacion')[:6]
+    # Productos en promoción para el carrusel (en caché hasta que empiece o termine una promoción)
+    productos_promocion = productos_en_oferta()
 
     contexto = {
         'slides': slides,
@@ -40,6 +58,7 @@ def home(request):
     return render(request, 'core/home.html', contexto)
 
 
+@using_replica()
 def catalogo_productos_view(request):
     """Vista para que los clientes y visitantes vean el catálogo de productos (HU10)"""
     
@@ -55,13 +74,18 @@ def catalogo_productos_view(request):
     
     # Solo mostramos productos si hay algún filtro activo
     if busqueda or categoria_id or ver_todo:
-        productos = Producto.objects.filter(activo=True, stock__gt=0).select_related('categoria').order_by('nombre')
+        # Listado en caché: se invalida cuando un producto se agota o se edita
+        productos = productos_listado('catalogo')
         
         if busqueda:
-            productos = productos.filter(nombre__icontains=busqueda)
+            texto = busqueda.lower()
+            productos = [p for p in productos if texto in p.nombre.lower()]
         
         if categoria_id:
-            productos = productos.filter(categoria_id=categoria_id)
+            productos = [p for p in productos if str(p.categoria_id) == categoria_id]
+
+        # Precio con promoción, resuelto en memoria para toda la página
+        productos = anotar_precios(productos)
     
     contexto = {
         'productos': productos,
@@ -73,6 +97,18 @@ def catalogo_productos_view(request):
 
 # ========== AUTENTICACIÓN ==========
 
+def _fusionar_carrito_cookie(request, user, respuesta):
+    """Pasa el carrito que el visitante armó sin sesión a su Carrito y borra la cookie."""
+    carrito_cookie = CarritoCookie.desde(request)
+    if not carrito_cookie.cantidades:
+        return respuesta
+    reporte = fusionar_carrito(carrito_cookie, user)
+    incompletas = [linea.nombre for linea in reporte if linea.estado != 'ok']
+    if incompletas:
+        messages.warning(request, 'Agregamos tu carrito, pero no hay stock suficiente de: ' + ', '.join(incompletas) + '.')
+    respuesta = redirect('ver_carrito')
+    return carrito_cookie.guardar(respuesta)
+
 def registro_view(request):
     """Vista de registro de usuarios (HU05)"""
     if request.user.is_authenticated:
@@ -83,14 +119,13 @@ def registro_view(request):
         if form.is_valid():
             user = form.save()
             
-            # Crear carrito automáticamente para el nuevo usuario
-            Carrito.objects.create(usuario=user)
+            # El carrito se crea al agregar el primer producto (core/carrito.py)
             
             # Iniciar sesión automáticamente después del registro
             login(request, user)
             
             messages.success(request, f'¡Bienvenido {user.first_name}! Tu cuenta ha sido creada exitosamente.')
-            return redirect('home')
+            return _fusionar_carrito_cookie(request, user, redirect('home'))
         else:
             messages.error(request, 'Por favor corrige los errores en el formulario.')
     else:
@@ -121,7 +156,7 @@ def login_view(request):
                 elif user.rol == 'repartidor':
                     return redirect('repartidor_pedidos')
                 else:
-                    return redirect('home')
+                    return _fusionar_carrito_cookie(request, user, redirect('home'))
             else:
                 messages.error(request, 'Usuario o contraseña incorrectos.')
         else:
@@ -240,68 +275,166 @@ def editar_perfil_view(request):
 # ========== PEDIDOS DE USUARIO ==========
 
 @login_required
+@using_replica()
 def mis_pedidos_view(request):
     """Vista para que el usuario vea su historial de pedidos."""
-    pedidos = Pedido.objects.filter(cliente=request.user).prefetch_related('detalles', 'detalles__producto').order_by('-fecha_creacion')
+    # Una consulta por página sobre ResumenPedido (ver core/historial.py)
+    pedidos, siguiente = pagina_historial(request.user, cursor=request.GET.get('antes'))
     
     contexto = {
-        'pedidos': pedidos
+        'pedidos': reclamables(pedidos),
+        'siguiente': siguiente,
+        # Sin auto_id: el formulario se repite en cada pedido
+        'form_reclamo': ReclamoClienteForm(auto_id=False),
     }
     return render(request, 'core/mis_pedidos.html', contexto)
 
-# ========== CARRITO DE COMPRAS ==========
+@login_required
+@using_replica()
+def mis_pedidos_mas_view(request):
+    """Botón "Cargar más" del historial: devuelve la página siguiente como fragmento HTML en JSON."""
+    pedidos, siguiente = pagina_historial(request.user, cursor=request.GET.get('antes'))
+    html = render_to_string('core/includes/pedido_resumen.html', {
+        'pedidos': reclamables(pedidos),
+        'form_reclamo': ReclamoClienteForm(auto_id=False),
+    }, request=request)
+    return JsonResponse({'html': html, 'siguiente': siguiente})
+
+@login_required
+def repetir_pedido_view(request, pk):
+    """Copia las líneas de un pedido anterior al carrito, según el stock actual."""
+    if request.method != 'POST':
+        return redirect('mis_pedidos')
+    # También los pedidos archivados (core/archivo.py)
+    pedido = obtener_pedido(pk=pk, cliente=request.user)
+    if pedido is None:
+        raise Http404('Pedido no encontrado')
+    reporte = repetir_pedido(request.user, pedido)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'pedido': pedido.numero_pedido,
+            'lineas': [linea.como_dict() for linea in reporte],
+            'agregados': sum(linea.agregado for linea in reporte),
+        })
+
+    agregados = sum(linea.agregado for linea in reporte)
+    if agregados:
+        messages.success(request, f'Se agregaron {agregados} unidad(es) del pedido #{pedido.numero_pedido} a tu carrito.')
+    for linea in reporte:
+        if linea.estado == 'parcial':
+            messages.warning(request, f'"{linea.nombre}": solo se agregaron {linea.agregado} de {linea.solicitado} por stock.')
+        elif linea.estado == 'sin_stock':
+            messages.warning(request, f'"{linea.nombre}" no tiene stock disponible.')
+        elif linea.estado == 'no_disponible':
+            messages.error(request, f'"{linea.nombre}" ya no está disponible.')
+    return redirect('ver_carrito' if agregados else 'mis_pedidos')
 
 @login_required
+def reclamar_pedido_view(request, pk):
+    """El cliente presenta un reclamo sobre uno de sus pedidos (ver core/reclamos.py)."""
+    if request.method != 'POST':
+        return redirect('mis_pedidos')
+    form = ReclamoClienteForm(request.POST)
+    if not form.is_valid():
+        mensaje = ' '.join(error for errores in form.errors.values() for error in errores)
+        ok, estado_http = False, 400
+    else:
+        try:
+            reclamo = crear_reclamo(request.user, pk, form.cleaned_data['motivo'], form.cleaned_data['descripcion'])
+        except ReclamoRechazado as error:
+            mensaje, ok, estado_http = str(error), False, error.estado_http
+        else:
+            mensaje = f'Recibimos tu reclamo #{reclamo.pk}. Te responderemos a la brevedad.'
+            ok, estado_http = True, 201
+
+    if _es_ajax(request):
+        return JsonResponse({'ok': ok, 'mensaje': mensaje}, status=estado_http)
+    if ok:
+        messages.success(request, mensaje)
+    else:
+        messages.error(request, mensaje)
+    return redirect('mis_pedidos')
+
+# ========== CARRITO DE COMPRAS ==========
+# Los visitantes usan un carrito en cookie firmada (CarritoCookie) que se
+# fusiona con su Carrito al iniciar sesión o registrarse.
+
 def ver_carrito_view(request):
     """Vista para que el usuario vea su carrito de compras (HU11)"""
-    # El carrito se crea automáticamente al registrarse.
-    # Usamos un try-except como medida de seguridad por si algo fallara.
-    try:
-        carrito = request.user.carrito
-        items = carrito.items.all().select_related('producto')
-    except Carrito.DoesNotExist:
-        # Si el carrito no existe por alguna razón, lo creamos.
-        carrito = Carrito.objects.create(usuario=request.user)
-        items = []
-
+    if not request.user.is_authenticated:
+        carrito = CarritoCookie.desde(request)
+        items = carrito.lineas()
+        anotar_precios(item.producto for item in items)
+        contexto = {'items': items, 'totales': carrito.totales()}
+        return render(request, 'core/carrito.html', contexto)
+
+    items = list(ItemCarrito.objects.filter(carrito__usuario=request.user).select_related('producto'))
+    anotar_precios(item.producto for item in items)
     contexto = {
-        'carrito': carrito,
-        'items': items
+        'items': items,
+        'totales': totales_carrito(request.user),
     }
     return render(request, 'core/carrito.html', contexto)
 
-@login_required
+def _es_ajax(request):
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+def _respuesta_carrito(request, ok, mensaje, item_id=None, destino='ver_carrito', nivel=None, carrito_cookie=None):
+    """JSON con la línea y los totales para el carrito con JavaScript; mensaje y redirect sin él."""
+    if _es_ajax(request):
+        if carrito_cookie is not None:
+            linea = carrito_cookie.datos_linea(item_id) if item_id else None
+            totales = carrito_cookie.totales()
+        else:
+            linea = datos_linea(request.user, item_id) if item_id else None
+            totales = totales_carrito(request.user)
+        respuesta = JsonResponse({'ok': ok, 'mensaje': mensaje, 'linea': linea, 'carrito': totales},
+                                 status=200 if ok else 409)
+    else:
+        if mensaje:
+            (nivel or (messages.success if ok else messages.error))(request, mensaje)
+        respuesta = redirect(destino)
+    if carrito_cookie is not None:
+        carrito_cookie.guardar(respuesta)
+    return respuesta
+
+def _carrito_cookie(request):
+    """El carrito en cookie del visitante, o None si hay sesión iniciada."""
+    return None if request.user.is_authenticated else CarritoCookie.desde(request)
+
 def agregar_al_carrito_view(request):
 
     if request.method == 'POST':
         product_id = request.POST.get('product_id')
-        cantidad = int(request.POST.get('cantidad', 1))
-
-        producto = get_object_or_404(Producto, id=product_id)
-
-        # Validar que el producto esté activo y haya suficiente stock
-        if not producto.activo:
-            messages.error(request, f'El producto "{producto.nombre}" no está disponible actualmente.')
-            return redirect('catalogo_productos')
-        if producto.stock < cantidad:
-            messages.error(request, f'No hay suficiente stock de "{producto.nombre}". Solo quedan {producto.stock} unidades.')
+        try:
+            cantidad = int(request.POST.get('cantidad', 1))
+        except (TypeError, ValueError):
+            cantidad = 0
+        if cantidad < 1:
+            mensaje = 'La cantidad debe ser un número entero mayor o igual a 1.'
+            if _es_ajax(request):
+                return JsonResponse({'ok': False, 'mensaje': mensaje}, status=400)
+            messages.error(request, mensaje)
             return redirect('catalogo_productos')
+        carrito_cookie = _carrito_cookie(request)
 
-        carrito, created = Carrito.objects.get_or_create(usuario=request.user)
+        producto = get_object_or_404(Producto.objects.only('nombre', 'activo', 'stock'), id=product_id)
 
-        item_carrito, item_created = ItemCarrito.objects.get_or_create(
-            carrito=carrito,
-            producto=producto,
-            defaults={'cantidad': 0} # Inicializamos en 0 si es nuevo para sumar correctamente
-        )
-        item_carrito.cantidad += cantidad
-        item_carrito.save()
+        # Validar que el producto esté activo
+        if not producto.activo:
+            return _respuesta_carrito(request, False, f'El producto "{producto.nombre}" no está disponible actualmente.', destino='catalogo_productos')
 
-        messages.success(request, f'"{producto.nombre}" ha sido agregado al carrito. Cantidad actual: {item_carrito.cantidad}.')
-        return redirect('catalogo_productos')
+        # Suma atómica condicionada al stock (ver core/carrito.py)
+        if carrito_cookie is not None:
+            item_id = carrito_cookie.agregar_producto(producto.pk, cantidad)
+        else:
+            item_id = agregar_producto(request.user, producto.pk, cantidad)
+        if item_id is None:
+            return _respuesta_carrito(request, False, f'No hay suficiente stock de "{producto.nombre}".', destino='catalogo_productos', carrito_cookie=carrito_cookie)
+        return _respuesta_carrito(request, True, f'"{producto.nombre}" ha sido agregado al carrito.', item_id, destino='catalogo_productos', carrito_cookie=carrito_cookie)
     return redirect('catalogo_productos') # Redirigir si no es POST
 
-@login_required
 def actualizar_cantidad_carrito_view(request):
     """
     Vista para aumentar o disminuir la cantidad de un item en el carrito.
@@ -309,56 +442,43 @@ def actualizar_cantidad_carrito_view(request):
     if request.method == 'POST':
         item_id = request.POST.get('item_id')
         action = request.POST.get('action')
-        
-        item = get_object_or_404(ItemCarrito, id=item_id)
-        
-        # Seguridad: Verificar que el item pertenece al carrito del usuario actual
-        if item.carrito.usuario != request.user:
-            messages.error(request, "Acción no permitida.")
-            return redirect('ver_carrito')
-
-        if action == 'increase':
-            # Validar stock antes de aumentar
-            if item.producto.stock > item.cantidad:
-                item.cantidad += 1
-                item.save()
-            else:
-                messages.warning(request, f'No hay más stock disponible para "{item.producto.nombre}".')
-        elif action == 'decrease':
-            item.cantidad -= 1
-            if item.cantidad > 0:
-                item.save()
-            else:
-                # Si la cantidad llega a 0, eliminamos el item
-                item.delete()
-                messages.info(request, f'"{item.producto.nombre}" ha sido eliminado del carrito.')
+        carrito_cookie = _carrito_cookie(request)
+        delta = 1 if action == 'increase' else -1
+
+        # Cada cambio es un UPDATE filtrado por el carrito del usuario: un item ajeno no coincide
+        if carrito_cookie is not None:
+            resultado = carrito_cookie.cambiar_cantidad(item_id, delta)
+        else:
+            resultado = cambiar_cantidad(request.user, item_id, delta)
+        if resultado == 'ok':
+            return _respuesta_carrito(request, True, '', item_id, carrito_cookie=carrito_cookie)
+        if resultado == 'sin_stock':
+            return _respuesta_carrito(request, False, 'No hay más stock disponible para este producto.', item_id, nivel=messages.warning, carrito_cookie=carrito_cookie)
+        if resultado == 'eliminado':
+            return _respuesta_carrito(request, True, 'El producto ha sido eliminado del carrito.', nivel=messages.info, carrito_cookie=carrito_cookie)
+        return _respuesta_carrito(request, False, 'Acción no permitida.', carrito_cookie=carrito_cookie)
     
     return redirect('ver_carrito')
 
-@login_required
 def eliminar_item_carrito_view(request):
     """Vista para eliminar un item completo del carrito."""
     if request.method == 'POST':
+        carrito_cookie = _carrito_cookie(request)
         item_id = request.POST.get('item_id')
-        item = get_object_or_404(ItemCarrito, id=item_id)
-
-        if item.carrito.usuario == request.user:
-            nombre_producto = item.producto.nombre
-            item.delete()
-            messages.success(request, f'"{nombre_producto}" ha sido eliminado de tu carrito.')
+        if carrito_cookie is not None:
+            eliminado = carrito_cookie.quitar_item(item_id)
         else:
-            messages.error(request, "Acción no permitida.")
+            eliminado = quitar_item(request.user, item_id)
+        if eliminado:
+            return _respuesta_carrito(request, True, 'El producto ha sido eliminado de tu carrito.', carrito_cookie=carrito_cookie)
+        return _respuesta_carrito(request, False, 'Acción no permitida.', carrito_cookie=carrito_cookie)
     return redirect('ver_carrito')
 
 # ========== DASHBOARD (ADMIN) ==========
 
-@login_required
+@permiso_requerido('panel')
 def admin_dashboard_view(request):
     """Muestra el panel principal del administrador con estadísticas clave."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
-        return redirect('home')
-
     # --- Manejo de Creación de Categoría desde el Modal ---
     if request.method == 'POST' and request.POST.get('action') == 'crear_categoria':
         nombre = request.POST.get('nombre', '').strip()
@@ -380,91 +500,99 @@ def admin_dashboard_view(request):
         
         return redirect('admin_dashboard')
 
-    # --- Cálculos para las Tarjetas KPI ---
-    today = timezone.now().date()
+    # Las estadísticas son de solo lectura: se calculan en la réplica si existe
+    with using_replica():
+        # --- Cálculos para las Tarjetas KPI ---
+        today = timezone.now().date()
 
-    # 1. Ventas de Hoy
-    ventas_hoy = Pedido.objects.filter(
-        fecha_creacion__date=today,
-        estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
-    ).aggregate(total_ventas=Sum('total'))['total_ventas'] or 0
+        # 1. Ventas de Hoy
+        ventas_hoy = Pedido.objects.filter(
+            fecha_creacion__date=today,
+            estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
+        ).aggregate(total_ventas=Sum('total'))['total_ventas'] or 0
 
-    # 2. Pedidos de Hoy
-    pedidos_hoy = Pedido.objects.filter(fecha_creacion__date=today).count()
+        # 2. Pedidos de Hoy
+        pedidos_hoy = Pedido.objects.filter(fecha_creacion__date=today).count()
 
-    # 3. Clientes Totales
-    total_clientes = Usuario.objects.filter(rol='cliente').count()
+        # 3. Clientes Totales
+        total_clientes = Usuario.objects.filter(rol='cliente').count()
 
-    # 4. Productos Activos
-    total_productos_activos = Producto.objects.filter(activo=True).count()
+        # 4. Productos Activos
+        total_productos_activos = Producto.objects.filter(activo=True).count()
 
-    # 5. Pedidos pendientes para la lista
-    pedidos_recientes = Pedido.objects.filter(
-        estado__in=['confirmado', 'en_preparacion']
-    ).order_by('-fecha_creacion')[:5] # Los 5 más recientes
+        # 5. Pedidos pendientes para la lista
+        pedidos_recientes = Pedido.objects.filter(
+            estado__in=['confirmado', 'en_preparacion']
+        ).order_by('-fecha_creacion')[:5] # Los 5 más recientes
 
-    # --- Cálculo para el Gráfico "Ventas de la Semana" ---
-    # Diccionario para traducir días al español
-    dias_espanol = {
-        'Mon': 'Lun', 'Tue': 'Mar', 'Wed': 'Mié', 
-        'Thu': 'Jue', 'Fri': 'Vie', 'Sat': 'Sáb', 'Sun': 'Dom'
-    }
-    
-    dias = []
-    ventas_por_dia = []
-    for i in range(7):
-        dia = today - timedelta(days=i)
-        dia_ingles = dia.strftime('%a')  # Obtiene día en inglés (Mon, Tue, etc.)
-        dia_espanol = dias_espanol.get(dia_ingles, dia_ingles)  # Traduce al español
-        dias.append(dia_espanol)
-        ventas_dia = Pedido.objects.filter(
-            fecha_creacion__date=dia,
-            estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
-        ).aggregate(total=Sum('total'))['total'] or 0
-        ventas_por_dia.append(float(ventas_dia))
-    dias.reverse()
-    ventas_por_dia.reverse()
-
-    detalles_hoy = DetallePedido.objects.filter(
-        pedido__fecha_creacion__date=today,
-        pedido__estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
-    )
-    productos_populares_hoy = detalles_hoy.values('producto__nombre') \
-                                          .annotate(cantidad_vendida=Sum('cantidad')) \
-                                          .order_by('-cantidad_vendida')[:5]
-    productos_bajo_stock = Producto.objects.filter(
-        activo=True,
-        stock__lte=10
-    ).select_related('categoria').order_by('stock', 'nombre')[:10]  # Los 10 con menos stock
+        # --- Cálculo para el Gráfico "Ventas de la Semana" ---
+        # Diccionario para traducir días al español
+        dias_espanol = {
+            'Mon': 'Lun', 'Tue': 'Mar', 'Wed': 'Mié', 
+            'Thu': 'Jue', 'Fri': 'Vie', 'Sat': 'Sáb', 'Sun': 'Dom'
+        }
 
-    contexto = {
-        'ventas_hoy': ventas_hoy,
-        'pedidos_hoy': pedidos_hoy,
-        'total_clientes': total_clientes,
-        'total_productos_activos': total_productos_activos,
-        'pedidos_recientes': pedidos_recientes,
-        'titulo': 'Dashboard',
-        # Datos para gráfico de ventas
-        'chart_labels': json.dumps(dias),
-        'chart_data': json.dumps(ventas_por_dia),
-        # --- NUEVA VARIABLE AÑADIDA ---
-        'productos_populares': productos_populares_hoy,
-        'productos_bajo_stock': productos_bajo_stock,  # Nueva variable
-    }
+        dias = []
+        ventas_por_dia = []
+        for i in range(7):
+            dia = today - timedelta(days=i)
+            dia_ingles = dia.strftime('%a')  # Obtiene día en inglés (Mon, Tue, etc.)
+            dia_espanol = dias_espanol.get(dia_ingles, dia_ingles)  # Traduce al español
+            dias.append(dia_espanol)
+            ventas_dia = Pedido.objects.filter(
+                fecha_creacion__date=dia,
+                estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
+            ).aggregate(total=Sum('total'))['total'] or 0
+            ventas_por_dia.append(float(ventas_dia))
+        dias.reverse()
+        ventas_por_dia.reverse()
+
+        detalles_hoy = DetallePedido.objects.filter(
+            pedido__fecha_creacion__date=today,
+            pedido__estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino', 'entregado']
+        )
+        productos_populares_hoy = detalles_hoy.values('producto__nombre') \
+                                              .annotate(cantidad_vendida=Sum('cantidad')) \
+                                              .order_by('-cantidad_vendida')[:5]
+        # Productos que se agotarán antes de la próxima reposición (los calcula pronosticar_stock)
+        productos_bajo_stock = list(
+            PronosticoStock.objects.filter(en_riesgo=True, producto__activo=True)
+            .select_related('producto__categoria')
+            .order_by('agotamiento')[:10]
+        )
+        if not productos_bajo_stock and not PronosticoStock.objects.exists():
+            # Aún no se ha calculado ningún pronóstico: los 10 con menos stock
+            productos_bajo_stock = [
+                PronosticoStock(producto=producto, stock=producto.stock)
+                for producto in Producto.objects.filter(activo=True, stock__lte=10)
+                .select_related('categoria').order_by('stock', 'nombre')[:10]
+            ]
 
-    return render(request, 'core/admin/dashboard.html', contexto)
+        contexto = {
+            'ventas_hoy': ventas_hoy,
+            'pedidos_hoy': pedidos_hoy,
+            'total_clientes': total_clientes,
+            'total_productos_activos': total_productos_activos,
+            'pedidos_recientes': pedidos_recientes,
+            'titulo': 'Dashboard',
+            # Datos para gráfico de ventas
+            'chart_labels': json.dumps(dias),
+            'chart_data': json.dumps(ventas_por_dia),
+            # --- NUEVA VARIABLE AÑADIDA ---
+            'productos_populares': productos_populares_hoy,
+            'productos_bajo_stock': productos_bajo_stock,  # Nueva variable
+        }
+
+        # Los querysets se evalúan al renderizar, por eso el render queda dentro del bloque
+        return render(request, 'core/admin/dashboard.html', contexto)
 
 
 
 # ========== GESTIÓN DE PRODUCTOS (ADMIN) ==========
 
-@login_required
+@permiso_requerido('panel')
 def admin_productos_lista(request):
     """Listar todos los productos (HU01) y mostrar estadísticas."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
-        return redirect('home')
-    
     # Obtenemos la base de productos (todos)
     productos_base = Producto.objects.all().select_related('categoria')
     
@@ -533,15 +661,11 @@ def admin_productos_lista(request):
 
 # --- CRUD de Productos ---
 
-@login_required
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
 def admin_producto_crear(request):
     """Crear nuevo producto (HU02)"""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para realizar esta acción.')
-        return redirect('home')
-    
     if request.method == 'POST':
-        form = ProductoForm(request.POST, request.FILES)
+        form = ProductoForm(request.POST, request.FILES, usuario=request.user)
         if form.is_valid():
             producto = form.save()
             messages.success(request, f'El producto "{producto.nombre}" ha sido creado exitosamente.')
@@ -559,17 +683,13 @@ def admin_producto_crear(request):
     }
     return render(request, 'core/admin/producto_form.html', contexto) # Usa la plantilla correcta
 
-@login_required
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
 def admin_producto_editar(request, pk):
     """Editar un producto existente (HU03)"""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para realizar esta acción.')
-        return redirect('home')
-    
     producto = get_object_or_404(Producto, pk=pk)
     
     if request.method == 'POST':
-        form = ProductoForm(request.POST, request.FILES, instance=producto)
+        form = ProductoForm(request.POST, request.FILES, instance=producto, usuario=request.user)
         if form.is_valid():
             form.save()
             messages.success(request, f'El producto "{producto.nombre}" ha sido actualizado exitosamente.')
@@ -587,13 +707,9 @@ def admin_producto_editar(request, pk):
     }
     return render(request, 'core/admin/producto_form.html', contexto)
 
-@login_required
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
 def admin_producto_desactivar(request, pk):
     """Activa o Desactiva un producto (HU04)""" # Texto actualizado
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para realizar esta acción.')
-        return redirect('home')
-        
     if request.method == 'POST':
         producto = get_object_or_404(Producto, pk=pk)
         producto.activo = not producto.activo # Alterna el estado
@@ -605,26 +721,50 @@ def admin_producto_desactivar(request, pk):
     # Redirigimos de vuelta a la lista (mejor que al home)
     return redirect('admin_productos_lista')
 
+# --- Importación y exportación masiva (ver core/menu.py) ---
+
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
+def admin_productos_importar(request):
+    """Carga un menú completo o un cambio de precios desde CSV/JSON, con vista previa."""
+    resultado = None
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            messages.error(request, 'Selecciona un archivo CSV o JSON.')
+        else:
+            formato = 'json' if archivo.name.lower().endswith(('.json', '.jsonl')) else 'csv'
+            resultado = importar_menu(archivo.file, formato, usuario=request.user, simular=bool(request.POST.get('simular')))
+            if not resultado.simulado and resultado.procesados:
+                messages.success(request, f'Importación lista: {resultado.creados} creados, {resultado.actualizados} actualizados.')
+
+    return render(request, 'core/admin/productos_importar.html', {
+        'resultado': resultado,
+        'columnas': COLUMNAS_MENU,
+        'titulo': 'Importar Productos',
+    })
+
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
+def admin_productos_exportar(request):
+    """Descarga el menú completo en CSV o JSON Lines, generado en streaming."""
+    formato = 'json' if request.GET.get('formato') == 'json' else 'csv'
+    tipo = 'application/x-ndjson' if formato == 'json' else 'text/csv'
+    respuesta = StreamingHttpResponse(exportar_menu(formato), content_type=f'{tipo}; charset=utf-8')
+    extension = 'jsonl' if formato == 'json' else 'csv'
+    respuesta['Content-Disposition'] = f'attachment; filename="productos.{extension}"'
+    return respuesta
+
 # ========== GESTIÓN DE PEDIDOS (ADMIN) ==========
 
-@login_required
+@permiso_requerido('panel')
 def admin_pedidos_lista_view(request):
     """Vista para que el admin vea y filtre todos los pedidos."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
-        return redirect('home')
-
     pedidos = Pedido.objects.all().select_related('cliente').order_by('-fecha_creacion')
 
     # Búsqueda
     busqueda = request.GET.get('q', '')
     if busqueda:
-        pedidos = pedidos.filter(
-            models.Q(numero_pedido__icontains=busqueda) |
-            models.Q(cliente__username__icontains=busqueda) |
-            models.Q(cliente__first_name__icontains=busqueda) |
-            models.Q(cliente__last_name__icontains=busqueda)
-        )
+        # Índice de términos (core/busqueda.py) en vez de icontains sobre pedidos y clientes
+        pedidos = pedidos.filter(filtro_busqueda(busqueda))
 
     # Filtro por estado
     estado_filtro = request.GET.get('estado', '')
@@ -637,15 +777,49 @@ def admin_pedidos_lista_view(request):
         'estado_seleccionado': estado_filtro,
         'estados_posibles': Pedido.ESTADO_CHOICES,
     }
+    contexto['exportar_desde'] = timezone.localdate().replace(day=1)
+    contexto['exportar_hasta'] = timezone.localdate()
     return render(request, 'core/admin/pedidos_lista.html', contexto)
 
-@login_required
-def admin_pedido_detalle_view(request, pk): # Renombramos pk a pk_pedido para claridad
-    """Vista para que el admin vea el detalle de un pedido, cambie su estado Y ASIGNE REPARTIDOR.""" # Docstring actualizado
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
+@permiso_requerido('panel')
+def admin_exportar_ventas_view(request):
+    """Descarga pedidos o detalles de un rango de fechas en CSV (opcionalmente gzip) o XLSX, en streaming."""
+    try:
+        desde = date.fromisoformat(request.GET.get('desde', ''))
+        hasta = date.fromisoformat(request.GET.get('hasta', ''))
+    except ValueError:
+        messages.error(request, 'Indica un rango de fechas válido para exportar.')
+        return redirect('admin_pedidos_lista')
+    if hasta < desde:
+        messages.error(request, 'La fecha final no puede ser anterior a la inicial.')
         return redirect('admin_pedidos_lista')
 
+    datos = 'detalles' if request.GET.get('datos') == 'detalles' else 'pedidos'
+    formato = 'xlsx' if request.GET.get('formato') == 'xlsx' else 'csv'
+    # Rango en hora local, con el día final completo
+    inicio = timezone.make_aware(datetime.combine(desde, datetime.min.time()))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+    filas = filas_reporte(datos, inicio, fin)
+    nombre = f'{datos}_{desde:%Y%m%d}_{hasta:%Y%m%d}'
+
+    if formato == 'xlsx':
+        respuesta = StreamingHttpResponse(
+            generar_xlsx(datos, filas, hoja=datos.capitalize()),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        nombre += '.xlsx'
+    elif request.GET.get('gzip'):
+        respuesta = StreamingHttpResponse(comprimir_gzip(generar_csv(datos, filas)), content_type='application/gzip')
+        nombre += '.csv.gz'
+    else:
+        respuesta = StreamingHttpResponse(generar_csv(datos, filas), content_type='text/csv; charset=utf-8')
+        nombre += '.csv'
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+@permiso_requerido('panel')
+def admin_pedido_detalle_view(request, pk): # Renombramos pk a pk_pedido para claridad
+    """Vista para que el admin vea el detalle de un pedido, cambie su estado Y ASIGNE REPARTIDOR.""" # Docstring actualizado
     pedido = get_object_or_404(Pedido.objects.select_related('cliente', 'metodo_pago', 'repartidor__usuario') # Incluimos repartidor__usuario
                                            .prefetch_related('detalles', 'detalles__producto'), pk=pk) # Renombrado pk_pedido
 
@@ -663,7 +837,11 @@ def admin_pedido_detalle_view(request, pk): # Renombramos pk a pk_pedido para cl
                      pedido.fecha_confirmacion = timezone.now()
                 elif nuevo_estado == 'en_preparacion' and not pedido.fecha_preparacion:
                      pedido.fecha_preparacion = timezone.now()
-                # ... (añadir lógica similar para otros estados si es necesario) ...
+                elif nuevo_estado == 'listo' and not pedido.fecha_listo:
+                     # Al quedar listo, el motor de despacho asigna repartidor (core/despacho.py)
+                     pedido.fecha_listo = timezone.now()
+                elif nuevo_estado == 'entregado' and not pedido.fecha_entrega:
+                     pedido.fecha_entrega = timezone.now()
                 pedido.save()
                 messages.success(request, f'Estado del pedido #{pedido.numero_pedido} actualizado a "{pedido.get_estado_display()}".')
             else:
@@ -687,6 +865,15 @@ def admin_pedido_detalle_view(request, pk): # Renombramos pk a pk_pedido para cl
                  pedido.save()
                  messages.info(request, f'Repartidor desasignado del pedido #{pedido.numero_pedido}.')
 
+        elif action == 'asignar_automatico':
+            if pedido.tipo_orden != 'delivery' or pedido.estado != 'listo' or pedido.repartidor_id:
+                messages.error(request, 'Solo se asignan automáticamente pedidos delivery listos y sin repartidor.')
+            elif motor_despacho.asignar_pedido(pedido.pk):
+                pedido.refresh_from_db(fields=['repartidor'])
+                messages.success(request, f'Repartidor "{pedido.repartidor.usuario.username}" asignado automáticamente al pedido #{pedido.numero_pedido}.')
+            else:
+                messages.warning(request, 'No hay repartidores disponibles con capacidad en este momento.')
+
         # Redirigir siempre a la misma página de detalle después de una acción POST
         return redirect('admin_pedido_detalle', pk=pedido.pk) # Renombrado pk_pedido
 
@@ -703,16 +890,26 @@ def admin_pedido_detalle_view(request, pk): # Renombramos pk a pk_pedido para cl
         }
         return render(request, 'core/admin/pedido_detalle.html', contexto)
 
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
+def admin_despachar_pedidos_view(request):
+    """Asigna en lote todos los pedidos delivery listos que no tienen repartidor."""
+    if request.method == 'POST':
+        asignaciones = motor_despacho.asignar_pendientes()
+        pendientes = Pedido.objects.filter(tipo_orden='delivery', estado='listo', repartidor__isnull=True).count()
+        if asignaciones:
+            messages.success(request, f'{len(asignaciones)} pedido(s) asignados automáticamente.')
+        if pendientes:
+            messages.warning(request, f'{pendientes} pedido(s) listos siguen sin repartidor (no hay capacidad disponible).')
+        elif not asignaciones:
+            messages.info(request, 'No hay pedidos listos pendientes de asignar.')
+    return redirect('admin_pedidos_lista')
+
 # ========== PUNTO DE VENTA (POS - HU24, HU25) ==========
 
-@login_required
+@permiso_requerido('pos', mensaje='No tienes permisos para acceder al POS.')
 def pos_view(request):
     """Muestra la interfaz del Punto de Venta y procesa ventas locales."""
     # Solo Cajero o Administrador pueden acceder
-    if request.user.rol not in ['cajero', 'administrador']:
-        messages.error(request, 'No tienes permisos para acceder al POS.')
-        return redirect('home')
-
     if request.method == 'POST':
         # --- Procesar la Venta ---
         try:
@@ -748,6 +945,18 @@ def pos_view(request):
                     usuario_generico = request.user
                 # --- Fin Obtener Usuario ---
 
+                # Precio efectivo (con promociones vigentes), igual que en el carrito en línea;
+                # el total se calcula aquí y no se toma del navegador
+                productos = Producto.objects.in_bulk([item_data['id'] for item_data in items])
+                lineas = []
+                for item_data in items:
+                    producto = productos.get(int(item_data['id']))
+                    if producto is None:
+                        raise Producto.DoesNotExist
+                    lineas.append((producto, int(item_data['cantidad'])))
+                precios = precios_efectivos((p.pk, p.categoria_id, p.precio) for p, _ in lineas)
+                total_venta = sum((precios[p.pk][0] * cantidad for p, cantidad in lineas), Decimal(0))
+
                 # Crear el objeto Pedido en la base de datos
                 nuevo_pedido = Pedido.objects.create(
                     cliente=usuario_generico,                 # <-- USA USUARIO GENÉRICO
@@ -755,28 +964,29 @@ def pos_view(request):
                     metodo_pago=metodo_pago_obj,
                     tipo_orden='local',                       # Tipo de orden para POS
                     estado='en_preparacion',                  # <-- ESTADO INICIAL CORRECTO
-                    subtotal=total_venta,                     # Asume que el total JS es el subtotal
+                    subtotal=total_venta,
                     costo_envio=0,                            # Sin costo de envío para POS
                     total=total_venta,                        # Total igual a subtotal
                 )
 
                 # Crear los Detalles del Pedido y descontar stock para cada item
-                for item_data in items:
-                    producto = Producto.objects.select_for_update().get(pk=item_data['id'])
-                    cantidad = int(item_data['cantidad'])
-
-                    if producto.stock < cantidad:
-                        raise ValueError(f"Stock insuficiente para {producto.nombre}")
-
-                    DetallePedido.objects.create(
+                detalles = []
+                for producto, cantidad in lineas:
+                    precio = precios[producto.pk][0]
+                    detalles.append(DetallePedido(
                         pedido=nuevo_pedido,
                         producto=producto,
                         cantidad=cantidad,
-                        precio_unitario=producto.precio,
-                    )
-                    producto.stock -= cantidad
-                    producto.save()
-
+                        precio_unitario=precio,
+                        subtotal=precio * cantidad,
+                    ))
+                    # Descuento atómico en el libro de stock (StockInsuficiente es un ValueError)
+                    registrar_movimiento(producto, -cantidad, 'venta', pedido=nuevo_pedido, usuario=request.user)
+                # Un solo INSERT; el resumen del historial se escribe al confirmar el pedido
+                DetallePedido.objects.bulk_create(detalles)
+
+            # El POS muestra cantidades: tras una venta se recarga con el stock actual
+            invalidar_productos('pos')
             messages.success(request, f'Venta #{nuevo_pedido.numero_pedido} registrada exitosamente.')
             return redirect('pos_view') # Redirige de vuelta al POS
 
@@ -798,51 +1008,83 @@ def pos_view(request):
     else:
         # Cambiado: Mostrar todos los productos activos, sin importar el stock
         # El stock se validará al agregar al carrito
-        productos_pos = Producto.objects.filter(activo=True).select_related('categoria').order_by('categoria__nombre', 'nombre')
-        categorias_pos = Categoria.objects.filter(activo=True, productos__in=productos_pos).distinct().order_by('nombre')
+        productos_pos = anotar_precios(productos_listado('pos'))
+        categorias_pos = sorted(
+            {p.categoria.pk: p.categoria for p in productos_pos if p.categoria and p.categoria.activo}.values(),
+            key=lambda categoria: categoria.nombre,
+        )
 
         contexto = {
             'productos_pos': productos_pos,
             'categorias_pos': categorias_pos,
+            'cursor_eventos': cursor_eventos(),
             'titulo': 'Punto de Venta (POS)'
         }
         # Asegúrate que el nombre de la plantilla sea correcto ('pos.html' o 'pos_view.html')
         return render(request, 'core/admin/pos.html', contexto)
     
-# ========== GESTIÓN DE RECLAMOS (ADMIN - HU21, HU22) ==========
+@permiso_requerido('eventos_stock', json=True)
+async def eventos_stock_view(request):
+    """
+    Feed JSON de productos agotados/repuestos para el POS y la cocina (se lee
+    desde la caché). Asíncrona, como las demás vistas JSON de consulta: bajo
+    ASGI no ocupa un hilo mientras espera a la caché o a la base de datos.
+    """
+    try:
+        ultimo = int(request.GET.get('desde', 0))
+    except ValueError:
+        ultimo = 0
+    eventos, cursor = await aeventos_desde(ultimo)
+    return JsonResponse({'cursor': cursor, 'eventos': eventos})
 
-@login_required
-def admin_reclamos_lista(request):
-    """Muestra una lista de todos los reclamos de clientes."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
-        return redirect('admin_dashboard') # O 'home'
+# ========== GESTIÓN DE RECLAMOS (ADMIN - HU21, HU22) ==========
 
-    # Obtenemos todos los reclamos, con info del cliente y pedido asociado
-    # Ordenamos por fecha (más nuevos primero) y luego por estado (nuevos primero)
-    reclamos = Reclamo.objects.select_related('cliente', 'pedido').order_by('estado', '-fecha_creacion')
+def _estado_cola(request):
+    """Filtro de la cola: '' son los abiertos (el más urgente primero) y 'todos' incluye los cerrados."""
+    estado = request.GET.get('estado', '')
+    return estado if estado in [valor for valor, _ in Reclamo.ESTADO_CHOICES] + ['todos'] else ''
 
-    # --- Opcional: Filtro por Estado ---
-    estado_filtro = request.GET.get('estado', '') # Obtiene el parámetro 'estado' de la URL
-    if estado_filtro:
-        reclamos = reclamos.filter(estado=estado_filtro)
-    # --- Fin Filtro ---
+@permiso_requerido('panel')
+def admin_reclamos_lista(request):
+    """Cola de reclamos: los abiertos por plazo de atención (ver core/reclamos.py), paginados por cursor."""
+    estado_filtro = _estado_cola(request)
+    reclamos, siguiente = pagina_cola(estado_filtro, cursor=request.GET.get('desde'))
 
+    contadores = contadores_reclamos()
     contexto = {
         'reclamos': reclamos,
-        'estados_posibles': Reclamo.ESTADO_CHOICES, # Pasa las opciones de estado para el filtro
+        'siguiente': siguiente,
+        'contadores': contadores,
+        # Opciones del filtro con la cantidad de reclamos de cada estado
+        'estados_posibles': [(valor, nombre, contadores[valor]) for valor, nombre in Reclamo.ESTADO_CHOICES],
         'estado_seleccionado': estado_filtro,       # Pasa el estado actual seleccionado
         'titulo': 'Gestión de Reclamos'
     }
     return render(request, 'core/admin/reclamos_lista.html', contexto) # Nueva plantilla
 
-@login_required
+@permiso_requerido('panel', json=True)
+async def admin_reclamos_cola(request):
+    """La misma cola de reclamos en JSON (para refrescar la lista o integraciones). Asíncrona."""
+    estado_filtro = _estado_cola(request)
+    reclamos, siguiente = await apagina_cola(estado_filtro, cursor=request.GET.get('desde'))
+    return JsonResponse({
+        'reclamos': [{
+            'id': reclamo.pk,
+            'cliente': reclamo.cliente.username,
+            'pedido': reclamo.pedido.numero_pedido,
+            'motivo': reclamo.motivo,
+            'estado': reclamo.estado,
+            'fecha_creacion': reclamo.fecha_creacion.isoformat(),
+            'limite_atencion': reclamo.limite_atencion.isoformat() if reclamo.limite_atencion else None,
+            'vencido': reclamo.vencido,
+        } for reclamo in reclamos],
+        'siguiente': siguiente,
+        'contadores': await acontadores(),
+    })
+
+@permiso_requerido('panel')
 def admin_reclamo_detalle(request, pk_reclamo):
     """Muestra el detalle de un reclamo y permite actualizar estado/respuesta."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
-        return redirect('admin_reclamos_lista') # Vuelve a la lista de reclamos
-
     # Obtenemos el reclamo específico o error 404
     reclamo = get_object_or_404(Reclamo.objects.select_related('cliente', 'pedido', 'atendido_por'), pk=pk_reclamo)
 
@@ -876,13 +1118,9 @@ def admin_reclamo_detalle(request, pk_reclamo):
 
 # ========== GESTIÓN DE REPARTIDORES (ADMIN) ==========
 
-@login_required
+@permiso_requerido('panel')
 def admin_repartidores_lista(request):
     """Muestra la lista de todos los repartidores registrados."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para acceder aquí.')
-        return redirect('admin_dashboard') 
-
     # Obtenemos todos los repartidores, incluyendo la info del usuario asociado
     repartidores = Repartidor.objects.all().select_related('usuario').order_by('usuario__username')
 
@@ -892,13 +1130,9 @@ def admin_repartidores_lista(request):
     }
     return render(request, 'core/admin/repartidores_lista.html', contexto) # Nueva plantilla
 
-@login_required
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
 def admin_repartidor_crear(request):
     """Muestra y procesa el formulario para crear un nuevo repartidor."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para realizar esta acción.')
-        return redirect('admin_repartidores_lista')
-
     if request.method == 'POST':
         # Usaremos un formulario específico para Repartidor
         form = RepartidorForm(request.POST)
@@ -938,13 +1172,9 @@ def admin_repartidor_crear(request):
     }
     return render(request, 'core/admin/repartidor_form.html', contexto) # Nueva plantilla
 
-@login_required
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
 def admin_repartidor_editar(request, pk_usuario): # Usamos el PK del Usuario
     """Muestra y procesa el formulario para editar un repartidor existente."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para realizar esta acción.')
-        return redirect('admin_repartidores_lista')
-
     # Obtenemos el Usuario (que debe tener rol repartidor)
     usuario_repartidor = get_object_or_404(Usuario, pk=pk_usuario, rol='repartidor')
     # Obtenemos el perfil Repartidor asociado (puede que no exista si hubo error antes)
@@ -998,13 +1228,9 @@ def admin_repartidor_editar(request, pk_usuario): # Usamos el PK del Usuario
     }
     return render(request, 'core/admin/repartidor_form.html', contexto)
 
-@login_required
+@permiso_requerido('panel', mensaje=SIN_PERMISOS_ACCION)
 def admin_repartidor_toggle_disponible(request, pk_usuario): # Usamos PK del Usuario
     """Cambia el estado 'disponible' de un repartidor."""
-    if request.user.rol != 'administrador':
-        messages.error(request, 'No tienes permisos para realizar esta acción.')
-        return redirect('admin_repartidores_lista')
-
     if request.method == 'POST':
         usuario_repartidor = get_object_or_404(Usuario, pk=pk_usuario, rol='repartidor')
         repartidor_perfil = Repartidor.objects.filter(usuario=usuario_repartidor).first()
@@ -1021,49 +1247,37 @@ def admin_repartidor_toggle_disponible(request, pk_usuario): # Usamos PK del Usu
 
 # ========== BÚSQUEDA DE PEDIDO (AJAX) ==========
 
-@login_required
-def buscar_pedido_view(request):
-    """Busca un pedido por número de pedido o ID y devuelve su ID en JSON."""
-    if request.user.rol != 'administrador':
-        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
-    
-    query = request.GET.get('q', '').strip()
+@permiso_requerido('panel', json=True)
+async def buscar_pedido_view(request):
+    """
+    Busca pedidos por número (completo, comienzo o una parte), ID, nombre o
+    teléfono del cliente (core/busqueda.py). Devuelve las sugerencias
+    ordenadas en ``resultados`` y, si hay coincidencia exacta, su ID en ``pedido_id``.
+    Asíncrona: cada tecla del buscador es una petición.
+    """
+    query = request.GET.get('q', '').strip().lstrip('#')
     
     if not query:
-        return JsonResponse({'success': False, 'error': 'Parámetro de búsqueda vacío'})
+        return JsonResponse({'success': False, 'error': 'Parámetro de búsqueda vacío', 'resultados': []})
     
-    try:
-        # Intentar buscar por número de pedido primero
-        pedido = Pedido.objects.filter(numero_pedido=query).first()
-        
-        # Si no se encuentra, intentar por ID
-        if not pedido:
-            try:
-                pedido_id = int(query)
-                pedido = Pedido.objects.filter(pk=pedido_id).first()
-            except (ValueError, TypeError):
-                pass
-        
-        if pedido:
-            return JsonResponse({
-                'success': True,
-                'pedido_id': pedido.pk,
-                'numero_pedido': pedido.numero_pedido
-            })
-        else:
-            return JsonResponse({
-                'success': False,
-                'error': 'Pedido no encontrado'
-            })
-    except Exception as e:
+    resultados = await abuscar_pedidos(query)
+    if resultados and resultados[0]['exacto']:
         return JsonResponse({
-            'success': False,
-            'error': str(e)
+            'success': True,
+            'pedido_id': resultados[0]['pedido_id'],
+            'numero_pedido': resultados[0]['numero_pedido'],
+            'resultados': resultados,
         })
+    if await PedidoArchivado.objects.filter(numero_pedido=query).aexists():
+        # Los pedidos archivados ya no se editan desde el panel
+        error = 'El pedido está archivado'
+    else:
+        error = 'Pedido no encontrado'
+    return JsonResponse({'success': False, 'error': error, 'resultados': resultados})
 
 # ========== VISTA DEL REPARTIDOR (HU18) ==========
 
-@login_required
+@permiso_requerido('entregas', mensaje='No tienes permisos para acceder a esta área.')
 def repartidor_pedidos_view(request):
     """
     Vista para que el repartidor gestione las entregas asignadas.
@@ -1074,15 +1288,9 @@ def repartidor_pedidos_view(request):
     - Ver detalles: dirección, productos, contacto del cliente
     - Actualizar estado: 'En preparación', 'Listo para entregar', 'En camino', 'Entregado'
     """
-    # Validar que el usuario sea un repartidor
-    if request.user.rol != 'repartidor':
-        messages.error(request, 'No tienes permisos para acceder a esta área.')
-        return redirect('home')
-    
-    # Obtener el perfil de repartidor del usuario actual
-    try:
-        perfil_repartidor = request.user.perfil_repartidor
-    except Repartidor.DoesNotExist:
+    # El id del perfil de repartidor viene de la sesión (core/permisos.py)
+    repartidor_id = request.permisos['repartidor_id']
+    if repartidor_id is None:
         messages.error(request, 'No tienes un perfil de repartidor asociado. Contacta al administrador.')
         return redirect('home')
     
@@ -1098,7 +1306,7 @@ def repartidor_pedidos_view(request):
         
         # Obtener el pedido
         try:
-            pedido = Pedido.objects.get(pk=pedido_id, repartidor=perfil_repartidor)
+            pedido = Pedido.objects.get(pk=pedido_id, repartidor_id=repartidor_id)
             
             # Validar que el nuevo estado sea válido para el repartidor
             estados_permitidos = ['en_preparacion', 'listo', 'en_camino', 'entregado']
@@ -1131,24 +1339,34 @@ def repartidor_pedidos_view(request):
     
     # Obtener pedidos asignados al repartidor (GET)
     # Estados relevantes: confirmado, en_preparacion, listo, en_camino
-    pedidos_asignados = Pedido.objects.filter(
-        repartidor=perfil_repartidor,
+    pedidos_asignados = list(Pedido.objects.filter(
+        repartidor_id=repartidor_id,
         estado__in=['confirmado', 'en_preparacion', 'listo', 'en_camino']
-    ).select_related('cliente', 'metodo_pago').prefetch_related('detalles__producto').order_by('estado', 'fecha_creacion')
+    ).select_related('cliente', 'metodo_pago').prefetch_related('detalles__producto').order_by('estado', 'fecha_creacion'))
+
+    # Rutas sugeridas: agrupa los delivery listos/en camino cercanos y ordena las paradas
+    rutas = agrupar_pedidos([
+        p for p in pedidos_asignados
+        if p.tipo_orden == 'delivery' and p.estado in ('listo', 'en_camino')
+    ])
+    for numero_ruta, ruta in enumerate(rutas, start=1):
+        for numero_parada, pedido in enumerate(ruta, start=1):
+            pedido.numero_ruta = numero_ruta
+            pedido.numero_parada = numero_parada
     
     # También mostrar pedidos entregados recientes (últimas 24 horas)
     hace_24_horas = timezone.now() - timedelta(hours=24)
     pedidos_entregados_recientes = Pedido.objects.filter(
-        repartidor=perfil_repartidor,
+        repartidor_id=repartidor_id,
         estado='entregado',
         fecha_entrega__gte=hace_24_horas
     ).select_related('cliente', 'metodo_pago').prefetch_related('detalles__producto').order_by('-fecha_entrega')
     
     # Estadísticas para el repartidor
-    total_asignados = pedidos_asignados.count()
-    total_en_camino = pedidos_asignados.filter(estado='en_camino').count()
+    total_asignados = len(pedidos_asignados)
+    total_en_camino = sum(1 for p in pedidos_asignados if p.estado == 'en_camino')
     total_entregados_hoy = Pedido.objects.filter(
-        repartidor=perfil_repartidor,
+        repartidor_id=repartidor_id,
         estado='entregado',
         fecha_entrega__date=timezone.now().date()
     ).count()
@@ -1156,10 +1374,10 @@ def repartidor_pedidos_view(request):
     contexto = {
         'pedidos_asignados': pedidos_asignados,
         'pedidos_entregados_recientes': pedidos_entregados_recientes,
+        'rutas': rutas,
         'total_asignados': total_asignados,
         'total_en_camino': total_en_camino,
         'total_entregados_hoy': total_entregados_hoy,
-        'perfil_repartidor': perfil_repartidor,
         'titulo': 'Mis Entregas',
         'estados_disponibles': Pedido.ESTADO_CHOICES,
     }
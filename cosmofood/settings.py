@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que también detecte la escritura de la sesión al final de la petición
+    'core.db_router.FijarPrimarioMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +54,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.carrito',
             ],
         },
     },
@@ -78,18 +81,95 @@ DEFAULT_FROM_EMAIL = f'Cosmofood <{config("EMAIL_HOST_USER")}>'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'backend',
-        'USER': 'root',
-        'PASSWORD': '',
-        'HOST': 'localhost',
-        'PORT': '3307',
+        'NAME': config('DB_NAME', default='backend'),
+        'USER': config('DB_USER', default='root'),
+        'PASSWORD': config('DB_PASSWORD', default=''),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default='3307'),
+        # Conexiones persistentes: cada proceso reutiliza su conexión durante
+        # CONN_MAX_AGE segundos en vez de abrir una nueva por petición (0 = desactivado)
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        # Antes de reutilizar una conexión se verifica que siga viva
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
         # Add these options below
         'OPTIONS': {
             'sql_mode': 'STRICT_TRANS_TABLES',
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
         }
     }
 }
 
+# Pool de conexiones opcional (requiere `pip install django-db-connection-pool[mysql]`).
+# Pensado para el modo ASGI, donde Django no reutiliza conexiones persistentes
+# entre peticiones: el pool mantiene conexiones abiertas y las presta a cada hilo.
+if config('DB_POOL', default=False, cast=bool):
+    DATABASES['default']['ENGINE'] = 'dj_db_conn_pool.backends.mysql'
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # El pool administra la vida de las conexiones
+    DATABASES['default']['POOL_OPTIONS'] = {
+        'POOL_SIZE': config('DB_POOL_SIZE', default=10, cast=int),
+        'MAX_OVERFLOW': config('DB_POOL_MAX_OVERFLOW', default=10, cast=int),
+        'RECYCLE': config('DB_POOL_RECYCLE', default=300, cast=int),
+        'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        'PRE_PING': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+    }
+
+# Réplica de lectura opcional. Solo se usa dentro de core.db_router.using_replica()
+# (dashboard, historial de pedidos y catálogo). Para pruebas locales puede
+# apuntar a una segunda base SQLite:
+#   DB_REPLICA_ENGINE=django.db.backends.sqlite3 DB_REPLICA_NAME=/tmp/replica.sqlite3
+if config('DB_REPLICA_NAME', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': config('DB_REPLICA_ENGINE', default=DATABASES['default']['ENGINE']),
+        'NAME': config('DB_REPLICA_NAME'),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'HOST': config('DB_REPLICA_HOST', default=DATABASES['default']['HOST']),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+    }
+    if DATABASES['replica']['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES['replica']['OPTIONS'] = {}
+    if config('DB_REPLICA_TEST_MIRROR', default=False, cast=bool):
+        # En los tests la réplica usa la misma conexión que default
+        DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Segundos que un navegador lee del primario después de escribir (read-your-writes)
+REPLICA_PIN_SEGUNDOS = config('DB_REPLICA_PIN_SEGUNDOS', default=5, cast=int)
+
+
+# Caché
+# Con varios procesos (gunicorn/uvicorn) usar un backend compartido, por ejemplo
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+# para que la invalidación de un proceso la vean todos.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='cosmofood'),
+        'KEY_PREFIX': config('CACHE_KEY_PREFIX', default='cosmofood'),
+    }
+}
+
+
+# Sesiones y mensajes (ver "Sesiones" en RENDIMIENTO.md)
+# - db (por defecto): una fila por sesión, se lee en cada petición autenticada
+# - cached_db: lee desde la caché y escribe en las dos
+# - cache: solo caché, requiere una caché compartida y persistente (Redis)
+# - signed_cookies: la sesión viaja firmada en la cookie, sin lecturas ni escrituras
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.db')
+SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=60 * 60 * 24 * 14, cast=int)
+# Los mensajes van en su propia cookie y solo pasan a la sesión si no caben
+MESSAGE_STORAGE = config('MESSAGE_STORAGE', default='django.contrib.messages.storage.fallback.FallbackStorage')
+# Caché propia para las sesiones: al vaciar o desalojar la caché general no se cierran las sesiones
+if config('SESSION_CACHE_LOCATION', default=''):
+    CACHES['sesiones'] = {
+        'BACKEND': config('SESSION_CACHE_BACKEND', default=CACHES['default']['BACKEND']),
+        'LOCATION': config('SESSION_CACHE_LOCATION'),
+        'KEY_PREFIX': CACHES['default']['KEY_PREFIX'],
+    }
+    SESSION_CACHE_ALIAS = 'sesiones'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,11 +206,27 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [
-    BASE_DIR / 'static',
-]
+# core/static lo encuentra AppDirectoriesFinder; STATICFILES_DIRS solo hace falta para carpetas fuera de las apps
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Nombres con hash, imágenes optimizadas y versiones .gz/.br (core/estaticos.py, ver RENDIMIENTO.md).
+# Necesita collectstatic, por eso con DEBUG se usa el almacenamiento simple
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': config(
+            'STATICFILES_BACKEND',
+            default='django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG else 'core.estaticos.EstaticosOptimizados',
+        ),
+    },
+}
+
+# Servir los estáticos desde Django, sin nginx (requiere `pip install whitenoise`).
+# Los archivos con hash salen con caché de un año e immutable, y se envían los .gz/.br ya generados
+if config('WHITENOISE', default=False, cast=bool):
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                      'whitenoise.middleware.WhiteNoiseMiddleware')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 